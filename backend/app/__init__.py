@@ -1,4 +1,5 @@
-from fastapi import FastAPI, APIRouter
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -11,11 +12,59 @@ def build_app(cfg: Settings) -> FastAPI:
     if cfg.TEST_SUITE:
         title = f"{title} (test suite)"
 
-    app = FastAPI(title=title, version=cfg.PROJECT_VERSION)
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if cfg.TEST_SUITE:
+            yield
+            return
+
+        import asyncio
+        from app.plugins.http import http_clients
+        from app.plugins.indexes import check_query_shapes
+        from app.plugins.jobs import publish_job_queue
+        from app.plugins.mongodb import mongo_connection
+
+        mongo_connection.open()
+        mongo_connection.open_async()
+        http_clients.open_all()
+
+        async def check_indexes():
+            try:
+                await asyncio.to_thread(
+                    check_query_shapes, mongo_connection.open()["orgbook-publisher"]
+                )
+            except Exception as error:
+                cfg.LOGGER.warning(f"Could not check query plans: {error}")
+
+        # Warn about unindexed queries without holding up startup
+        index_check = asyncio.create_task(check_indexes())
+        publish_job_queue.start(cfg.PUBLISH_JOB_WORKERS)
+        try:
+            yield
+        finally:
+            index_check.cancel()
+            await publish_job_queue.stop()
+            await http_clients.close()
+            await mongo_connection.close()
+
+    app = FastAPI(title=title, version=cfg.PROJECT_VERSION, lifespan=lifespan)
 
     if not cfg.TEST_SUITE:
         app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
+        from app.plugins.http import DependencyUnavailableError
+
+        @app.exception_handler(DependencyUnavailableError)
+        async def dependency_unavailable(
+            request: Request, exc: DependencyUnavailableError
+        ):
+            cfg.LOGGER.warning(str(exc))
+            return JSONResponse(
+                status_code=503,
+                content={"detail": str(exc)},
+                headers={"Retry-After": str(int(cfg.HTTP_CIRCUIT_RESET_TIMEOUT))},
+            )
+
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -28,8 +77,22 @@ def build_app(cfg: Settings) -> FastAPI:
 
     @api_router.get("/server/status", tags=["Server"], include_in_schema=False)
     async def server_status():
-        cfg.LOGGER.info("Server status OK!")
-        return JSONResponse(status_code=200, content={"status": "ok"})
+        dependencies = {}
+        if not cfg.TEST_SUITE:
+            from app.plugins.http import http_clients
+
+            dependencies = http_clients.status()
+        degraded = any(
+            dependency["circuit"] != "closed" for dependency in dependencies.values()
+        )
+        cfg.LOGGER.info("Server status degraded." if degraded else "Server status OK!")
+        return JSONResponse(
+            status_code=200,
+            content={
+                "status": "degraded" if degraded else "ok",
+                "dependencies": dependencies,
+            },
+        )
 
     if cfg.TEST_SUITE:
         from app.routers import test_suite
@@ -0,0 +1,34 @@
+from fastapi import Request, Response
+
+
+def strong_etag(digest, variant=None):
+    """Quote a content digest as a strong entity tag, per representation."""
+    return f'"{digest}-{variant}"' if variant else f'"{digest}"'
+
+
+def weak_etag(version, variant=None):
+    """Quote a resource version as a weak entity tag, per representation."""
+    return f'W/"{version}-{variant}"' if variant else f'W/"{version}"'
+
+
+def is_not_modified(request: Request, etag):
+    # https://www.rfc-editor.org/rfc/rfc9110#name-if-none-match
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in [
+        tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+    ]
+
+
+def cache_headers(etag, cache_control, vary=None):
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if vary:
+        headers["Vary"] = vary
+    return headers
+
+
+def not_modified(etag, cache_control, vary=None):
+    return Response(status_code=304, headers=cache_headers(etag, cache_control, vary))
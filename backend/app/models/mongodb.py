@@ -14,13 +14,36 @@ class IssuerRecord(BaseModel):
     authorized_key: str = Field()
 
 
+class ProvisioningCheckpoint(BaseModel):
+    id: str = Field()
+    digest: str = Field()
+    outcome: str = Field()
+    checked: str = Field()
+
+
+class PublishJobRecord(BaseModel):
+    id: str = Field()
+    status: str = Field()
+    publication: dict = Field()
+    attempts: int = Field()
+    #: Epoch seconds from which a queued job may be claimed, or a running job's lease ends.
+    available: float = Field()
+    #: Lease of the worker running the job, only that worker may record its outcome.
+    lease_id: str = Field(None)
+    created: str = Field()
+    updated: str = Field()
+    result: dict = Field(None)
+
+
 class CredentialTypeRecord(BaseModel):
     type: str = Field()
     version: str = Field()
     issuer: str = Field()
     context: dict = Field()
+    context_digest: str = Field(None)
     template: dict = Field()
     oca_bundle: dict = Field()
+    oca_bundle_digest: str = Field(None)
     json_schema: dict = Field()
     core_paths: dict = Field()
     subject_type: str = Field()
@@ -41,6 +64,7 @@ class CredentialRecord(BaseModel):
     suspension: bool = Field()
     vc: dict = Field()
     vc_jwt: str = Field()
+    digest: str = Field(None)
 
 
 class StatusListRecord(BaseModel):
@@ -48,6 +72,12 @@ class StatusListRecord(BaseModel):
     type: str = Field(None)
     version: str = Field(None)
     active: bool = Field(None)
-    indexes: list = Field()
+    indexes: list = Field(None)
+    length: int = Field(None)
+    key: str = Field(None)
+    counter: int = Field(None)
+    revision: int = Field(None)
+    bitstring: bytes = Field(None)
+    dirty: bool = Field(None)
     endpoint: str = Field()
     credential: dict = Field()
@@ -1,5 +1,5 @@
-from typing import Dict, Any
-from pydantic import BaseModel, Field
+from typing import Dict, Any, List
+from pydantic import BaseModel, Field, field_validator
 import uuid
 
 class BaseModel(BaseModel):
@@ -48,4 +48,21 @@ class PublicationOptions(BaseModel):
 
 class Publication(BaseModel):
     credential: PublicationCredential = Field()
-    options: PublicationOptions = Field()
\ No newline at end of file
+    options: PublicationOptions = Field()
+
+
+class CredentialStatusUpdate(BaseModel):
+    credentialIds: List[str] = Field(example=[str(uuid.uuid4())])
+    statusPurpose: str = Field(example="revocation")
+    status: bool = Field(True, example=True)
+
+    @field_validator("statusPurpose")
+    @classmethod
+    def validate_status_purpose(cls, value):
+        if value not in ["revocation", "suspension"]:
+            raise ValueError(f"Unsupported status purpose {value}.")
+        return value
+
+
+class CredentialStatusCheck(BaseModel):
+    credentials: List[dict] = Field()
@@ -1,19 +1,51 @@
 from .mongodb import MongoClient, MongoClientError
+from .repositories import Repositories
+from .data_integrity import (
+    EddsaJcs2022,
+    DataIntegrityError,
+    LocalKeystore,
+    LocalSigner,
+    LocalVerifier,
+    VerificationMethod,
+    VerificationMethodCache,
+)
 from .traction import TractionController, TractionControllerError
 from .registrar import PublisherRegistrar, PublisherRegistrarError
-from .status_list import BitstringStatusList, BitstringStatusListError
+from .publisher import BatchPublisher, BatchPublisherError
+from .status_list import (
+    BitstringStatusList,
+    BitstringStatusListError,
+    StatusListChecker,
+    StatusListIndexAllocator,
+    StatusListIndexPool,
+    StatusListManager,
+)
 from .oca import OCAProcessor, OCAProcessorError
 
 
 __all__ = [
+    "BatchPublisher",
+    "BatchPublisherError",
     "BitstringStatusList",
     "BitstringStatusListError",
+    "DataIntegrityError",
+    "EddsaJcs2022",
+    "LocalKeystore",
+    "LocalSigner",
+    "LocalVerifier",
     "MongoClient",
     "MongoClientError",
     "OCAProcessor",
     "OCAProcessorError",
     "PublisherRegistrar",
     "PublisherRegistrarError",
+    "Repositories",
+    "StatusListChecker",
+    "StatusListIndexAllocator",
+    "StatusListIndexPool",
+    "StatusListManager",
     "TractionController",
-    "TractionControllerError"
+    "TractionControllerError",
+    "VerificationMethod",
+    "VerificationMethodCache",
 ]
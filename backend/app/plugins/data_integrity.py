@@ -0,0 +1,350 @@
+from config import settings
+from aries_askar import Key, KeyAlg
+from canonicaljson import encode_canonical_json
+from multiformats import multibase
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import hashlib
+import json
+import time
+
+
+class DataIntegrityError(Exception):
+    """Generic DataIntegrity Error."""
+
+
+class EddsaJcs2022:
+    """In-process ``eddsa-jcs-2022`` Data Integrity cryptosuite.
+
+    https://www.w3.org/TR/vc-di-eddsa/#eddsa-jcs-2022
+    """
+
+    cryptosuite = "eddsa-jcs-2022"
+
+    def hash_data(self, document, proof_config):
+        # https://www.w3.org/TR/vc-di-eddsa/#hashing-eddsa-jcs-2022
+        return (
+            hashlib.sha256(encode_canonical_json(proof_config)).digest()
+            + hashlib.sha256(encode_canonical_json(document)).digest()
+        )
+
+    def proof_config(self, document, options):
+        # https://www.w3.org/TR/vc-di-eddsa/#proof-configuration-eddsa-jcs-2022
+        # Like ACA-Py, the document @context is not copied into the proof, so
+        # proofs signed here are byte-identical to the ones Traction returns.
+        if (
+            options.get("type") != "DataIntegrityProof"
+            or options.get("cryptosuite") != self.cryptosuite
+        ):
+            raise DataIntegrityError("Unsupported proof type or cryptosuite.")
+        if "@context" in options and options["@context"] != document.get("@context"):
+            raise DataIntegrityError("Proof @context does not match the document.")
+        return {name: value for name, value in options.items() if name != "proofValue"}
+
+    def add_proof(self, document, options, key):
+        # https://www.w3.org/TR/vc-di-eddsa/#create-proof-eddsa-jcs-2022
+        unsecured_document = {
+            name: value for name, value in document.items() if name != "proof"
+        }
+        proof = self.proof_config(unsecured_document, options)
+        signature = key.sign_message(self.hash_data(unsecured_document, proof))
+        proof["proofValue"] = multibase.encode(signature, "base58btc")
+        return unsecured_document | {"proof": proof}
+
+    def verify_proof(self, secured_document, key):
+        # https://www.w3.org/TR/vc-di-eddsa/#verify-proof-eddsa-jcs-2022
+        proof = secured_document.get("proof")
+        if not isinstance(proof, dict) or not proof.get("proofValue"):
+            return False
+        unsecured_document = {
+            name: value for name, value in secured_document.items() if name != "proof"
+        }
+        try:
+            proof_config = self.proof_config(unsecured_document, proof)
+            signature = multibase.decode(proof["proofValue"])
+        except (DataIntegrityError, ValueError, KeyError):
+            return False
+        return key.verify_signature(
+            self.hash_data(unsecured_document, proof_config), signature
+        )
+
+
+class LocalKeystore:
+    """Publisher-held Ed25519 keys, indexed by ``did:key`` verification method.
+
+    The keystore file is a JSON list of private Ed25519 JWKs, as exported by
+    Askar's ``Key.get_jwk_secret``.
+    """
+
+    def __init__(self, path=None):
+        self.keys = {}
+        if path:
+            self.load(path)
+
+    @staticmethod
+    def multikey(key):
+        return multibase.encode(b"\xed\x01" + key.get_public_bytes(), "base58btc")
+
+    def load(self, path):
+        with open(path, "r") as f:
+            jwks = json.load(f)
+        for jwk in jwks.get("keys", []) if isinstance(jwks, dict) else jwks:
+            self.add(Key.from_jwk(jwk))
+
+    def add(self, key):
+        if key.algorithm != KeyAlg.ED25519:
+            raise DataIntegrityError("Only Ed25519 keys are supported.")
+        multikey = self.multikey(key)
+        self.keys[f"did:key:{multikey}#{multikey}"] = key
+        return multikey
+
+    def get(self, verification_method):
+        return self.keys.get(verification_method)
+
+
+class LocalSigner:
+    """Sign Data Integrity proofs in-process for verification methods held locally.
+
+    Only the publisher's ``did:key`` endorsements have their keys in the local
+    keystore; credentials issued by a ``did:web`` issuer, status list
+    credentials included, are still signed by Traction.
+    """
+
+    def __init__(self, keystore):
+        self.keystore = keystore
+        self.suite = EddsaJcs2022()
+
+    def can_sign(self, options):
+        return (
+            options.get("cryptosuite") == self.suite.cryptosuite
+            and self.keystore.get(options.get("verificationMethod")) is not None
+        )
+
+    def add_proof(self, document, options):
+        key = self.keystore.get(options.get("verificationMethod"))
+        if not key:
+            raise DataIntegrityError(
+                f"No local key for {options.get('verificationMethod')}."
+            )
+        return self.suite.add_proof(document, options, key)
+
+
+def multikey_to_key(multikey):
+    public_bytes = multibase.decode(multikey)
+    if public_bytes[:2] != b"\xed\x01":
+        raise DataIntegrityError("Only Ed25519 multikeys are supported.")
+    return Key.from_public_bytes(KeyAlg.ED25519, public_bytes[2:])
+
+
+def _verify_with_multikey(secured_document, multikey):
+    # Runs in worker processes, keys are passed as multikeys since Askar keys don't pickle
+    if not multikey:
+        return False
+    return EddsaJcs2022().verify_proof(secured_document, multikey_to_key(multikey))
+
+
+class VerificationMethod:
+    """Public key of a verification method and the relationships its DID authorizes it for."""
+
+    def __init__(self, did, multikey, relationships):
+        self.did = did
+        self.multikey = multikey
+        self.relationships = relationships
+
+
+class VerificationMethodCache:
+    """Resolved verification methods, with positive and negative TTLs.
+
+    ``did:key`` methods are decoded locally, other DIDs are resolved once and
+    every verification method in the DID document is cached under its id,
+    with the verification relationships that reference it. Methods missing
+    from a resolved document are negatively cached, failed resolutions are not.
+    """
+
+    #: Verification relationships proofs are checked against.
+    relationships = ("assertionMethod", "authentication")
+
+    def __init__(self, ttl, negative_ttl):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = {}
+        self.resolving = {}
+
+    def _cached(self, verification_method):
+        entry = self.entries.get(verification_method)
+        if entry and entry[0] > time.monotonic():
+            return entry
+        return None
+
+    @staticmethod
+    def _absolute(did, method_id):
+        return f"{did}{method_id}" if method_id.startswith("#") else method_id
+
+    def _store(self, did, did_document):
+        now = time.monotonic()
+        methods = {
+            self._absolute(did, method.get("id", "")): method
+            for method in did_document.get("verificationMethod", [])
+        }
+        relationships = {}
+        for relationship in self.relationships:
+            for reference in did_document.get(relationship, []):
+                # Relationships reference a listed method or embed their own
+                if isinstance(reference, dict):
+                    method_id = self._absolute(did, reference.get("id", ""))
+                    methods.setdefault(method_id, reference)
+                else:
+                    method_id = self._absolute(did, reference)
+                relationships.setdefault(method_id, set()).add(relationship)
+
+        for method_id, method in methods.items():
+            # A DID document only speaks for its own verification methods
+            if method_id.split("#")[0] != did:
+                continue
+            try:
+                if method.get("publicKeyMultibase"):
+                    multikey = method["publicKeyMultibase"]
+                    multikey_to_key(multikey)
+                elif method.get("publicKeyJwk"):
+                    multikey = LocalKeystore.multikey(
+                        Key.from_jwk(method["publicKeyJwk"])
+                    )
+                else:
+                    continue
+            except Exception:
+                continue
+            self.entries[method_id] = (
+                now + self.ttl,
+                VerificationMethod(
+                    did, multikey, frozenset(relationships.get(method_id, ()))
+                ),
+            )
+
+    async def _resolve(self, did, resolve_did):
+        did_document = await resolve_did(did)
+        if not did_document:
+            raise DataIntegrityError(f"No DID document for {did}.")
+        self._store(did, did_document)
+
+    async def get(self, verification_method, resolve_did):
+        """Return a ``VerificationMethod``, ``None`` if its DID does not list it.
+
+        Raises ``DataIntegrityError`` when the DID could not be resolved.
+        """
+        entry = self._cached(verification_method)
+        if entry:
+            return entry[1]
+
+        did = verification_method.split("#")[0]
+        if did.startswith("did:key:"):
+            multikey = did.removeprefix("did:key:")
+            try:
+                multikey_to_key(multikey)
+                # The single key of a did:key is used for every relationship
+                method = VerificationMethod(
+                    did, multikey, frozenset(self.relationships)
+                )
+            except Exception:
+                method = None
+            self.entries[verification_method] = (time.monotonic() + self.ttl, method)
+            return method
+
+        # Concurrent lookups for the same DID share a single resolution
+        if did not in self.resolving:
+            self.resolving[did] = asyncio.ensure_future(self._resolve(did, resolve_did))
+            self.resolving[did].add_done_callback(
+                lambda _: self.resolving.pop(did, None)
+            )
+        try:
+            await asyncio.shield(self.resolving[did])
+        except Exception as e:
+            raise DataIntegrityError(f"Could not resolve {did}: {e}")
+
+        entry = self._cached(verification_method)
+        if not entry:
+            entry = (time.monotonic() + self.negative_ttl, None)
+            self.entries[verification_method] = entry
+        return entry[1]
+
+
+class LocalVerifier:
+    """Verify ``eddsa-jcs-2022`` proofs without a round trip to Traction.
+
+    A proof verifies when its verification method is authorized for its
+    ``proofPurpose`` by the DID of the document's issuer, or of its holder
+    for ``authentication`` proofs. Results are ``None`` when that DID could
+    not be resolved, so an unavailable resolver never reads as a bad proof.
+    """
+
+    def __init__(self, cache, max_workers=None):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.suite = EddsaJcs2022()
+
+    def can_verify(self, secured_document):
+        proof = secured_document.get("proof")
+        return (
+            isinstance(proof, dict)
+            and proof.get("cryptosuite") == self.suite.cryptosuite
+        )
+
+    @staticmethod
+    def _party(secured_document, proof_purpose):
+        party = secured_document.get(
+            "holder" if proof_purpose == "authentication" else "issuer"
+        )
+        return party.get("id") if isinstance(party, dict) else party
+
+    async def _multikey(self, secured_document, resolve_did):
+        """Return the multikey the proof must verify with, ``False`` if none is authorized."""
+        proof = secured_document.get("proof") or {}
+        verification_method = proof.get("verificationMethod")
+        if not verification_method:
+            return False
+        try:
+            method = await self.cache.get(verification_method, resolve_did)
+        except DataIntegrityError as e:
+            settings.LOGGER.info(str(e))
+            return None
+        proof_purpose = proof.get("proofPurpose")
+        party = self._party(secured_document, proof_purpose)
+        if not method or proof_purpose not in method.relationships:
+            return False
+        # Presentations need not name a holder, credentials always name their issuer
+        if party != method.did and (party or proof_purpose != "authentication"):
+            return False
+        return method.multikey
+
+    async def verify(self, secured_document, resolve_did):
+        multikey = await self._multikey(secured_document, resolve_did)
+        if multikey is None:
+            return None
+        return _verify_with_multikey(secured_document, multikey)
+
+    async def verify_batch(self, secured_documents, resolve_did):
+        """Verify many documents, spreading the signature checks across processes."""
+        multikeys = await asyncio.gather(
+            *[self._multikey(document, resolve_did) for document in secured_documents]
+        )
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            results = await asyncio.gather(
+                *[
+                    loop.run_in_executor(
+                        executor, _verify_with_multikey, document, multikey
+                    )
+                    for document, multikey in zip(secured_documents, multikeys)
+                    if multikey is not None
+                ]
+            )
+        results = iter(results)
+        return [None if multikey is None else next(results) for multikey in multikeys]
+
+
+local_signer = LocalSigner(LocalKeystore(settings.PUBLISHER_KEYSTORE))
+local_verifier = LocalVerifier(
+    VerificationMethodCache(
+        settings.DI_VERIFICATION_CACHE_TTL, settings.DI_VERIFICATION_NEGATIVE_CACHE_TTL
+    ),
+    max_workers=settings.DI_VERIFICATION_WORKERS,
+)
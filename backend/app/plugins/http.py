@@ -0,0 +1,280 @@
+from config import settings
+import asyncio
+import importlib.util
+import random
+import time
+import httpx
+
+
+class HTTPClientsError(Exception):
+    """Generic HTTPClients Error."""
+
+
+class DependencyUnavailableError(HTTPClientsError):
+    """An outbound dependency is failing, saturated or short-circuited."""
+
+
+class CircuitBreaker:
+    """Fail fast while a dependency keeps failing.
+
+    The circuit opens after ``failure_threshold`` consecutive failures. Once
+    ``reset_timeout`` seconds have passed a single trial call is let through;
+    its outcome closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.trial or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial:
+            self.trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.trial = False
+
+    def abandon(self):
+        """Give the trial slot back when a call ended without an outcome."""
+        self.trial = False
+
+
+class Dependency:
+    """Pooled client for one outbound dependency, with resilience policies.
+
+    Each dependency gets its own timeout, a bulkhead bounding how many calls
+    may be in flight at once, jittered exponential retries for idempotent
+    requests and a circuit breaker.
+    """
+
+    idempotent_methods = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+    retry_status_codes = {429, 502, 503, 504}
+
+    def __init__(
+        self, name, client, max_concurrency, retries, backoff, backoff_max, breaker
+    ):
+        self.name = name
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.bulkhead = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+
+    @property
+    def timeout(self):
+        return self.client.timeout
+
+    def _delay(self, attempt):
+        # Full jitter, https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2**attempt))
+
+    async def _acquire(self):
+        try:
+            await asyncio.wait_for(
+                self.bulkhead.acquire(), settings.HTTP_BULKHEAD_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise DependencyUnavailableError(f"{self.name} is saturated.")
+
+    async def request(self, method, url, idempotent=None, **kwargs):
+        if idempotent is None:
+            idempotent = method.upper() in self.idempotent_methods
+        attempts = 1 + (self.retries if idempotent else 0)
+        for attempt in range(attempts):
+            # The bulkhead is taken first, a saturated dependency never holds the trial call
+            await self._acquire()
+            try:
+                trial = self.breaker.state == "half-open"
+                if not self.breaker.allow():
+                    raise DependencyUnavailableError(f"{self.name} circuit is open.")
+                self.in_flight += 1
+                recorded = False
+                try:
+                    r = await self.client.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    self.breaker.record_failure()
+                    recorded = True
+                    if attempt + 1 == attempts:
+                        raise DependencyUnavailableError(
+                            f"{self.name} request failed: {e!r}"
+                        )
+                else:
+                    if r.status_code < 500:
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.record_failure()
+                    recorded = True
+                    if (
+                        r.status_code not in self.retry_status_codes
+                        or attempt + 1 == attempts
+                    ):
+                        return r
+                finally:
+                    self.in_flight -= 1
+                    # Cancellations and other client errors say nothing about the dependency
+                    if trial and not recorded:
+                        self.breaker.abandon()
+            finally:
+                self.bulkhead.release()
+            await asyncio.sleep(self._delay(attempt))
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    def status(self):
+        return {
+            "circuit": self.breaker.state,
+            "failures": self.breaker.failures,
+            "inFlight": self.in_flight,
+            "maxConcurrency": self.max_concurrency,
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class HTTPClients:
+    """Long-lived pooled ``httpx.AsyncClient`` per outbound dependency.
+
+    Clients are opened once in the application lifespan and reused by every
+    request on the worker, keeping connections alive between calls. HTTP/2
+    is negotiated through the ``httpx[http2]`` extra, HTTP/1.1 is used when
+    ``h2`` is missing.
+    """
+
+    http2 = importlib.util.find_spec("h2") is not None
+
+    def __init__(self):
+        self.clients = {}
+
+    def open(
+        self,
+        name,
+        max_connections,
+        max_keepalive,
+        keepalive_expiry,
+        timeout,
+        follow_redirects=False,
+    ):
+        if name in self.clients:
+            return self.clients[name]
+        client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(timeout),
+            follow_redirects=follow_redirects,
+        )
+        self.clients[name] = Dependency(
+            name,
+            client,
+            max_concurrency=max_connections,
+            retries=settings.HTTP_RETRY_ATTEMPTS,
+            backoff=settings.HTTP_RETRY_BACKOFF,
+            backoff_max=settings.HTTP_RETRY_BACKOFF_MAX,
+            breaker=CircuitBreaker(
+                settings.HTTP_CIRCUIT_FAILURE_THRESHOLD,
+                settings.HTTP_CIRCUIT_RESET_TIMEOUT,
+            ),
+        )
+        return self.clients[name]
+
+    def open_traction(self):
+        return self.open(
+            "traction",
+            max_connections=settings.TRACTION_HTTP_MAX_CONNECTIONS,
+            max_keepalive=settings.TRACTION_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.TRACTION_HTTP_KEEPALIVE_EXPIRY,
+            timeout=settings.TRACTION_HTTP_TIMEOUT,
+        )
+
+    def open_all(self):
+        self.open_traction()
+        self.open(
+            "orgbook",
+            max_connections=settings.ORGBOOK_HTTP_MAX_CONNECTIONS,
+            max_keepalive=settings.ORGBOOK_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=settings.TRACTION_HTTP_KEEPALIVE_EXPIRY,
+            timeout=settings.ORGBOOK_HTTP_TIMEOUT,
+        )
+        self.open(
+            "did_web_server",
+            max_connections=settings.DID_WEB_SERVER_HTTP_MAX_CONNECTIONS,
+            max_keepalive=settings.DID_WEB_SERVER_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=settings.TRACTION_HTTP_KEEPALIVE_EXPIRY,
+            timeout=settings.DID_WEB_SERVER_HTTP_TIMEOUT,
+        )
+        # Legal acts, governance documents and remote contexts
+        self.open(
+            "resources",
+            max_connections=settings.RESOURCES_HTTP_MAX_CONNECTIONS,
+            max_keepalive=settings.RESOURCES_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=settings.TRACTION_HTTP_KEEPALIVE_EXPIRY,
+            timeout=settings.RESOURCES_HTTP_TIMEOUT,
+            follow_redirects=True,
+        )
+        # Status lists of any issuer, kept apart so they never trip the resources circuit
+        self.open(
+            "status_lists",
+            max_connections=settings.RESOURCES_HTTP_MAX_CONNECTIONS,
+            max_keepalive=settings.RESOURCES_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=settings.TRACTION_HTTP_KEEPALIVE_EXPIRY,
+            timeout=settings.RESOURCES_HTTP_TIMEOUT,
+            follow_redirects=True,
+        )
+
+    def get(self, name):
+        try:
+            return self.clients[name]
+        except KeyError:
+            raise HTTPClientsError(f"HTTP client {name} is not open.")
+
+    def status(self):
+        return {
+            name: client.status()
+            for name, client in self.clients.items()
+            if isinstance(client, Dependency)
+        }
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients = {}
+
+
+http_clients = HTTPClients()
@@ -0,0 +1,203 @@
+from config import settings
+from dataclasses import dataclass, field
+from typing import Any
+import pymongo
+
+ASCENDING, DESCENDING = pymongo.ASCENDING, pymongo.DESCENDING
+#: Every ``find_one`` returns the most recently inserted match.
+LATEST = [("_id", DESCENDING)]
+
+
+class IndexMigrationError(Exception):
+    """Generic IndexMigration Error."""
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """An index the application relies on, under MongoDB's default index name."""
+
+    keys: tuple[tuple[str, int], ...]
+    unique: bool = False
+
+    @property
+    def name(self):
+        return "_".join(f"{key}_{direction}" for key, direction in self.keys)
+
+    def matches(self, info):
+        return (
+            tuple((key, int(direction)) for key, direction in info["key"].items())
+            == self.keys
+            and bool(info.get("unique")) == self.unique
+        )
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    """A query issued by the repositories, checked against the indexes at startup."""
+
+    collection: str
+    filter: dict[str, Any]
+    sort: list = field(default_factory=lambda: LATEST)
+
+
+INDEXES = {
+    "IssuerRecord": [
+        IndexSpec((("id", ASCENDING),), unique=True),
+    ],
+    "CredentialTypeRecord": [
+        IndexSpec((("type", ASCENDING), ("version", ASCENDING)), unique=True),
+        IndexSpec((("type", ASCENDING), ("_id", DESCENDING))),
+    ],
+    "CredentialRecord": [
+        IndexSpec((("id", ASCENDING),), unique=True),
+        # Cardinality checks and /credentials/refresh
+        IndexSpec(
+            (
+                ("type", ASCENDING),
+                ("entity_id", ASCENDING),
+                ("cardinality_id", ASCENDING),
+                ("refresh", ASCENDING),
+                ("_id", DESCENDING),
+            )
+        ),
+    ],
+    "StatusListRecord": [
+        IndexSpec((("id", ASCENDING),), unique=True),
+        IndexSpec((("endpoint", ASCENDING),)),
+    ],
+    "CredentialPickupRecord": [
+        IndexSpec((("id", ASCENDING),), unique=True),
+    ],
+    "PublishJobRecord": [
+        IndexSpec((("id", ASCENDING),), unique=True),
+        # Job claims
+        IndexSpec((("status", ASCENDING), ("available", ASCENDING))),
+    ],
+    "ProvisioningCheckpoint": [
+        IndexSpec((("id", ASCENDING),), unique=True),
+    ],
+}
+
+QUERY_SHAPES = [
+    QueryShape("IssuerRecord", {"id": "did:web:example.com"}),
+    QueryShape("CredentialTypeRecord", {"type": "ExampleCredential"}),
+    QueryShape(
+        "CredentialTypeRecord", {"type": "ExampleCredential", "version": "v1.0"}
+    ),
+    QueryShape("CredentialRecord", {"id": "example"}),
+    QueryShape("CredentialRecord", {"id": {"$in": ["example"]}}),
+    QueryShape(
+        "CredentialRecord",
+        {
+            "type": "ExampleCredential",
+            "entity_id": "A0000000",
+            "cardinality_id": "example",
+            "refresh": False,
+        },
+    ),
+    QueryShape(
+        "CredentialRecord",
+        {
+            "type": "ExampleCredential",
+            "entity_id": "A0000000",
+            "cardinality_id": "example",
+            "refresh": False,
+            "cardinality_hash": "zExample",
+        },
+    ),
+    QueryShape(
+        "CredentialRecord",
+        {
+            "$or": [
+                {
+                    "type": "ExampleCredential",
+                    "entity_id": "A0000000",
+                    "cardinality_id": "example",
+                    "refresh": False,
+                    "cardinality_hash": "zExample",
+                }
+            ]
+        },
+    ),
+    QueryShape("StatusListRecord", {"id": "example"}),
+    QueryShape(
+        "StatusListRecord",
+        {"endpoint": "https://example.com/credentials/status/example"},
+    ),
+    QueryShape("PublishJobRecord", {"id": "example"}),
+    QueryShape(
+        "PublishJobRecord",
+        {
+            "status": {"$in": ["queued", "running"]},
+            "available": {"$lte": 0},
+            "attempts": {"$lt": 5},
+        },
+        [("available", ASCENDING)],
+    ),
+    QueryShape(
+        "PublishJobRecord",
+        {"status": "running", "available": {"$lte": 0}, "attempts": {"$gte": 5}},
+    ),
+]
+
+
+def converge_indexes(db, dry_run=False):
+    """Create, rebuild or drop indexes until each collection matches ``INDEXES``.
+
+    Safe to run repeatedly. Indexes outside the spec are dropped, except ``_id_``.
+    Returns the list of actions taken (or that would be taken on a dry run).
+    """
+    actions = []
+    for collection, specs in INDEXES.items():
+        existing = db[collection].index_information()
+        wanted = {spec.name: spec for spec in specs}
+        for name, info in existing.items():
+            if name == "_id_":
+                continue
+            spec = wanted.get(name)
+            if spec and spec.matches(info):
+                wanted.pop(name)
+                continue
+            # Unknown indexes, and named ones whose definition changed, are dropped
+            actions.append(("drop", collection, name))
+            if not dry_run:
+                db[collection].drop_index(name)
+        for spec in wanted.values():
+            actions.append(("create", collection, spec.name))
+            if not dry_run:
+                try:
+                    db[collection].create_index(
+                        list(spec.keys), name=spec.name, unique=spec.unique
+                    )
+                except pymongo.errors.OperationFailure as error:
+                    raise IndexMigrationError(
+                        f"Could not create {collection}.{spec.name}: {error}"
+                    )
+    return actions
+
+
+def _stages(plan):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+def collection_scans(db):
+    """Return the registered query shapes whose winning plan scans a whole collection."""
+    scans = []
+    for shape in QUERY_SHAPES:
+        explain = db[shape.collection].find(shape.filter, sort=shape.sort).explain()
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _stages(winning_plan):
+            scans.append(shape)
+    return scans
+
+
+def check_query_shapes(db):
+    for shape in collection_scans(db):
+        settings.LOGGER.warning(
+            f"COLLSCAN on {shape.collection} for {shape.filter}, run scripts/migrate_indexes.py."
+        )
@@ -0,0 +1,129 @@
+from config import settings
+from app.models.mongodb import PublishJobRecord
+from app.plugins.publisher import BatchPublisher
+from app.plugins.repositories import get_repositories
+from app.utils import timestamp
+import asyncio
+import time
+import uuid
+
+
+class PublishJobQueueError(Exception):
+    """Generic PublishJobQueue Error."""
+
+
+class PublishJobQueue:
+    """Durable queue of publications, stored in ``PublishJobRecord`` and drained by workers.
+
+    Jobs are leased to one worker at a time. A job whose worker stops before
+    finishing it is picked up again once its lease ends, and only the worker
+    holding the current lease records an outcome. Publications failing on a
+    dependency (5xx) are retried with exponential backoff for up to
+    ``max_attempts`` attempts. Other outcomes are final. Jobs whose last
+    lease ended unfinished are marked failed by an idle worker, at most once
+    per lease period on each process.
+    """
+
+    def __init__(self, max_attempts, backoff, lease, poll_interval):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.workers = []
+        self.swept = None
+
+    async def enqueue(self, repositories, publication):
+        job_id = str(uuid.uuid4())
+        await repositories.jobs.create(
+            PublishJobRecord(
+                id=job_id,
+                status="queued",
+                publication=publication,
+                attempts=0,
+                available=time.time(),
+                created=timestamp(),
+                updated=timestamp(),
+            ).model_dump()
+        )
+        return job_id
+
+    def _publisher(self, repositories):
+        return BatchPublisher(repositories)
+
+    async def sweep(self, repositories):
+        """Fail jobs whose worker stopped during their last attempt, at most once per lease."""
+        now = time.monotonic()
+        if self.swept is not None and now < self.swept + self.lease:
+            return
+        self.swept = now
+        await repositories.jobs.fail_exhausted(
+            time.time(),
+            self.max_attempts,
+            {
+                "status": 500,
+                "detail": f"Lease expired after {self.max_attempts} attempts.",
+            },
+            timestamp(),
+        )
+
+    async def run_once(self, repositories):
+        """Claim and process one job, returning ``False`` when none is available."""
+        lease_id = str(uuid.uuid4())
+        job = await repositories.jobs.claim(
+            time.time(), self.lease, lease_id, self.max_attempts, timestamp()
+        )
+        if not job:
+            await self.sweep(repositories)
+            return False
+        try:
+            result = (
+                await self._publisher(repositories).publish([job["publication"]])
+            )[0]
+        except Exception as error:
+            settings.LOGGER.warning(f"Publish job {job['id']} failed: {error!r}")
+            result = {"status": 500, "detail": str(error)}
+
+        if result["status"] < 300:
+            status, available = "done", None
+        elif result["status"] >= 500 and job["attempts"] < self.max_attempts:
+            status = "queued"
+            available = time.time() + self.backoff * 2 ** (job["attempts"] - 1)
+        else:
+            status, available = "failed", None
+        finished = await repositories.jobs.finish(
+            job["id"], lease_id, status, result, timestamp(), available=available
+        )
+        if not finished:
+            settings.LOGGER.warning(
+                f"Publish job {job['id']} lease ended before it finished, outcome discarded."
+            )
+        return True
+
+    async def work(self, repositories):
+        while True:
+            try:
+                if await self.run_once(repositories):
+                    continue
+            except Exception as error:
+                settings.LOGGER.warning(f"Publish job worker error: {error!r}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self, concurrency, repositories=None):
+        repositories = repositories or get_repositories()
+        self.workers += [
+            asyncio.create_task(self.work(repositories)) for _ in range(concurrency)
+        ]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+
+publish_job_queue = PublishJobQueue(
+    max_attempts=settings.PUBLISH_JOB_MAX_ATTEMPTS,
+    backoff=settings.PUBLISH_JOB_RETRY_BACKOFF,
+    lease=settings.PUBLISH_JOB_LEASE_SECONDS,
+    poll_interval=settings.PUBLISH_JOB_POLL_INTERVAL,
+)
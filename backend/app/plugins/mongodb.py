@@ -1,28 +1,67 @@
 import pymongo
+from pymongo import ReturnDocument
 from bson.objectid import ObjectId
 from config import settings
+from app.plugins.indexes import converge_indexes
 
 
 class MongoClientError(Exception):
     """Generic MongoClient Error."""
 
 
-class MongoClient:
+class MongoConnection:
+    """Process-wide pooled ``pymongo.MongoClient`` and ``pymongo.AsyncMongoClient``.
+
+    Opened once in the application lifespan and shared by every request on the
+    worker. Scripts and tests that run outside the lifespan open them on first use.
+    """
+
     def __init__(self):
-        self.client = pymongo.MongoClient(
-            f'{settings.MONGO_HOST}:{settings.MONGO_PORT}',
+        self.client = None
+        self.async_client = None
+
+    def _options(self):
+        return dict(
+            host=f'{settings.MONGO_HOST}:{settings.MONGO_PORT}',
             username=settings.MONGO_USER,
             password=settings.MONGO_PASSWORD,
             authSource=settings.MONGO_DB,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+            readPreference=settings.MONGO_READ_PREFERENCE,
         )
+
+    def open(self):
+        if not self.client:
+            self.client = pymongo.MongoClient(**self._options())
+        return self.client
+
+    def open_async(self):
+        if not self.async_client:
+            self.async_client = pymongo.AsyncMongoClient(**self._options())
+        return self.async_client
+
+    async def close(self):
+        if self.client:
+            self.client.close()
+        if self.async_client:
+            await self.async_client.close()
+        self.client = None
+        self.async_client = None
+
+
+mongo_connection = MongoConnection()
+
+
+class MongoClient:
+    def __init__(self, client=None):
+        self.client = client or mongo_connection.open()
         self.db = self.client["orgbook-publisher"]
 
     def provision(self):
-        self.db["IssuerRecord"].create_index([("id")], unique=True)
-        self.db["CredentialRecord"].create_index([("id")], unique=True)
-        self.db["StatusListRecord"].create_index([("id")], unique=True)
-        self.db["CredentialTypeRecord"].create_index([("version")], unique=True)
-        self.db["CredentialPickupRecord"].create_index([("id")], unique=True)
+        return converge_indexes(self.db)
 
     def insert(self, collection, item):
         try:
@@ -31,17 +70,32 @@ class MongoClient:
             raise MongoClientError()
             
 
-    def find(self, collection, query):
-        return self.db[collection].find(query, {'_id': False}, sort=[("_id", pymongo.DESCENDING)])
+    def find(self, collection, query, projection=None):
+        return self.db[collection].find(query, {'_id': False} | (projection or {}), sort=[("_id", pymongo.DESCENDING)])
 
-    def find_one(self, collection, query):
-        return self.db[collection].find_one(query, {'_id': False}, sort=[("_id", pymongo.DESCENDING)])
+    def find_one(self, collection, query, projection=None):
+        return self.db[collection].find_one(query, {'_id': False} | (projection or {}), sort=[("_id", pymongo.DESCENDING)])
 
     def find_by_id(self, collection, object_id):
         return self.db[collection].find_one({"_id": ObjectId(object_id)})
 
-    def replace(self, collection, query, new_item):
-        self.db[collection].replace_one(query, new_item)
+    def replace(self, collection, query, new_item, upsert=False):
+        self.db[collection].replace_one(query, new_item, upsert=upsert)
+
+    def update(self, collection, query, update):
+        return self.db[collection].update_one(query, update).modified_count
+
+    def update_many(self, collection, query, update):
+        return self.db[collection].update_many(query, update).modified_count
+
+    def find_one_and_update(self, collection, query, update, projection=None, return_new=True):
+        return self.db[collection].find_one_and_update(
+            query,
+            update,
+            {"_id": False} | (projection or {}),
+            return_document=ReturnDocument.AFTER if return_new else ReturnDocument.BEFORE,
+        )
 
     def delete(self, collection, query):
         self.db[collection].delete_one(query)
+
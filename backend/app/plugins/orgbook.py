@@ -1,13 +1,17 @@
 from config import settings
-import requests
+from app.plugins.http import http_clients
 
 
 class OrgbookClient:
     """Read-only OrgBook HTTP client: entity lookup via search API (no credential push)."""
 
-    def fetch_buisness_info(self, identifier):
-        r = requests.get(
-            f"{settings.ORGBOOK_API_URL}/search/topic?q={identifier}&inactive=false&revoked=false"
+    def __init__(self):
+        self.client = http_clients.get("orgbook")
+
+    async def fetch_buisness_info(self, identifier):
+        r = await self.client.get(
+            f"{settings.ORGBOOK_API_URL}/search/topic",
+            params={"q": identifier, "inactive": "false", "revoked": "false"},
         )
         buisness_info = r.json()["results"][0]
         return {
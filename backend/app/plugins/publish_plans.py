@@ -0,0 +1,100 @@
+from config import settings
+from jsonpath_ng import parse
+import copy
+import re
+import time
+
+
+class PublishPlanError(Exception):
+    """Generic PublishPlan Error."""
+
+
+class PublishPlan:
+    """A credential type registration compiled once for publishing.
+
+    Holds the template, never modified once compiled, and the parsed JSONPath
+    expressions of the registration. ``registration`` is shared with the
+    status list manager, which moves its ``status_lists`` pointer on rollover.
+    """
+
+    #: Registration fields read when publishing, the rest of the record is left in MongoDB.
+    projection = {
+        "type": True,
+        "version": True,
+        "issuer": True,
+        "template": True,
+        "core_paths": True,
+        "additional_type": True,
+        "additional_paths": True,
+        "status_lists": True,
+    }
+
+    def __init__(self, registration):
+        self.registration = registration
+        self.type = registration["type"]
+        self.version = registration["version"]
+        self.issuer = registration["issuer"]
+        self.additional_type = registration.get("additional_type")
+        self.template = registration["template"]
+        self.entity_id_path = parse(registration["core_paths"]["entityId"])
+        self.cardinality_id_path = parse(registration["core_paths"]["cardinalityId"])
+        self.additional_paths = {
+            attribute: parse(path)
+            for attribute, path in (registration.get("additional_paths") or {}).items()
+        }
+
+        # Only the template fields a publication writes into are copied for each credential
+        self.written_fields = {"credentialSubject"}
+        for path in (registration.get("additional_paths") or {}).values():
+            field = re.match(r"^\$\.([^.\[]+)", path)
+            self.written_fields.add(field.group(1) if field else None)
+
+    def new_credential(self):
+        if None in self.written_fields:
+            return copy.deepcopy(self.template)
+        return {
+            name: copy.deepcopy(value) if name in self.written_fields else value
+            for name, value in self.template.items()
+        }
+
+
+class PublishPlanCache:
+    """Compiled credential types of this worker, by credential type and version.
+
+    Publications name a type only, the version it currently resolves to is
+    read again once ``ttl`` seconds have passed or the type is registered
+    again on this worker, so registrations made on other workers are picked
+    up within that delay. A registered version never changes apart from its
+    ``status_lists``, which are refreshed on each read, so its plan is
+    compiled once.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.versions = {}
+        self.plans = {}
+
+    async def get(self, repositories, credential_type):
+        """Return the plan of the latest version of ``credential_type``, or ``None``."""
+        entry = self.versions.get(credential_type)
+        if entry and entry[0] > time.monotonic():
+            return self.plans[(credential_type, entry[1])]
+        registration = await repositories.credential_types.get(
+            credential_type, PublishPlan.projection
+        )
+        if not registration:
+            return None
+        key = (credential_type, registration["version"])
+        plan = self.plans.get(key)
+        if plan:
+            plan.registration["status_lists"] = registration["status_lists"]
+        else:
+            plan = self.plans[key] = PublishPlan(registration)
+        self.versions[credential_type] = (time.monotonic() + self.ttl, key[1])
+        return plan
+
+    def invalidate(self, credential_type):
+        self.versions.pop(credential_type, None)
+
+
+publish_plans = PublishPlanCache(settings.PUBLISH_PLAN_TTL)
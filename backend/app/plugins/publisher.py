@@ -0,0 +1,308 @@
+from config import settings
+from pydantic import ValidationError
+from app.models.mongodb import CredentialRecord
+from app.models.publications import Publication
+from app.plugins.http import DependencyUnavailableError
+from app.plugins.orgbook import OrgbookClient
+from app.plugins.publish_plans import publish_plans
+from app.plugins.registrar import PublisherRegistrar
+from app.plugins.status_list import BitstringStatusListError, status_list_manager
+from app.plugins.traction import TractionController
+from app.utils import generate_digest_multibase
+import asyncio
+import copy
+import uuid
+
+
+class BatchPublisherError(Exception):
+    """Generic BatchPublisher Error."""
+
+
+async def ndjson_lines(chunks, max_line_bytes):
+    """Split a byte stream into numbered lines, holding at most one line in memory.
+
+    Lines longer than ``max_line_bytes`` are discarded and yielded as ``None``.
+    """
+    # Each chunk is scanned once and each byte copied once into the pending line
+    buffer, number, oversized = bytearray(), 0, False
+    async for chunk in chunks:
+        view, start = memoryview(chunk), 0
+        while (end := chunk.find(b"\n", start)) >= 0:
+            if not oversized:
+                buffer += view[start:end]
+            number += 1
+            yield (
+                number,
+                None if oversized or len(buffer) > max_line_bytes else bytes(buffer),
+            )
+            buffer.clear()
+            oversized, start = False, end + 1
+        if not oversized:
+            buffer += view[start:]
+        if len(buffer) > max_line_bytes:
+            buffer.clear()
+            oversized = True
+    if oversized or buffer.strip():
+        yield number + 1, None if oversized else bytes(buffer)
+
+
+class BatchPublisher:
+    """Publish many credentials with one round trip per stage rather than per credential.
+
+    Publications are grouped by credential type: each ``CredentialTypeRecord``
+    is read once, status list indexes are reserved in one block per type,
+    unchanged credentials are found with a single query and all records are
+    written with a single ``bulk_write``. Signing runs with bounded concurrency.
+
+    Every publication gets its own result, a failure only affects its item.
+    """
+
+    def __init__(
+        self, repositories, concurrency=None, traction=None, orgbook=None, plans=None
+    ):
+        self.repositories = repositories
+        self.plans = plans or publish_plans
+        self.concurrency = concurrency or settings.PUBLISH_BATCH_CONCURRENCY
+        self.registrar = PublisherRegistrar(repositories)
+        self.traction = traction or TractionController()
+        self.orgbook = orgbook or OrgbookClient()
+
+    def _prepare(self, publication):
+        credential_input = publication["credential"]
+        options = publication["options"]
+        if not options.get("credentialId"):
+            options["credentialId"] = str(uuid.uuid4())
+        return {
+            "credential": credential_input,
+            "options": options,
+            "type": credential_input.get("type"),
+            "key": (
+                credential_input.get("type"),
+                options.get("entityId"),
+                options.get("cardinalityId"),
+            ),
+            "cardinality_hash": self.registrar.cardinality_hash(
+                credential_input=copy.deepcopy(credential_input), options=options
+            ),
+            "result": None,
+        }
+
+    @staticmethod
+    def _fail(item, status, detail):
+        item["result"] = {
+            "status": status,
+            "credentialId": item["options"]["credentialId"],
+            "detail": detail,
+        }
+
+    @staticmethod
+    def _pending(items):
+        return [item for item in items if not item["result"]]
+
+    async def _fetch_entity(self, entity_id):
+        try:
+            return await self.orgbook.fetch_buisness_info(entity_id)
+        except DependencyUnavailableError as error:
+            return error
+        except Exception:
+            return None
+
+    async def _lookup(self, items):
+        """Load credential types, OrgBook entities and unchanged credentials once each."""
+        credential_types = sorted({item["type"] for item in items})
+        entity_ids = sorted({item["key"][1] for item in items})
+        plans, entities, unchanged = await asyncio.gather(
+            asyncio.gather(
+                *[self.plans.get(self.repositories, type) for type in credential_types]
+            ),
+            asyncio.gather(
+                *[self._fetch_entity(entity_id) for entity_id in entity_ids]
+            ),
+            self.repositories.credentials.get_unchanged_many(
+                [item["key"] + (item["cardinality_hash"],) for item in items]
+            ),
+        )
+        plans = dict(zip(credential_types, plans))
+        entities = dict(zip(entity_ids, entities))
+
+        for item in items:
+            entity = entities[item["key"][1]]
+            unchanged_record = unchanged.get(item["key"] + (item["cardinality_hash"],))
+            if not plans[item["type"]]:
+                self._fail(item, 404, "Unregistered credential type")
+            elif isinstance(entity, DependencyUnavailableError):
+                self._fail(item, 503, str(entity))
+            elif not entity:
+                self._fail(
+                    item, 404, f"No orgbook registration found for {item['key'][1]}"
+                )
+            elif unchanged_record:
+                item["result"] = {
+                    "status": 200,
+                    "credentialId": unchanged_record["vc"]["id"],
+                }
+            else:
+                item["plan"] = plans[item["type"]]
+                item["entity"] = entity
+
+    async def _allocate(self, items):
+        """Reserve the status entries of each credential type in a single block."""
+        count = len(self.registrar.status_purposes)
+        groups = {}
+        for item in items:
+            groups.setdefault(item["type"], []).append(item)
+        for group in groups.values():
+            try:
+                endpoint, indexes = await status_list_manager.allocate(
+                    self.repositories, group[0]["plan"].registration, count * len(group)
+                )
+            except BitstringStatusListError as error:
+                for item in group:
+                    self._fail(item, 503, str(error))
+                continue
+            for position, item in enumerate(group):
+                item["status_entry"] = (
+                    endpoint,
+                    indexes[position * count : (position + 1) * count],
+                )
+
+    async def _format(self, item):
+        try:
+            item["formatted"] = await self.registrar.format_credential(
+                credential_input=copy.deepcopy(item["credential"]),
+                options=item["options"],
+                plan=item["plan"],
+                entity=item["entity"],
+                status_entry=item["status_entry"],
+            )
+        except Exception as error:
+            self._fail(item, 422, f"Could not format credential: {error}")
+
+    async def _sign(self, semaphore, item):
+        async with semaphore:
+            try:
+                vc = await self.traction.issue_vc(item["formatted"])
+                vc_jwt = await self.traction.sign_vc_jwt(vc) if vc else None
+            except DependencyUnavailableError as error:
+                self._fail(item, 503, str(error))
+                return
+            except Exception as error:
+                settings.LOGGER.warning(f"Issuance failed: {error!r}")
+                vc = vc_jwt = None
+        if not vc or not vc_jwt:
+            self._fail(
+                item,
+                500,
+                "Unexpected error occured while trying to issue the credential.",
+            )
+            return
+        item["vc"], item["vc_jwt"] = vc, vc_jwt
+
+    async def _store(self, items):
+        records = [
+            CredentialRecord(
+                id=item["options"]["credentialId"],
+                type=item["type"],
+                entity_id=item["key"][1],
+                cardinality_id=item["key"][2],
+                cardinality_hash=item["cardinality_hash"],
+                refresh=False,
+                revocation=False,
+                suspension=False,
+                vc=item["vc"],
+                vc_jwt=item["vc_jwt"],
+                digest=generate_digest_multibase(item["vc"]),
+            ).model_dump()
+            for item in items
+        ]
+        failed = await self.repositories.credentials.publish_many(records)
+        for item in items:
+            error = failed.get(item["options"]["credentialId"])
+            if error:
+                self._fail(item, 409, f"Credential record could not be stored: {error}")
+            else:
+                item["result"] = {"status": 201, "credentialId": item["vc"]["id"]}
+
+    async def publish(self, publications):
+        """Publish ``publications`` (dumped ``Publication`` models), returning one result each."""
+        items = [self._prepare(publication) for publication in publications]
+
+        # A batch may only issue one credential per cardinality and credential id
+        keys, credential_ids = set(), set()
+        for item in items:
+            if item["key"] in keys or item["options"]["credentialId"] in credential_ids:
+                self._fail(item, 409, "Duplicate publication in batch")
+            keys.add(item["key"])
+            credential_ids.add(item["options"]["credentialId"])
+
+        await self.traction.authorize()
+        await self._lookup(self._pending(items))
+        await self._allocate(self._pending(items))
+        await asyncio.gather(*[self._format(item) for item in self._pending(items)])
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(
+            *[self._sign(semaphore, item) for item in self._pending(items)]
+        )
+
+        await self._store(self._pending(items))
+        return [item["result"] for item in items]
+
+    def _parse(self, number, line):
+        if line is None:
+            return {
+                "line": number,
+                "status": 413,
+                "detail": f"Line exceeds {settings.PUBLISH_STREAM_MAX_LINE_BYTES} bytes.",
+            }
+        try:
+            publication = Publication.model_validate_json(line)
+        except ValidationError as error:
+            return {
+                "line": number,
+                "status": 422,
+                "detail": error.errors(
+                    include_url=False, include_context=False, include_input=False
+                ),
+            }
+        return {"line": number, "publication": publication.model_dump()}
+
+    async def publish_stream(self, lines, batch_size=None, queue_size=None):
+        """Publish numbered NDJSON lines in batches, yielding each line's result in order.
+
+        Lines are validated as they arrive. Once ``queue_size`` batches are
+        waiting on the signing stage the stream is no longer read, which holds
+        the upload back instead of buffering it.
+        """
+        batch_size = batch_size or settings.PUBLISH_STREAM_BATCH_SIZE
+        queue = asyncio.Queue(queue_size or settings.PUBLISH_STREAM_QUEUE_SIZE)
+
+        async def read():
+            batch = []
+            try:
+                async for number, line in lines:
+                    if line is not None and not line.strip():
+                        continue
+                    batch.append(self._parse(number, line))
+                    if len(batch) == batch_size:
+                        await queue.put(batch)
+                        batch = []
+                if batch:
+                    await queue.put(batch)
+            finally:
+                await queue.put(None)
+
+        reader = asyncio.create_task(read())
+        try:
+            while (batch := await queue.get()) is not None:
+                parsed = [entry for entry in batch if "publication" in entry]
+                results = await self.publish([entry["publication"] for entry in parsed])
+                for entry, result in zip(parsed, results):
+                    entry.update(result)
+                    entry.pop("publication")
+                for entry in batch:
+                    yield entry
+            # Surface a failed or disconnected upload
+            await reader
+        finally:
+            reader.cancel()
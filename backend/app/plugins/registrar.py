@@ -1,16 +1,18 @@
 from config import settings
 from fastapi import HTTPException
-import requests
 from app.models.did_document import DidDocument, VerificationMethod, Service
 from app.models.credential import Credential
-from app.plugins import MongoClient, TractionController
+from app.plugins import TractionController
+from app.plugins.repositories import get_repositories
 from app.plugins.orgbook import OrgbookClient
+from app.plugins.publish_plans import publish_plans
+from app.plugins.http import http_clients
+from app.plugins.status_list import status_list_manager
 from app.plugins.untp import DigitalConformityCredential
 from app.utils import multikey_to_jwk
 from base58 import b58encode
 import re
 from datetime import datetime, timezone
-from jsonpath_ng import parse
 from canonicaljson import encode_canonical_json
 import hashlib
 
@@ -19,7 +21,10 @@ class PublisherRegistrarError(Exception):
     """Generic PublisherRegistrar Error."""
 
 class PublisherRegistrar:
-    def __init__(self):
+    status_purposes = ["revocation", "suspension", "refresh"]
+
+    def __init__(self, repositories=None):
+        self.repositories = repositories or get_repositories()
         self.did_web_server = settings.DID_WEB_SERVER_URL
         self.publisher_multikey = settings.PUBLISHER_MULTIKEY
 
@@ -30,8 +35,10 @@ class PublisherRegistrar:
         identifier = registration.get("name").replace(" ", "-").lower()
 
         # Request identifier from TDW server
-        r = requests.get(
-            f"{self.did_web_server}?namespace={namespace}&identifier={identifier}"
+        did_web_server = http_clients.get("did_web_server")
+        r = await did_web_server.get(
+            self.did_web_server,
+            params={"namespace": namespace, "identifier": identifier},
         )
         try:
             did = r.json()["didDocument"]["id"]
@@ -44,19 +51,19 @@ class PublisherRegistrar:
         jwk_kid = f"{did}#{default_kid}-jwk"
 
         traction = TractionController()
-        traction.authorize()
+        await traction.authorize()
         try:
-            authorized_key = traction.get_multikey(did)
+            authorized_key = await traction.get_multikey(did)
             if not authorized_key:
-                authorized_key = traction.create_did_web(did)
-                traction.bind_key(authorized_key, multikey_kid)
+                authorized_key = await traction.create_did_web(did)
+                await traction.bind_key(authorized_key, multikey_kid)
             try:
-                traction.bind_key(authorized_key, multikey_kid)
+                await traction.bind_key(authorized_key, multikey_kid)
             except:
                 pass
         except:
-            authorized_key = traction.create_did_web(did)
-            traction.bind_key(authorized_key, multikey_kid)
+            authorized_key = await traction.create_did_web(did)
+            await traction.bind_key(authorized_key, multikey_kid)
 
         # Create initial DID document
         did_document = DidDocument(
@@ -128,7 +135,7 @@ class PublisherRegistrar:
         client_proof_options["verificationMethod"] = (
             f"did:key:{authorized_key}#{authorized_key}"
         )
-        signed_did_document = traction.add_di_proof(
+        signed_did_document = await traction.add_di_proof(
             document=did_document, 
             options=client_proof_options
         )
@@ -138,12 +145,14 @@ class PublisherRegistrar:
         publisher_proof_options["verificationMethod"] = (
             f"did:key:{self.publisher_multikey}#{self.publisher_multikey}"
         )
-        endorsed_did_document = traction.add_di_proof(
+        endorsed_did_document = await traction.add_di_proof(
             document=signed_did_document, 
             options=publisher_proof_options
         )
 
-        r = requests.post(self.did_web_server, json={"didDocument": endorsed_did_document})
+        r = await did_web_server.post(
+            self.did_web_server, json={"didDocument": endorsed_did_document}
+        )
         if r.status_code != 201:
             raise HTTPException(status_code=r.status_code, detail='Error registering DID.')
         # try:
@@ -173,10 +182,7 @@ class PublisherRegistrar:
         return did_document, authorized_key
 
     async def template_credential(self, credential_registration):
-        mongo = MongoClient()
-        issuer = mongo.find_one(
-            "IssuerRecord", {"id": credential_registration["issuer"]}
-        )
+        issuer = await self.repositories.issuers.get(credential_registration["issuer"])
         if not issuer:
             raise HTTPException(status_code=404, detail="Issuer not registered.")
         credential_type = credential_registration["type"]
@@ -200,7 +206,7 @@ class PublisherRegistrar:
                 credential_registration.get("additionalType")
                 == "DigitalConformityCredential"
             ):
-                credential_template = DigitalConformityCredential().extend_template(
+                credential_template = await DigitalConformityCredential().extend_template(
                     credential_registration=credential_registration,
                     credential_template=credential_template,
                 )
@@ -218,19 +224,22 @@ class PublisherRegistrar:
     # async def register_credential(self, credential_registration):
     #     return await self.template_credential(credential_registration)
 
-    async def format_credential(self, credential_input, options):
+    async def format_credential(
+        self,
+        credential_input,
+        options,
+        plan=None,
+        entity=None,
+        status_entry=None,
+    ):
         entity_id = options.get("entityId")
         cardinality_id = options.get("cardinalityId")
 
-        mongo = MongoClient()
         credential_type = credential_input.get("type")
-        # Do to, ensure it brings up the latest
-        credential_registration = mongo.find_one(
-            "CredentialTypeRecord", {"type": credential_type}
-        )
-        credential_template = credential_registration.get("template")
-
-        credential = credential_template.copy()
+        if not plan:
+            plan = await publish_plans.get(self.repositories, credential_type)
+        credential_template = plan.template
+        credential = plan.new_credential()
 
         # Identifier
         credential_id = options.get("credentialId")
@@ -245,26 +254,19 @@ class PublisherRegistrar:
 
         # Credential Subject
         credential["credentialSubject"] |= credential_input["credentialSubject"]
-        if credential_registration.get("additional_type"):
-            if (
-                credential_registration.get("additional_type")
-                == "DigitalConformityCredential"
-            ):
+        if plan.additional_type:
+            if plan.additional_type == "DigitalConformityCredential":
                 # Add issuedToParty information based on Orgbook entity data
-                entity = OrgbookClient().fetch_buisness_info(entity_id)
+                entity = entity or await OrgbookClient().fetch_buisness_info(entity_id)
                 credential["credentialSubject"]["issuedToParty"] |= {
                     "id": entity["id"],
                     "name": entity["name"],
                     "registeredId": entity_id,
                 }
 
-                if credential_registration.get("additional_paths"):
-                    # Add assessed data (product & facility)
-                    for attribute in credential_registration["additional_paths"]:
-                        value = options["additionalData"][attribute]
-                        path = credential_registration["additional_paths"][attribute]
-                        jsonpath_expr = parse(path)
-                        jsonpath_expr.update(credential, value)
+                # Add assessed data (product & facility)
+                for attribute, jsonpath_expr in plan.additional_paths.items():
+                    jsonpath_expr.update(credential, options["additionalData"][attribute])
 
         # Refresh Service
         credential["refreshService"] = [
@@ -275,33 +277,32 @@ class PublisherRegistrar:
         ]
 
         # Credential Status
-        status_list_id = credential_registration["status_lists"][-1]
-        status_list_record = mongo.find_one("StatusListRecord", {"id": status_list_id})
+        status_purposes = self.status_purposes
+        if status_entry is None:
+            status_entry = await status_list_manager.allocate(
+                self.repositories, plan.registration, len(status_purposes)
+            )
+        status_list_endpoint, status_list_indexes = status_entry
         credential["credentialStatus"] = [
             (
                 {
                     "type": "BitstringStatusListEntry",
                     "statusPurpose": purpose,
-                    "statusListIndex": str(status_list_record["indexes"].pop()),
-                    "statusListCredential": status_list_record["endpoint"],
+                    "statusListIndex": str(index),
+                    "statusListCredential": status_list_endpoint,
                 }
             )
-            for purpose in ["revocation", "suspension", "refresh"]
+            for purpose, index in zip(status_purposes, status_list_indexes)
         ]
-        mongo.replace("StatusListRecord", {"id": status_list_id}, status_list_record)
 
         # Validations
-        entity_id_path = parse(credential_registration["core_paths"]["entityId"])
-        cardinality_id_path = parse(
-            credential_registration["core_paths"]["cardinalityId"]
-        )
-        if [match.value for match in entity_id_path.find(credential)][0] != entity_id:
+        if [match.value for match in plan.entity_id_path.find(credential)][0] != entity_id:
             pass
-        if [match.value for match in cardinality_id_path.find(credential)][
+        if [match.value for match in plan.cardinality_id_path.find(credential)][
             0
         ] != cardinality_id:
             pass
-        if credential["issuer"]["id"] != credential_registration["issuer"]:
+        if credential["issuer"]["id"] != plan.issuer:
             pass
 
         credential = Credential(
@@ -320,39 +321,29 @@ class PublisherRegistrar:
 
         return credential
 
-    async def check_cardinality(self, credential_input, options):
+    def cardinality_hash(self, credential_input, options):
         if options.get("additionalData"):
             credential_input["credentialSubject"] |= options.get("additionalData")
 
         cardinality_hash = b58encode(hashlib.sha256(encode_canonical_json(credential_input)).digest()).decode()
         cardinality_hash = f'z{cardinality_hash}'
         settings.LOGGER.info(cardinality_hash)
+        return cardinality_hash
 
-        settings.LOGGER.info("Looking for existing credential records.")
-        mongo = MongoClient()
-        credential_collection = mongo.find(
-            "CredentialRecord",
-            {
-                "type": credential_input.get("type"),
-                "entity_id": options.get("entityId"),
-                "cardinality_id": options.get("cardinalityId"),
-                "refresh": False,
-            },
+    async def find_unchanged(self, credential_input, options, cardinality_hash):
+        """Return the current credential record if its content hash is unchanged."""
+        settings.LOGGER.info("Looking for an unchanged credential record.")
+        return await self.repositories.credentials.get_unchanged(
+            credential_input.get("type"),
+            options.get("entityId"),
+            options.get("cardinalityId"),
+            cardinality_hash,
         )
-        records_count = len(list(credential_collection.clone()))
-        settings.LOGGER.info(f"Found {records_count} matching records.")
-        if records_count >= 1:
-            for record in credential_collection:
-                if cardinality_hash == record.get("cardinality_hash"):
-                    settings.LOGGER.info("No change detected, keeping credential record.")
-                    return None
-                settings.LOGGER.info("Change detected, updating credential record.")
-                record['refresh'] = True
-                mongo.replace(
-                    "CredentialRecord",
-                    {"id": record.get("id")},
-                    record
-                )
-                record_id = record.get("id")
-                settings.LOGGER.info(f"Credential record {record_id} refresh status updated.")
-        return cardinality_hash
+
+    async def supersede(self, credential_input, options):
+        """Flag the current credential records for refresh ahead of a new issuance."""
+        superseded = await self.repositories.credentials.supersede(
+            credential_input.get("type"), options.get("entityId"), options.get("cardinalityId")
+        )
+        if superseded:
+            settings.LOGGER.info(f"Change detected, {superseded} credential records flagged for refresh.")
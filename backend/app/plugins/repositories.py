@@ -0,0 +1,373 @@
+import pymongo
+from pymongo import InsertOne, ReturnDocument, UpdateMany
+from app.plugins.mongodb import MongoClientError, mongo_connection
+
+
+class MongoRepository:
+    """Async access to one collection, through the worker's shared ``AsyncMongoClient``.
+
+    Each method covers one access pattern of the routers and plugins. Results
+    are plain documents without ``_id``; when several documents match, the most
+    recently inserted one wins.
+    """
+
+    collection = None
+    latest = [("_id", pymongo.DESCENDING)]
+
+    def __init__(self, db):
+        self.db = db[self.collection]
+
+    async def _find_one(self, query, projection=None):
+        return await self.db.find_one(
+            query, {"_id": False} | (projection or {}), sort=self.latest
+        )
+
+    async def _find(self, query, projection=None):
+        cursor = self.db.find(
+            query, {"_id": False} | (projection or {}), sort=self.latest
+        )
+        return await cursor.to_list()
+
+    async def _insert(self, record):
+        try:
+            await self.db.insert_one(record)
+        except pymongo.errors.DuplicateKeyError:
+            raise MongoClientError()
+
+
+class IssuerRepository(MongoRepository):
+    collection = "IssuerRecord"
+
+    async def list(self):
+        return await self._find({})
+
+    async def get(self, issuer_id):
+        return await self._find_one({"id": issuer_id})
+
+    async def create(self, issuer_record):
+        await self._insert(issuer_record)
+
+    async def set_secret_hash(self, issuer_id, secret_hash):
+        result = await self.db.update_one(
+            {"id": issuer_id}, {"$set": {"secret_hash": secret_hash}}
+        )
+        return result.matched_count
+
+
+class CredentialTypeRepository(MongoRepository):
+    collection = "CredentialTypeRecord"
+
+    async def get(self, credential_type, projection=None):
+        return await self._find_one({"type": credential_type}, projection)
+
+    async def create(self, credential_type_record):
+        await self._insert(credential_type_record)
+
+    async def get_resource(self, credential_type, version, resource):
+        return await self._find_one(
+            {"type": credential_type, "version": version}, {resource: True}
+        )
+
+    async def get_resource_digest(self, credential_type, version, resource):
+        record = await self._find_one(
+            {"type": credential_type, "version": version}, {f"{resource}_digest": True}
+        )
+        return record.get(f"{resource}_digest") if record else None
+
+    async def get_status_lists(self, credential_type, version):
+        record = await self._find_one(
+            {"type": credential_type, "version": version}, {"status_lists": True}
+        )
+        return record["status_lists"]
+
+    async def append_status_list(
+        self, credential_type, version, position, status_list_id
+    ):
+        """Append a status list, unless another one already holds ``position``."""
+        result = await self.db.update_one(
+            {
+                "type": credential_type,
+                "version": version,
+                f"status_lists.{position}": {"$exists": False},
+            },
+            {"$push": {"status_lists": status_list_id}},
+        )
+        return result.modified_count
+
+
+class CredentialRepository(MongoRepository):
+    collection = "CredentialRecord"
+
+    async def get(self, credential_id, projection=None):
+        return await self._find_one({"id": credential_id}, projection)
+
+    async def get_digest(self, credential_id):
+        record = await self._find_one({"id": credential_id}, {"digest": True})
+        return record.get("digest") if record else None
+
+    async def find_by_ids(self, credential_ids, projection=None):
+        return await self._find({"id": {"$in": credential_ids}}, projection)
+
+    def _current(self, credential_type, entity_id, cardinality_id):
+        return {
+            "type": credential_type,
+            "entity_id": entity_id,
+            "cardinality_id": cardinality_id,
+            "refresh": False,
+        }
+
+    async def get_current(
+        self, credential_type, entity_id, cardinality_id, projection=None
+    ):
+        """The credential currently issued for an entity and cardinality."""
+        return await self._find_one(
+            self._current(credential_type, entity_id, cardinality_id), projection
+        )
+
+    async def get_unchanged(
+        self, credential_type, entity_id, cardinality_id, cardinality_hash
+    ):
+        """The current credential if its content hash matches, projected to its id."""
+        return await self._find_one(
+            self._current(credential_type, entity_id, cardinality_id)
+            | {"cardinality_hash": cardinality_hash},
+            {"id": True, "vc.id": True},
+        )
+
+    async def get_unchanged_many(self, keys):
+        """Current credentials matching any ``(type, entity, cardinality, hash)`` key, in one query."""
+        if not keys:
+            return {}
+        records = await self._find(
+            {
+                "$or": [
+                    self._current(credential_type, entity_id, cardinality_id)
+                    | {"cardinality_hash": cardinality_hash}
+                    for credential_type, entity_id, cardinality_id, cardinality_hash in keys
+                ]
+            },
+            {
+                "type": True,
+                "entity_id": True,
+                "cardinality_id": True,
+                "cardinality_hash": True,
+                "id": True,
+                "vc.id": True,
+            },
+        )
+        unchanged = {}
+        for record in records:
+            key = (
+                record["type"],
+                record["entity_id"],
+                record["cardinality_id"],
+                record["cardinality_hash"],
+            )
+            unchanged.setdefault(key, record)
+        return unchanged
+
+    async def supersede(self, credential_type, entity_id, cardinality_id):
+        """Flag every current credential for refresh, returning how many were."""
+        result = await self.db.update_many(
+            self._current(credential_type, entity_id, cardinality_id),
+            {"$set": {"refresh": True}},
+        )
+        return result.modified_count
+
+    async def create(self, credential_record):
+        await self._insert(credential_record)
+
+    async def publish_many(self, credential_records):
+        """Supersede and insert many credentials in a single unordered ``bulk_write``.
+
+        Returns the error message of each credential id whose writes failed.
+        """
+        operations = []
+        for record in credential_records:
+            operations += [
+                UpdateMany(
+                    self._current(
+                        record["type"], record["entity_id"], record["cardinality_id"]
+                    )
+                    | {"id": {"$ne": record["id"]}},
+                    {"$set": {"refresh": True}},
+                ),
+                InsertOne(record),
+            ]
+        if not operations:
+            return {}
+        try:
+            await self.db.bulk_write(operations, ordered=False)
+        except pymongo.errors.BulkWriteError as error:
+            return {
+                credential_records[write_error["index"] // 2]["id"]: write_error[
+                    "errmsg"
+                ]
+                for write_error in error.details.get("writeErrors", [])
+            }
+        return {}
+
+    async def set_status(self, credential_ids, status_purpose, value):
+        result = await self.db.update_many(
+            {"id": {"$in": credential_ids}}, {"$set": {status_purpose: value}}
+        )
+        return result.modified_count
+
+
+class StatusListRepository(MongoRepository):
+    collection = "StatusListRecord"
+
+    async def get(self, status_list_id, projection=None):
+        return await self._find_one({"id": status_list_id}, projection)
+
+    async def get_by_endpoint(self, endpoint, projection=None):
+        return await self._find_one({"endpoint": endpoint}, projection)
+
+    async def create(self, status_list_record):
+        await self._insert(status_list_record)
+
+    async def delete(self, status_list_id):
+        await self.db.delete_one({"id": status_list_id})
+
+    async def reserve(self, status_list_id, count):
+        """Atomically advance the allocation counter by ``count``, if the list has room."""
+        return await self.db.find_one_and_update(
+            {
+                "id": status_list_id,
+                "key": {"$exists": True},
+                "$expr": {"$lte": [{"$add": ["$counter", count]}, "$length"]},
+            },
+            {"$inc": {"counter": count}},
+            {
+                "_id": False,
+                "key": True,
+                "length": True,
+                "counter": True,
+                "endpoint": True,
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def pop_indexes(self, status_list_id, count):
+        """Pop ``count`` indexes at once from a list registered before keyed allocation.
+
+        Nothing is popped unless the list still holds ``count`` indexes.
+        """
+        remaining = {"$subtract": [{"$size": "$indexes"}, count]}
+        return await self.db.find_one_and_update(
+            {
+                "id": status_list_id,
+                "key": {"$exists": False},
+                f"indexes.{count - 1}": {"$exists": True},
+            },
+            [
+                {
+                    "$set": {
+                        "indexes": {
+                            "$cond": [
+                                {"$gt": [remaining, 0]},
+                                {"$slice": ["$indexes", 0, remaining]},
+                                [],
+                            ]
+                        }
+                    }
+                }
+            ],
+            {"_id": False, "endpoint": True, "indexes": {"$slice": -count}},
+            return_document=ReturnDocument.BEFORE,
+        )
+
+    async def set_bitstring(self, status_list_id, revision, bitstring):
+        """Store a new bitset if the list is still at ``revision``."""
+        result = await self.db.update_one(
+            {"id": status_list_id, "revision": revision},
+            {"$set": {"bitstring": bitstring, "dirty": True}, "$inc": {"revision": 1}},
+        )
+        return result.modified_count
+
+    async def set_encoded_list(self, status_list_id, revision, encoded_list):
+        """Persist the encoded list of ``revision``, clearing the dirty flag."""
+        result = await self.db.update_one(
+            {"id": status_list_id, "revision": revision},
+            {
+                "$set": {
+                    "credential.credentialSubject.encodedList": encoded_list,
+                    "dirty": False,
+                }
+            },
+        )
+        return result.modified_count
+
+
+class PublishJobRepository(MongoRepository):
+    collection = "PublishJobRecord"
+
+    async def get(self, job_id):
+        return await self._find_one({"id": job_id})
+
+    async def create(self, job_record):
+        await self._insert(job_record)
+
+    async def claim(self, now, lease, lease_id, max_attempts, updated):
+        """Lease the oldest available job, including running jobs whose lease has ended.
+
+        Jobs that already had ``max_attempts`` attempts are left to ``fail_exhausted``.
+        """
+        return await self.db.find_one_and_update(
+            {
+                "status": {"$in": ["queued", "running"]},
+                "available": {"$lte": now},
+                "attempts": {"$lt": max_attempts},
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "available": now + lease,
+                    "lease_id": lease_id,
+                    "updated": updated,
+                },
+                "$inc": {"attempts": 1},
+            },
+            {"_id": False},
+            sort=[("available", pymongo.ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def fail_exhausted(self, now, max_attempts, result, updated):
+        """Fail running jobs whose last allowed attempt ended without finishing."""
+        written = await self.db.update_many(
+            {
+                "status": "running",
+                "available": {"$lte": now},
+                "attempts": {"$gte": max_attempts},
+            },
+            {"$set": {"status": "failed", "result": result, "updated": updated}},
+        )
+        return written.modified_count
+
+    async def finish(self, job_id, lease_id, status, result, updated, available=None):
+        """Record an attempt's outcome, ``available`` requeues the job for another attempt.
+
+        Nothing is written unless the job is still leased under ``lease_id``.
+        """
+        update = {"status": status, "result": result, "updated": updated}
+        if available is not None:
+            update["available"] = available
+        written = await self.db.update_one(
+            {"id": job_id, "status": "running", "lease_id": lease_id}, {"$set": update}
+        )
+        return written.modified_count
+
+
+class Repositories:
+    def __init__(self, db):
+        self.issuers = IssuerRepository(db)
+        self.credential_types = CredentialTypeRepository(db)
+        self.credentials = CredentialRepository(db)
+        self.status_lists = StatusListRepository(db)
+        self.jobs = PublishJobRepository(db)
+
+
+def get_repositories():
+    """Request dependency handing out the repositories on the shared async client."""
+    return Repositories(mongo_connection.open_async()["orgbook-publisher"])
@@ -1,13 +1,17 @@
 from bs4 import BeautifulSoup
-import requests
+from app.plugins.http import http_clients
 from datetime import datetime
 
 
 class Soup:
-    def __init__(self, url):
+    def __init__(self, url, html):
         self.url = url
-        r = requests.get(url)
-        self.soup = BeautifulSoup(r.text, "html.parser")
+        self.soup = BeautifulSoup(html, "html.parser")
+
+    @classmethod
+    async def fetch(cls, url):
+        r = await http_clients.get("resources").get(url)
+        return cls(url, r.text)
 
     def governance_info(self):
         title = self.soup.title.name
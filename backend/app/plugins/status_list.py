@@ -1,35 +1,423 @@
-import requests, random
+import jwt
 from config import settings
-from bitstring import BitArray
-import gzip, base64
+from app.models.mongodb import StatusListRecord
+from app.plugins.http import http_clients
+import asyncio, gzip, base64, hashlib, secrets, time, uuid
+from datetime import datetime
 
 
 class BitstringStatusListError(Exception):
     """Generic BitstringStatusList Error."""
 
+
+class Bitstring:
+    """Packed status list bitstring backed by a ``bytearray``.
+
+    Index 0 is the left-most (most significant) bit of the first byte, as
+    required by the bitstring generation algorithm.
+    """
+
+    def __init__(self, length=None, buffer=None):
+        if buffer is None:
+            if not length or length < 1:
+                raise BitstringStatusListError("Bitstring length must be positive.")
+            buffer = bytearray((length + 7) // 8)
+        self.buffer = bytearray(buffer)
+        self.length = length or len(self.buffer) * 8
+        if self.length > len(self.buffer) * 8:
+            raise BitstringStatusListError("Bitstring length exceeds buffer size.")
+
+    def __len__(self):
+        return self.length
+
+    def _locate(self, index):
+        if not 0 <= index < self.length:
+            raise BitstringStatusListError(f"Status list index {index} out of range.")
+        return index >> 3, 0x80 >> (index & 7)
+
+    def get(self, index):
+        position, mask = self._locate(index)
+        return bool(self.buffer[position] & mask)
+
+    def set(self, index, value=True):
+        position, mask = self._locate(index)
+        if value:
+            self.buffer[position] |= mask
+        else:
+            self.buffer[position] &= ~mask & 0xFF
+
+    def to_bytes(self):
+        return bytes(self.buffer)
+
+    def encode(self):
+        # https://www.w3.org/TR/vc-bitstring-status-list/#bitstring-generation-algorithm
+        compressed = gzip.compress(memoryview(self.buffer))
+        return base64.urlsafe_b64encode(compressed).decode("utf-8").rstrip("=")
+
+    @classmethod
+    def decode(cls, encoded_list):
+        # https://www.w3.org/TR/vc-bitstring-status-list/#bitstring-expansion-algorithm
+        encoded_list = encoded_list.removeprefix("u")
+        compressed = base64.urlsafe_b64decode(encoded_list + "=" * (-len(encoded_list) % 4))
+        return cls(buffer=gzip.decompress(compressed))
+
+
+class StatusListIndexAllocator:
+    """Keyed pseudo-random permutation of the indexes of a status list.
+
+    A balanced Feistel network keyed with the status list secret maps each
+    allocation counter value to a distinct index, cycle-walking values that
+    fall outside of the list length. Only the key and counter need to be
+    persisted to hand out indexes in an unpredictable order.
+    """
+
+    rounds = 4
+
+    def __init__(self, key, length):
+        self.key = bytes.fromhex(key)
+        self.length = length
+        self.half_bits = (max((length - 1).bit_length(), 2) + 1) // 2
+        self.half_mask = (1 << self.half_bits) - 1
+
+    @staticmethod
+    def generate_key():
+        return secrets.token_hex(32)
+
+    def _round(self, round, value):
+        digest = hashlib.blake2b(
+            bytes([round]) + value.to_bytes(8, "big"), key=self.key, digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "big") & self.half_mask
+
+    def _permute(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for round in range(self.rounds):
+            left, right = right, left ^ self._round(round, right)
+        return (left << self.half_bits) | right
+
+    def index(self, counter):
+        if not 0 <= counter < self.length:
+            raise BitstringStatusListError("Status list has no index left to allocate.")
+        value = self._permute(counter)
+        while value >= self.length:
+            value = self._permute(value)
+        return value
+
+
+class StatusListIndexPool:
+    """Per-worker cache of status list indexes reserved in blocks.
+
+    Blocks are claimed with a single atomic update of the ``StatusListRecord``
+    so concurrent workers never receive overlapping indexes. Indexes left in a
+    block when a worker stops are never issued.
+    """
+
+    def __init__(self, block_size=1):
+        self.block_size = block_size
+        self.blocks = {}
+        self.utilization = {}
+        self.lock = asyncio.Lock()
+
+    async def reserve(self, status_lists, status_list_id, count):
+        """Atomically claim ``count`` indexes from a status list record."""
+        record = await status_lists.reserve(status_list_id, count)
+        if record:
+            self.utilization[status_list_id] = record["counter"] / record["length"]
+            allocator = StatusListIndexAllocator(record["key"], record["length"])
+            return record["endpoint"], [
+                allocator.index(counter)
+                for counter in range(record["counter"] - count, record["counter"])
+            ]
+
+        # Lists registered before keyed allocation carry their shuffled indexes
+        record = await status_lists.pop_indexes(status_list_id, count)
+        if not record:
+            raise BitstringStatusListError("Status list has no index left to allocate.")
+        return record["endpoint"], record["indexes"]
+
+    async def take(self, status_lists, status_list_id, count):
+        """Hand out ``count`` indexes, reserving a new block when needed."""
+        async with self.lock:
+            endpoint, indexes = self.blocks.get(status_list_id, (None, []))
+            if len(indexes) < count:
+                missing = count - len(indexes)
+                try:
+                    endpoint, reserved = await self.reserve(
+                        status_lists, status_list_id, max(missing, self.block_size)
+                    )
+                except BitstringStatusListError:
+                    endpoint, reserved = await self.reserve(
+                        status_lists, status_list_id, missing
+                    )
+                indexes = indexes + reserved
+            self.blocks[status_list_id] = (endpoint, indexes[count:])
+            return endpoint, indexes[:count]
+
+
+class StatusListManager:
+    """Allocate status list entries for credential types and roll lists over.
+
+    Once the current list of a credential type passes ``rollover_threshold``
+    utilization, its successor is created in the background and appended to
+    ``CredentialTypeRecord.status_lists``. Publishes keep drawing indexes from
+    the current list until it is exhausted, then move on to the successor
+    without waiting on a new list. Status changes are applied per list and
+    drop the signed copies held in ``signed_cache``.
+    """
+
+    def __init__(self, pool, signed_cache, length, rollover_threshold):
+        self.pool = pool
+        self.signed_cache = signed_cache
+        self.length = length
+        self.rollover_threshold = rollover_threshold
+        self.rolling_over = set()
+        self.exhausted = set()
+        self.tasks = set()
+
+    async def create_list(self, repositories, issuer, credential_type=None, version=None):
+        status_list_id = str(uuid.uuid4())
+        bitstring = Bitstring(self.length)
+        status_list_credential = await BitstringStatusList().create(
+            issuer=issuer,
+            purpose=["revocation", "suspension", "refresh"],
+            bitstring=bitstring,
+        )
+        await repositories.status_lists.create(
+            StatusListRecord(
+                id=status_list_id,
+                type=credential_type,
+                version=version,
+                active=True,
+                length=self.length,
+                key=StatusListIndexAllocator.generate_key(),
+                counter=0,
+                revision=0,
+                bitstring=bitstring.to_bytes(),
+                dirty=False,
+                endpoint=f"https://{settings.DOMAIN}/credentials/status/{status_list_id}",
+                credential=status_list_credential,
+            ).model_dump(),
+        )
+        return status_list_id
+
+    async def rollover(self, repositories, credential_registration, status_list_id):
+        """Return the successor of ``status_list_id``, creating it if no worker has yet."""
+        credential_type = credential_registration["type"]
+        version = credential_registration["version"]
+        status_lists = await repositories.credential_types.get_status_lists(
+            credential_type, version
+        )
+        position = status_lists.index(status_list_id) + 1
+        if position < len(status_lists):
+            return status_lists[position]
+
+        settings.LOGGER.info(f"Rolling over status list {status_list_id}.")
+        next_status_list_id = await self.create_list(
+            repositories,
+            issuer=credential_registration["issuer"],
+            credential_type=credential_type,
+            version=version,
+        )
+        appended = await repositories.credential_types.append_status_list(
+            credential_type, version, position, next_status_list_id
+        )
+        if not appended:
+            # Another worker appended its own successor first
+            await repositories.status_lists.delete(next_status_list_id)
+            status_lists = await repositories.credential_types.get_status_lists(
+                credential_type, version
+            )
+            return status_lists[position]
+        return next_status_list_id
+
+    async def set_status(self, repositories, endpoint, indexes, value, retries=5):
+        """Set the bits at ``indexes`` of a status list in a single write.
+
+        Only the raw bitset is written and the record is flagged ``dirty``;
+        ``encodedList`` is regenerated when the list is next requested. The
+        write is conditional on the record ``revision`` so concurrent updates
+        are retried rather than lost.
+        """
+        status_lists = repositories.status_lists
+        for _ in range(retries):
+            record = await status_lists.get_by_endpoint(
+                endpoint,
+                {"id": True, "revision": True, "length": True, "bitstring": True},
+            )
+            if not record:
+                raise BitstringStatusListError(f"Unknown status list {endpoint}.")
+            if record.get("bitstring") is None:
+                # Lists created before binary storage only hold the encoded list
+                record = await status_lists.get_by_endpoint(
+                    endpoint, {"id": True, "revision": True, "credential": True}
+                )
+                bitstring = Bitstring.decode(
+                    record["credential"]["credentialSubject"]["encodedList"]
+                )
+            else:
+                bitstring = Bitstring(record.get("length"), record["bitstring"])
+            for index in indexes:
+                bitstring.set(index, value)
+            updated = await status_lists.set_bitstring(
+                record["id"], record.get("revision"), bitstring.to_bytes()
+            )
+            if updated:
+                self.signed_cache.invalidate(record["id"])
+                return record["id"]
+        raise BitstringStatusListError(f"Concurrent updates on status list {endpoint}.")
+
+    async def get_credential(self, repositories, status_list_id):
+        """Return the unsigned status list credential, encoding pending bit changes."""
+        record = await repositories.status_lists.get(
+            status_list_id,
+            {
+                "revision": True,
+                "length": True,
+                "dirty": True,
+                "bitstring": True,
+                "credential": True,
+            },
+        )
+        if not record:
+            return None
+        status_list_credential = record["credential"]
+        if record.get("dirty"):
+            encoded_list = Bitstring(record.get("length"), record["bitstring"]).encode()
+            status_list_credential["credentialSubject"]["encodedList"] = encoded_list
+            # A newer revision stays dirty and is encoded by its next reader
+            await repositories.status_lists.set_encoded_list(
+                status_list_id, record.get("revision"), encoded_list
+            )
+        return status_list_credential
+
+    @staticmethod
+    def _advance(credential_registration, status_list_id):
+        # Registrations may be cached, make the successor known to later allocations
+        if status_list_id not in credential_registration["status_lists"]:
+            credential_registration["status_lists"].append(status_list_id)
+
+    def _current(self, credential_registration):
+        # A successor is only drawn from once its predecessor is exhausted,
+        # so only the last two lists of a credential type can have room left
+        status_lists = credential_registration["status_lists"]
+        for status_list_id in status_lists[-2:]:
+            if status_list_id not in self.exhausted:
+                return status_list_id
+        return status_lists[-1]
+
+    async def _rollover_in_background(self, repositories, credential_registration, status_list_id):
+        try:
+            self._advance(
+                credential_registration,
+                await self.rollover(repositories, credential_registration, status_list_id),
+            )
+        except Exception as error:
+            settings.LOGGER.warning(f"Status list {status_list_id} rollover failed: {error}")
+            self.rolling_over.discard(status_list_id)
+
+    async def allocate(self, repositories, credential_registration, count):
+        """Reserve ``count`` indexes on the current status list of a credential type."""
+        status_list_id = self._current(credential_registration)
+        try:
+            endpoint, indexes = await self.pool.take(
+                repositories.status_lists, status_list_id, count
+            )
+        except BitstringStatusListError:
+            # The current list is exhausted, continue on its successor, created
+            # here if the background rollover hasn't done it yet
+            self.exhausted.add(status_list_id)
+            status_list_id = await self.rollover(
+                repositories, credential_registration, status_list_id
+            )
+            self._advance(credential_registration, status_list_id)
+            endpoint, indexes = await self.pool.take(
+                repositories.status_lists, status_list_id, count
+            )
+
+        if (
+            self.pool.utilization.get(status_list_id, 0) >= self.rollover_threshold
+            and status_list_id not in self.rolling_over
+        ):
+            self.rolling_over.add(status_list_id)
+            task = asyncio.create_task(
+                self._rollover_in_background(
+                    repositories, credential_registration, status_list_id
+                )
+            )
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+        return endpoint, indexes
+
+
+class SignedStatusListCache:
+    """Signed status list credentials reused until shortly before ``validUntil``.
+
+    Entries are keyed by status list id, purpose and media type, and tagged
+    with the record ``revision`` so a bit change in any worker invalidates
+    them. Within ``refresh_margin`` seconds of expiry the cached document is
+    still served while a new one is signed in the background.
+    """
+
+    expiry_margin = 10
+
+    def __init__(self, refresh_margin):
+        self.refresh_margin = refresh_margin
+        self.entries = {}
+        self.refreshing = set()
+        self.tasks = set()
+
+    async def _sign(self, key, revision, sign):
+        document, valid_until = await sign()
+        if document:
+            self.entries[key] = (revision, valid_until, document)
+        return document, valid_until
+
+    async def _refresh_in_background(self, key, revision, sign):
+        try:
+            await self._sign(key, revision, sign)
+        except Exception as error:
+            settings.LOGGER.warning(f"Status list {key[0]} re-signing failed: {error}")
+        finally:
+            self.refreshing.discard(key)
+
+    async def get(self, key, revision, sign):
+        """Return the cached document for ``key`` and its ``validUntil``, or sign a new one.
+
+        ``sign`` is a coroutine function returning the signed document and its
+        ``validUntil`` as a POSIX timestamp.
+        """
+        entry = self.entries.get(key)
+        now = time.time()
+        if not entry or entry[0] != revision or now >= entry[1] - self.expiry_margin:
+            return await self._sign(key, revision, sign)
+
+        if now >= entry[1] - self.refresh_margin and key not in self.refreshing:
+            self.refreshing.add(key)
+            task = asyncio.create_task(self._refresh_in_background(key, revision, sign))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return entry[2], entry[1]
+
+    def invalidate(self, status_list_id):
+        for key in [key for key in self.entries if key[0] == status_list_id]:
+            self.entries.pop(key, None)
+
+
 class BitstringStatusList:
     def __init__(self):
         # self.store = AskarStorage()
         self.length = 200000
 
     def generate(self, bitstring):
-        # https://www.w3.org/TR/vc-bitstring-status-list/#bitstring-generation-algorithm
-        statusListBitarray = BitArray(bin=bitstring)
-        statusListCompressed = gzip.compress(statusListBitarray.bytes)
-        statusList_encoded = (
-            base64.urlsafe_b64encode(statusListCompressed).decode("utf-8").rstrip("=")
-        )
-        return statusList_encoded
+        return bitstring.encode()
 
     def expand(self, encoded_list):
-        # https://www.w3.org/TR/vc-bitstring-status-list/#bitstring-expansion-algorithm
-        statusListCompressed = base64.urlsafe_b64decode(encoded_list)
-        statusListBytes = gzip.decompress(statusListCompressed)
-        statusListBitarray = BitArray(bytes=statusListBytes)
-        statusListBitstring = statusListBitarray.bin
-        return statusListBitstring
+        return Bitstring.decode(encoded_list)
 
-    async def create(self, id=None, issuer=None, purpose="revocation", length=200000):
+    async def create(
+        self, id=None, issuer=None, purpose="revocation", length=200000, bitstring=None
+    ):
         # https://www.w3.org/TR/vc-bitstring-status-list/#example-example-bitstringstatuslistcredential
         status_list_credential = {
             "@context": [
@@ -38,7 +426,7 @@ class BitstringStatusList:
             "type": ["VerifiableCredential", "BitstringStatusListCredential"],
             "credentialSubject": {
                 "type": "BitstringStatusList",
-                "encodedList": self.generate(str(0) * length),
+                "encodedList": self.generate(bitstring or Bitstring(length)),
                 "statusPurpose": purpose,
             },
         }
@@ -49,56 +437,120 @@ class BitstringStatusList:
 
         return status_list_credential
 
-    def get_credential_status(self, vc):
-        # https://www.w3.org/TR/vc-bitstring-status-list/#validate-algorithm
-        statusListIndex = int(vc["credentialStatus"]["statusListIndex"])
-        statusListCredentialUri = vc["credentialStatus"]["statusListCredential"]
+    async def get_credential_status(self, vc):
+        return (await status_list_checker.check([vc]))[0]
+
 
-        r = requests.get(statusListCredentialUri)
-        statusListCredential = r.json()
-        statusListBitstring = self.expand(
-            statusListCredential["credentialSubject"]["encodedList"]
+class StatusListChecker:
+    """Verifier side status checks over batches of credentials.
+
+    Each distinct status list credential is fetched once and kept decoded in
+    memory until its ``validUntil`` (or for ``ttl`` seconds when it has none),
+    so every status entry is answered with a single bit probe. At most
+    ``max_lists`` lists are kept. Proofs on the status list credentials are
+    not verified here.
+    """
+
+    def __init__(self, ttl, max_lists):
+        self.ttl = ttl
+        self.max_lists = max_lists
+        self.lists = {}
+        self.fetching = {}
+
+    def _store(self, uri, expires, bitstring):
+        now = time.time()
+        for expired in [key for key, cached in self.lists.items() if now >= cached[0]]:
+            del self.lists[expired]
+        self.lists.pop(uri, None)
+        while len(self.lists) >= self.max_lists:
+            del self.lists[next(iter(self.lists))]
+        self.lists[uri] = (expires, bitstring)
+
+    async def _fetch(self, client, uri):
+        r = await client.get(
+            uri, headers={"Accept": "application/vc, application/vc+jwt"}
         )
-        statusList = list(statusListBitstring)
-        credentialStatusBit = statusList[statusListIndex]
-        return True if credentialStatusBit == "1" else False
-
-
-#     async def change_credential_status(self, vc, statusBit, did_label, statusListCredentialId):
-#         statusList_index = vc["credentialStatus"]["statusListIndex"]
-
-#         dataKey = askar.statusCredentialDataKey(did_label, statusListCredentialId)
-#         statusListCredential = await askar.fetch_data(settings.ASKAR_PUBLIC_STORE_KEY, dataKey)
-#         statusListEncoded = statusListCredential["credentialSubject"]["encodedList"]
-#         statusListBitstring = self.expand(statusListEncoded)
-#         statusList = list(statusListBitstring)
-
-#         statusList[statusList_index] = statusBit
-#         statusListBitstring = "".join(statusList)
-#         statusListEncoded = self.generate(statusListBitstring)
-
-#         statusListCredential["credentialSubject"]["encodedList"] = statusListEncoded
-
-#         did = vc["issuer"] if isinstance(vc["issuer"], str) else vc["issuer"]["id"]
-#         verkey = agent.get_verkey(did)
-#         options = {
-#             "verificationMethod": f"{did}#verkey",
-#             "proofPurpose": "AssertionMethod",
-#         }
-#         # Remove old proof
-#         statusListCredential.pop("proof")
-#         statusListCredential = agent.sign_json_ld(statusListCredential, options, verkey)
-
-#         return statusListCredential
-
-
-# async def get_status_list_credential(did_label, statusListCredentialId):
-#     try:
-#         dataKey = askar.statusCredentialDataKey(did_label, statusListCredentialId)
-#         statusListCredential = await askar.fetch_data(settings.ASKAR_PUBLIC_STORE_KEY, dataKey)
-#     except:
-#         return ValidationException(
-#             status_code=404,
-#             content={"message": "Status list not found"},
-#         )
-#     return statusListCredential
+        r.raise_for_status()
+        if r.headers.get("content-type", "").startswith("application/vc+jwt"):
+            status_list_credential = jwt.decode(
+                r.text, options={"verify_signature": False}
+            )
+        else:
+            status_list_credential = r.json()
+
+        expires = time.time() + self.ttl
+        if status_list_credential.get("validUntil"):
+            expires = datetime.fromisoformat(
+                status_list_credential["validUntil"]
+            ).timestamp()
+        bitstring = Bitstring.decode(
+            status_list_credential["credentialSubject"]["encodedList"]
+        )
+        self._store(uri, expires, bitstring)
+        return bitstring
+
+    async def get_list(self, client, uri):
+        cached = self.lists.get(uri)
+        if cached and time.time() < cached[0]:
+            return cached[1]
+        if uri not in self.fetching:
+            self.fetching[uri] = asyncio.ensure_future(self._fetch(client, uri))
+            self.fetching[uri].add_done_callback(lambda _: self.fetching.pop(uri, None))
+        return await self.fetching[uri]
+
+    async def check(self, credentials, client=None):
+        """Return the ``{statusPurpose: bool}`` status of each credential.
+
+        A purpose maps to ``None`` when its status list could not be fetched
+        or its entry does not reference one.
+        """
+        entries = []
+        for credential in credentials:
+            credential_status = credential.get("credentialStatus") or []
+            if isinstance(credential_status, dict):
+                credential_status = [credential_status]
+            entries.append(credential_status)
+
+        uris = list(
+            {
+                entry["statusListCredential"]
+                for status in entries
+                for entry in status
+                if entry.get("statusListCredential")
+            }
+        )
+        client = client or http_clients.get("status_lists")
+        fetched = await asyncio.gather(
+            *[self.get_list(client, uri) for uri in uris], return_exceptions=True
+        )
+        status_lists = {}
+        for uri, bitstring in zip(uris, fetched):
+            if isinstance(bitstring, Exception):
+                settings.LOGGER.warning(f"Could not fetch status list {uri}: {bitstring}")
+                continue
+            status_lists[uri] = bitstring
+
+        results = []
+        for status in entries:
+            result = {}
+            for entry in status:
+                bitstring = status_lists.get(entry.get("statusListCredential"))
+                index = entry.get("statusListIndex")
+                result[entry.get("statusPurpose")] = (
+                    bitstring.get(int(index)) if bitstring and index is not None else None
+                )
+            results.append(result)
+        return results
+
+
+status_list_pool = StatusListIndexPool(settings.STATUS_LIST_RESERVATION_BLOCK)
+signed_status_list_cache = SignedStatusListCache(settings.STATUS_LIST_REFRESH_SECONDS)
+status_list_checker = StatusListChecker(
+    settings.STATUS_LIST_CHECK_TTL, settings.STATUS_LIST_CHECK_MAX_LISTS
+)
+status_list_manager = StatusListManager(
+    status_list_pool,
+    signed_status_list_cache,
+    settings.STATUS_LIST_LENGTH,
+    settings.STATUS_LIST_ROLLOVER_THRESHOLD,
+)
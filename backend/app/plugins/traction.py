@@ -1,17 +1,87 @@
 from config import settings
-import requests
 from fastapi import HTTPException
-from app.utils import verkey_to_multikey, timestamp
+from app.utils import verkey_to_multikey, timestamp, generate_digest_multibase
 from app.plugins.mongodb import MongoClient
-import httpx
-from app.models.mongodb import IssuerRecord
+from app.plugins.http import http_clients
+from app.plugins.data_integrity import local_signer, local_verifier
+from app.models.mongodb import IssuerRecord, ProvisioningCheckpoint
+import asyncio
+import time
+import jwt
 
 
 class TractionControllerError(Exception):
     """Generic TractionController Error."""
 
 
+class TractionTokenManager:
+    """Process-wide cache of the Traction tenant token.
+
+    The token is reused until ``refresh_margin`` seconds before its ``exp``
+    claim, then refreshed in the background while still being served. Only
+    one refresh is ever in flight, so bursts of requests do not stampede the
+    token endpoint.
+    """
+
+    def __init__(self, refresh_margin, default_ttl):
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.token = None
+        self.expires = 0
+        self.refreshing = None
+
+    def _expiry(self, token):
+        try:
+            claims = jwt.decode(token, options={"verify_signature": False})
+            return float(claims["exp"])
+        except (jwt.PyJWTError, KeyError, TypeError, ValueError):
+            return time.time() + self.default_ttl
+
+    async def _fetch(self, client):
+        r = await client.post(
+            f"{settings.TRACTION_API_URL}/multitenancy/tenant/{settings.TRACTION_TENANT_ID}/token",
+            json={"api_key": settings.TRACTION_API_KEY},
+        )
+        try:
+            token = r.json()["token"]
+        except (ValueError, KeyError):
+            raise TractionControllerError(f"Could not obtain a tenant token: {r.text}")
+        self.token, self.expires = token, self._expiry(token)
+        return token
+
+    def _refresh(self, client):
+        if not self.refreshing:
+            self.refreshing = asyncio.ensure_future(self._fetch(client))
+            self.refreshing.add_done_callback(self._refreshed)
+        return self.refreshing
+
+    def _refreshed(self, task):
+        self.refreshing = None
+        if not task.cancelled() and task.exception():
+            settings.LOGGER.warning(f"Traction token refresh failed: {task.exception()}")
+
+    async def get(self, client):
+        now = time.time()
+        if self.token and now < self.expires:
+            if now >= self.expires - self.refresh_margin:
+                self._refresh(client)
+            return self.token
+        return await asyncio.shield(self._refresh(client))
+
+    def invalidate(self, token):
+        if token == self.token:
+            self.token, self.expires = None, 0
+
+
+traction_tokens = TractionTokenManager(
+    settings.TRACTION_TOKEN_REFRESH_MARGIN, settings.TRACTION_TOKEN_DEFAULT_TTL
+)
+
+
 class TractionController:
+    #: Provisioning outcomes that don't need to be checked again until the registry entry changes.
+    provisioned_outcomes = ("ok", "created")
+
     def __init__(self):
         self.default_kid = "key-01"
         self.publisher_multikey = settings.PUBLISHER_MULTIKEY
@@ -19,6 +89,8 @@ class TractionController:
         self.tenant_id = settings.TRACTION_TENANT_ID
         self.api_key = settings.TRACTION_API_KEY
         self.headers = {}
+        self.token = None
+        self.client = http_clients.get("traction")
 
     def _try_response(self, response, response_key=None):
         try:
@@ -28,111 +100,163 @@ class TractionController:
             settings.LOGGER.info(response)
             return None
 
-    async def provision(self):
-        self.authorize()
+    async def _send(self, method, path, timeout=None, **kwargs):
+        if not self.token:
+            await self.authorize()
+        r = await self.client.request(
+            method,
+            f"{self.endpoint}{path}",
+            headers=self.headers,
+            timeout=timeout or self.client.timeout,
+            **kwargs,
+        )
+        if r.status_code == 401:
+            # The tenant token was revoked or expired early, retry once with a new one
+            traction_tokens.invalidate(self.token)
+            await self.authorize()
+            r = await self.client.request(
+                method,
+                f"{self.endpoint}{path}",
+                headers=self.headers,
+                timeout=timeout or self.client.timeout,
+                **kwargs,
+            )
+        return r
+
+    async def _request(self, method, path, response_key, timeout=None, **kwargs):
+        r = await self._send(method, path, timeout, **kwargs)
+        return self._try_response(r, response_key)
+
+    async def _provision_issuer(self, mongo, issuer):
+        issuer_id = issuer.get("id")
+        did_document, authorized_key, issuer_record = await asyncio.gather(
+            self.resolve(issuer_id),
+            self.get_multikey(issuer_id),
+            asyncio.to_thread(mongo.find_one, "IssuerRecord", {"id": issuer_id}),
+        )
+        if not did_document:
+            settings.LOGGER.info(f"{issuer_id}: Could not resolve DID document.")
+        if not authorized_key:
+            settings.LOGGER.info(f"{issuer_id}: No wallet key found.")
+
+        if did_document and authorized_key and issuer_record:
+            if issuer_record["authorized_key"] != authorized_key:
+                settings.LOGGER.info(f"{issuer_id}: Authorized key mismatch.")
+                return "mismatch"
+            return "ok"
+        elif did_document and authorized_key and not issuer_record:
+            issuer_record = IssuerRecord(
+                id=issuer_id,
+                name=issuer.get("name"),
+                authorized_key=authorized_key,
+            ).model_dump()
+            await asyncio.to_thread(mongo.insert, "IssuerRecord", issuer_record)
+            settings.LOGGER.info(f"{issuer_id}: Local issuer record created.")
+            return "created"
+        settings.LOGGER.info(f"{issuer_id}: Admin action required.")
+        return "action_required"
+
+    async def provision(self, concurrency=None, force=False):
+        """Reconcile the issuer registry with Traction and the local issuer records.
+
+        Issuers whose registry entry is unchanged since their last successful
+        check are skipped, unless ``force`` is set. Returns a summary of outcomes.
+        """
+        await self.authorize()
         settings.LOGGER.info("Fetching issuer registry.")
-        issuers = httpx.get(settings.ISSUER_REGISTRY_URL).json()["issuers"]
+        r = await self.client.get(settings.ISSUER_REGISTRY_URL)
+        issuers = r.json()["issuers"]
         settings.LOGGER.info(f"Found {len(issuers)} entries in registry.")
         mongo = MongoClient()
         mongo.provision()
-        for issuer in issuers:
-            settings.LOGGER.info(issuer["name"])
-
-            settings.LOGGER.info("Resolving DID document.")
-            did_document = self.resolve(issuer.get("id"))
-            if not did_document:
-                settings.LOGGER.info("Could not resolve DID document.")
-
-            settings.LOGGER.info("Looking up traction wallet.")
-            authorized_key = self.get_multikey(issuer.get("id"))
-            if not authorized_key:
-                settings.LOGGER.info("No wallet key found.")
-
-            settings.LOGGER.info("Looking up local issuer record.")
-            issuer_record = mongo.find_one("IssuerRecord", {"id": issuer["id"]})
-            if not issuer_record:
-                settings.LOGGER.info("No local record found.")
-
-            if did_document and authorized_key and issuer_record:
-                if issuer_record["authorized_key"] != authorized_key:
-                    settings.LOGGER.info("Authorized key mismatch.")
-                else:
-                    settings.LOGGER.info("All records check OK!")
-                    
-            elif did_document and authorized_key and not issuer_record:
-                issuer_record = IssuerRecord(
-                    id=issuer.get("id"),
-                    name=issuer.get("name"),
-                    authorized_key=authorized_key,
-                ).model_dump()
-                mongo.insert("IssuerRecord", issuer_record)
-                settings.LOGGER.info("Local issuer record created.")
-            else:
-                settings.LOGGER.info("Admin action required.")
-
-    def authorize(self):
-        r = requests.post(
-            f"{self.endpoint}/multitenancy/tenant/{self.tenant_id}/token",
-            json={"api_key": self.api_key},
-        )
-        token = self._try_response(r, "token")
-        self.headers = {"Authorization": f"Bearer {token}"}
+        checkpoints = {
+            checkpoint["id"]: checkpoint
+            for checkpoint in mongo.find("ProvisioningCheckpoint", {})
+        }
 
-    def resolve(self, did):
-        r = requests.get(
-            f"{self.endpoint}/resolver/resolve/{did}",
-            headers=self.headers,
-        )
-        did_document = self._try_response(r, "did_document")
-        return did_document
+        semaphore = asyncio.Semaphore(concurrency or settings.PROVISION_CONCURRENCY)
+        summary = {"skipped": 0}
 
-    def create_did_key(self):
-        r = requests.post(
-            f"{self.endpoint}/wallet/did/create",
-            headers=self.headers,
+        async def provision_issuer(issuer):
+            digest = generate_digest_multibase(issuer)
+            checkpoint = checkpoints.get(issuer.get("id"))
+            if (
+                not force
+                and checkpoint
+                and checkpoint["digest"] == digest
+                and checkpoint["outcome"] in self.provisioned_outcomes
+            ):
+                summary["skipped"] += 1
+                return
+            async with semaphore:
+                try:
+                    outcome = await self._provision_issuer(mongo, issuer)
+                except Exception as e:
+                    settings.LOGGER.warning(f"{issuer.get('id')}: Provisioning failed: {e!r}")
+                    outcome = "error"
+            summary[outcome] = summary.get(outcome, 0) + 1
+            await asyncio.to_thread(
+                mongo.replace,
+                "ProvisioningCheckpoint",
+                {"id": issuer.get("id")},
+                ProvisioningCheckpoint(
+                    id=issuer.get("id"), digest=digest, outcome=outcome, checked=timestamp()
+                ).model_dump(),
+                upsert=True,
+            )
+
+        await asyncio.gather(*[provision_issuer(issuer) for issuer in issuers])
+        settings.LOGGER.info(f"Provisioning summary: {summary}")
+        return summary
+
+    async def authorize(self):
+        self.token = await traction_tokens.get(self.client)
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+
+    async def resolve(self, did):
+        return await self._request("GET", f"/resolver/resolve/{did}", "did_document")
+
+    async def create_did_key(self):
+        did_info = await self._request(
+            "POST",
+            "/wallet/did/create",
+            "result",
             json={"method": "key", "options": {"key_type": "ed25519"}},
         )
-        did_info = self._try_response(r, "result")
         return did_info["did"].split(":")[-1]
 
-    def get_multikey(self, did):
-        r = requests.get(f"{self.endpoint}/wallet/did?did={did}", headers=self.headers)
-        did_info = self._try_response(r, "results")
+    async def get_multikey(self, did):
+        did_info = await self._request("GET", "/wallet/did", "results", params={"did": did})
         if len(did_info) == 0:
             return None
         return verkey_to_multikey(did_info[0]["verkey"])
 
-    def create_did_web(self, did):
-        r = requests.post(
-            f"{self.endpoint}/wallet/did/create",
-            headers=self.headers,
+    async def create_did_web(self, did):
+        did_info = await self._request(
+            "POST",
+            "/wallet/did/create",
+            "result",
             json={"method": "web", "options": {"did": did, "key_type": "ed25519"}},
         )
-        did_info = self._try_response(r, "result")
         return verkey_to_multikey(did_info["verkey"])
 
-    def create_key(self, kid=None):
-        r = requests.post(
-            f"{self.endpoint}/wallet/keys",
-            headers=self.headers,
-            json={"kid": kid} if kid else {},
+    async def create_key(self, kid=None):
+        return await self._request(
+            "POST", "/wallet/keys", "multikey", json={"kid": kid} if kid else {}
         )
-        return self._try_response(r, "multikey")
 
-    def bind_key(self, multikey, kid):
-        r = requests.put(
-            f"{self.endpoint}/wallet/keys",
-            headers=self.headers,
-            json={"multikey": multikey, "kid": kid},
+    async def bind_key(self, multikey, kid):
+        return await self._request(
+            "PUT", "/wallet/keys", "kid", json={"multikey": multikey, "kid": kid}
         )
-        return self._try_response(r, "kid")
 
-    def sign_vc_jwt(self, document):
+    async def sign_vc_jwt(self, document):
         did = document.get('issuer') if isinstance(document.get('issuer'), str) else document.get('issuer').get('id')
         verification_method = f"{did}#{self.default_kid}-jwk"
-        r = requests.post(
-            f"{self.endpoint}/wallet/jwt/sign",
-            headers=self.headers,
+        r = await self._send(
+            "POST",
+            "/wallet/jwt/sign",
+            timeout=settings.TRACTION_HTTP_SIGNING_TIMEOUT,
             json={
                 "did": did,
                 "verificationMethod": verification_method,
@@ -142,7 +266,7 @@ class TractionController:
         )
         return r.json()
 
-    def issue_vc(self, credential):
+    async def issue_vc(self, credential):
         settings.LOGGER.info("Issuing Credential")
         did = credential.get('issuer') if isinstance(credential.get('issuer'), str) else credential.get('issuer').get('id')
         if did.startswith('did:web:'):
@@ -156,9 +280,9 @@ class TractionController:
             "verificationMethod": verification_method,
             "created": timestamp(),
         }
-        return self.add_di_proof(credential, proof_options)
+        return await self.add_di_proof(credential, proof_options)
 
-    def create_vp(self, vc):
+    async def create_vp(self, vc):
         settings.LOGGER.info("Creating Presentation")
         did = vc["issuer"]["id"]
         if did.startswith('did:web:'):
@@ -179,39 +303,36 @@ class TractionController:
             "verificationMethod": verification_method,
             "created": timestamp(),
         }
-        return self.add_di_proof(presentation, proof_options)
+        return await self.add_di_proof(presentation, proof_options)
 
-    def add_di_proof(self, document, options):
-        r = requests.post(
-            f"{self.endpoint}/vc/di/add-proof",
-            headers=self.headers,
+    async def add_di_proof(self, document, options):
+        if local_signer.can_sign(options):
+            return local_signer.add_proof(document, options)
+        return await self._request(
+            "POST",
+            "/vc/di/add-proof",
+            "securedDocument",
+            timeout=settings.TRACTION_HTTP_SIGNING_TIMEOUT,
             json={
                 "document": document,
                 "options": options,
             },
         )
-        return self._try_response(r, "securedDocument")
 
-    def endorse(self, document, options):
+    async def endorse(self, document, options):
         options["verificationMethod"] = (
             f"did:key:{self.publisher_multikey}#{self.publisher_multikey}"
         )
-        r = requests.post(
-            f"{self.endpoint}/vc/di/add-proof",
-            headers=self.headers,
-            json={
-                "document": document,
-                "options": options,
-            },
-        )
-        return self._try_response(r, "securedDocument")
+        return await self.add_di_proof(document, options)
 
-    def verify_di_proof(self, secured_document):
-        r = requests.post(
-            f"{self.endpoint}/vc/di/verify",
-            headers=self.headers,
+    async def verify_di_proof(self, secured_document):
+        if local_verifier.can_verify(secured_document):
+            return await local_verifier.verify(secured_document, self.resolve)
+        return await self._request(
+            "POST",
+            "/vc/di/verify",
+            "verified",
             json={
                 "securedDocument": secured_document,
             },
         )
-        return self._try_response(r, "verified")
@@ -8,8 +8,8 @@ class DigitalConformityCredential:
         self.type = "DigitalConformityCredential"
         self.context = DEFAULT_DCC_CONTEXT_URL
 
-    def get_legal_act_info(self, legal_act_url):
-        legal_act_info = Soup(legal_act_url).legal_act_info()
+    async def get_legal_act_info(self, legal_act_url):
+        legal_act_info = (await Soup.fetch(legal_act_url)).legal_act_info()
         legal_act_info = {
             "id": legal_act_info["id"],
             "name": legal_act_info["title"],
@@ -17,7 +17,7 @@ class DigitalConformityCredential:
         }
         return legal_act_info
 
-    def extend_template(self, credential_registration, credential_template):
+    async def extend_template(self, credential_registration, credential_template):
         if not credential_registration.get("relatedResources").get("legalAct"):
             pass
         if not credential_registration.get("relatedResources").get("governance"):
@@ -26,7 +26,7 @@ class DigitalConformityCredential:
         credential_template["@context"].append(self.context)
         credential_template["type"].append(self.type)
 
-        legal_act_info = self.get_legal_act_info(
+        legal_act_info = await self.get_legal_act_info(
             legal_act_url=credential_registration["relatedResources"]["legalAct"]
         )
 
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
 from pydantic import Field, BaseModel
 from config import settings
-from app.plugins import MongoClient, MongoClientError
+from app.plugins.repositories import Repositories, get_repositories
 import time
 import jwt
 import secrets
@@ -27,27 +27,30 @@ class RequestDelegatedCredential(BaseModel):
 
 
 @router.post("/secret", tags=["Admin"], dependencies=[Depends(check_api_key_header)])
-async def update_client_secret(request_body: RequestSecret):
+async def update_client_secret(
+    request_body: RequestSecret,
+    repositories: Repositories = Depends(get_repositories),
+):
     client_id = vars(request_body)["client_id"]
     client_secret = secrets.token_urlsafe(64)
     client_hash = hashlib.sha256(client_secret.encode()).hexdigest()
 
-    mongo = MongoClient()
-    issuer_record = mongo.find_one("IssuerRecord", {"id": client_id})
-    issuer_record["secret_hash"] = client_hash
-    mongo.replace("IssuerRecord", {"id": client_id}, issuer_record)
+    if not await repositories.issuers.set_secret_hash(client_id, client_hash):
+        raise HTTPException(status_code=404, detail="Issuer not registered.")
 
     return JSONResponse(status_code=200, content={"client_secret": client_secret})
 
 
 @router.post("/token", tags=["Client"])
-async def request_client_token(request_body: RequestToken):
+async def request_client_token(
+    request_body: RequestToken,
+    repositories: Repositories = Depends(get_repositories),
+):
     client_id = vars(request_body)["client_id"]
     client_secret = vars(request_body)["client_secret"]
     client_hash = hashlib.sha256(client_secret.encode()).hexdigest()
 
-    mongo = MongoClient()
-    issuer_record = mongo.find_one("IssuerRecord", {"id": client_id})
+    issuer_record = await repositories.issuers.get(client_id)
 
     if client_hash != issuer_record["secret_hash"]:
         raise HTTPException(
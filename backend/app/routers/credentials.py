@@ -1,19 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from app.models.publications import (
     Publication,
+    CredentialStatusUpdate,
+    CredentialStatusCheck,
 )
 from app.models.mongodb import CredentialRecord
-from app.plugins.mongodb import MongoClient
+from app.plugins.repositories import Repositories, get_repositories
 from config import settings
-from app.utils import timestamp
+from app.utils import timestamp, generate_digest_multibase, StageTimer
+from app.caching import (
+    strong_etag,
+    weak_etag,
+    is_not_modified,
+    not_modified,
+    cache_headers,
+)
 from app.plugins.orgbook import OrgbookClient
+from app.plugins.http import DependencyUnavailableError
+from app.plugins.jobs import publish_job_queue
+from app.plugins.publisher import BatchPublisher, ndjson_lines
+from app.plugins.publish_plans import publish_plans
 from app.plugins import (
     TractionController,
     PublisherRegistrar,
 )
-from app.security import JWTBearer
+from app.plugins.status_list import (
+    BitstringStatusListError,
+    signed_status_list_cache,
+    status_list_checker,
+    status_list_manager,
+)
+from app.security import JWTBearer, check_api_key_header
+from datetime import datetime
+from typing import List
+import asyncio
+import json
 import uuid
 import segno
 import copy
@@ -21,8 +44,51 @@ import copy
 router = APIRouter(prefix="/credentials")
 
 
+class DuplexStreamingResponse(StreamingResponse):
+    """Stream a response while the request body is still being read.
+
+    ``StreamingResponse`` listens for disconnects on ``receive``, which would
+    consume the request body, disconnects surface through ``request.stream()``.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+#: Fields read from a CredentialRecord for each representation of a credential,
+#: the HTML view fetches the VC and JWT itself when they are copied.
+CREDENTIAL_PROJECTIONS = {
+    "jwt": {"digest": True, "vc_jwt": True},
+    "vc": {"digest": True, "vc": True},
+    "html": {
+        "digest": True,
+        "type": True,
+        "cardinality_id": True,
+        "vc.id": True,
+        "vc.name": True,
+        "vc.issuer.name": True,
+        "vc.credentialSubject.issuedToParty.registeredId": True,
+        "vc.credentialSubject.issuedToParty.name": True,
+    },
+}
+
+
+def credential_variant(request):
+    accept = request.headers.get("accept", "")
+    if "application/vc+jwt" in accept:
+        return "jwt"
+    elif "application/vc" in accept:
+        return "vc"
+    return "html"
+
+
 @router.post("/publish", tags=["Client"], dependencies=[Depends(JWTBearer())])
-async def publish_credential(request_body: Publication):
+async def publish_credential(
+    request_body: Publication,
+    repositories: Repositories = Depends(get_repositories),
+    prefer: str | None = Header(None),
+):
     settings.LOGGER.info("Publication request")
     credential_input = request_body.model_dump()["credential"]
 
@@ -32,59 +98,108 @@ async def publish_credential(request_body: Publication):
         settings.LOGGER.info("No credential id provided, new id generated.")
         
     settings.LOGGER.info('Credential Id: ' + options["credentialId"])
+
+    # https://www.rfc-editor.org/rfc/rfc7240#section-4.1
+    # The preference is ignored unless this server runs publish job workers
+    if prefer and "respond-async" in prefer and settings.PUBLISH_JOB_WORKERS:
+        job_id = await publish_job_queue.enqueue(
+            repositories, {"credential": credential_input, "options": options}
+        )
+        settings.LOGGER.info(f"Publication queued as job {job_id}")
+        return JSONResponse(
+            status_code=202,
+            content={
+                "jobId": job_id,
+                "credentialId": f"https://{settings.DOMAIN}/credentials/{options['credentialId']}",
+            },
+            headers={
+                "Location": f"/credentials/jobs/{job_id}",
+                "Preference-Applied": "respond-async",
+            },
+        )
     
-    mongo = MongoClient()
-    
-    # Check if credential type has a registration
+    registrar = PublisherRegistrar(repositories)
+    traction = TractionController()
+    timer = StageTimer()
     credential_type = credential_input.get("type")
-    credential_registration = mongo.find_one(
-        'CredentialTypeRecord',
-        {'type': credential_type}
+    entity_id = options.get("entityId")
+    cardinality_hash = registrar.cardinality_hash(
+        credential_input=copy.deepcopy(credential_input), options=options
+    )
+
+    async def fetch_entity():
+        # Check if entity id provided exists in orgbook
+        try:
+            return await OrgbookClient().fetch_buisness_info(entity_id)
+        except DependencyUnavailableError:
+            raise
+        except Exception:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No orgbook registration found for {entity_id}",
+            )
+
+    # Independent lookups run concurrently
+    plan, entity, unchanged_record, _ = await asyncio.gather(
+        timer.run(
+            "credential_type",
+            publish_plans.get(repositories, credential_type),
+        ),
+        timer.run("orgbook", fetch_entity()),
+        timer.run(
+            "cardinality",
+            registrar.find_unchanged(credential_input, options, cardinality_hash),
+        ),
+        timer.run("authorize", traction.authorize()),
     )
-    if not credential_registration:
+    if not plan:
         raise HTTPException(
             status_code=404,
             detail="Unregistered credential type",
         )
-    
-    # Check if entity id provided exists in orgbook
-    entity_id = options.get("entityId")
-    try:
-        OrgbookClient().fetch_buisness_info(entity_id)
-    except:
-        raise HTTPException(
-            status_code=404,
-            detail=f"No orgbook registration found for {entity_id}",
+
+    if unchanged_record:
+        settings.LOGGER.info("No change detected, keeping credential record.")
+        return JSONResponse(
+            status_code=200,
+            content={"credentialId": unchanged_record["vc"]["id"]},
+            headers={"Server-Timing": timer.server_timing()},
         )
-        
-    # Check cardinality, returns hash if new issuance is required
-    cardinality_hash = await PublisherRegistrar().check_cardinality(
-        credential_input=copy.deepcopy(credential_input), options=options
+
+    # Format credential and reserve its status entries while superseding older records
+    credential, _ = await asyncio.gather(
+        timer.run(
+            "format",
+            registrar.format_credential(
+                credential_input=copy.deepcopy(credential_input),
+                options=options,
+                plan=plan,
+                entity=entity,
+            ),
+        ),
+        timer.run(
+            "supersede",
+            registrar.supersede(credential_input, options),
+        ),
     )
-        
-    if cardinality_hash:
-        # Format credential
-        credential = await PublisherRegistrar().format_credential(
-            credential_input=copy.deepcopy(credential_input), options=options
-        )
 
-        traction = TractionController()
-        traction.authorize()
-        vc = traction.issue_vc(credential)
-        if not vc:
-            raise HTTPException(
-                status_code=500,
-                detail="Unexpected error occured while trying to issue the credential.",
-            )
-        vc_jwt = traction.sign_vc_jwt(vc)
-        if not vc_jwt:
-            raise HTTPException(
-                status_code=500,
-                detail="Unexpected error occured while trying to issue the credential.",
-            )
+    # The VC-JWT secures the DI-secured VC, so signing stays sequential
+    vc = await timer.run("issue_vc", traction.issue_vc(credential))
+    if not vc:
+        raise HTTPException(
+            status_code=500,
+            detail="Unexpected error occured while trying to issue the credential.",
+        )
+    vc_jwt = await timer.run("sign_vc_jwt", traction.sign_vc_jwt(vc))
+    if not vc_jwt:
+        raise HTTPException(
+            status_code=500,
+            detail="Unexpected error occured while trying to issue the credential.",
+        )
 
-        mongo.insert(
-            "CredentialRecord",
+    await timer.run(
+        "store",
+        repositories.credentials.create(
             CredentialRecord(
                 id=options.get("credentialId"),
                 type=credential_type,
@@ -96,65 +211,256 @@ async def publish_credential(request_body: Publication):
                 suspension=False,
                 vc=vc,
                 vc_jwt=vc_jwt,
+                digest=generate_digest_multibase(vc),
             ).model_dump(),
+        ),
+    )
+    settings.LOGGER.info(f"Publication stages: {timer.server_timing()}")
+    return JSONResponse(
+        status_code=201,
+        content={"credentialId": vc["id"]},
+        headers={"Server-Timing": timer.server_timing()},
+    )
+
+
+@router.post("/publish/batch", tags=["Client"], dependencies=[Depends(JWTBearer())])
+async def publish_credentials(
+    request_body: List[Publication],
+    repositories: Repositories = Depends(get_repositories),
+):
+    if len(request_body) > settings.PUBLISH_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batches are limited to {settings.PUBLISH_BATCH_MAX_SIZE} publications.",
         )
-        return JSONResponse(status_code=201, content={"credentialId": vc["id"]})
+    settings.LOGGER.info(f"Batch publication request of {len(request_body)} credentials")
+    results = await BatchPublisher(repositories).publish(
+        [publication.model_dump() for publication in request_body]
+    )
+    summary = {}
+    for result in results:
+        summary[str(result["status"])] = summary.get(str(result["status"]), 0) + 1
+    settings.LOGGER.info(f"Batch publication results: {summary}")
+    return JSONResponse(
+        status_code=200,
+        content={"results": results, "summary": summary},
+    )
 
-    else:
-        credential_records = mongo.find_one(
-            "CredentialRecord",
-            {
-                "type": credential_input.get("type"),
-                "entity_id": options.get("entityId"),
-                "cardinality_id": options.get("cardinalityId"),
-                "refresh": False,
-            },
+
+@router.post(
+    "/publish/stream",
+    tags=["Client"],
+    dependencies=[Depends(JWTBearer())],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        }
+    },
+)
+async def publish_credentials_stream(
+    request: Request,
+    repositories: Repositories = Depends(get_repositories),
+):
+    """Publish one ``Publication`` per line of an NDJSON upload, streaming a result per line."""
+    publisher = BatchPublisher(repositories)
+    lines = ndjson_lines(request.stream(), settings.PUBLISH_STREAM_MAX_LINE_BYTES)
+
+    async def results():
+        async for result in publisher.publish_stream(lines):
+            yield json.dumps(result) + "\n"
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.get("/jobs/{job_id}", tags=["Client"], dependencies=[Depends(JWTBearer())])
+async def get_publish_job(
+    job_id: str,
+    repositories: Repositories = Depends(get_repositories),
+):
+    job = await repositories.jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=404,
+            detail="No record found.",
+        )
+    return JSONResponse(
+        status_code=200,
+        content={
+            "id": job["id"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "created": job["created"],
+            "updated": job["updated"],
+            "result": job.get("result"),
+        },
+    )
+
+
+@router.post("/status", tags=["Admin"], dependencies=[Depends(check_api_key_header)])
+async def update_credentials_status(
+    request_body: CredentialStatusUpdate,
+    repositories: Repositories = Depends(get_repositories),
+):
+    status_update = request_body.model_dump()
+    credential_ids = status_update["credentialIds"]
+    status_purpose = status_update["statusPurpose"]
+    settings.LOGGER.info(
+        f"Setting {status_purpose} to {status_update['status']} on {len(credential_ids)} credentials."
+    )
+
+    credential_records = await repositories.credentials.find_by_ids(
+        credential_ids, {"id": True, "vc.credentialStatus": True}
+    )
+
+    # Group status list indexes and credentials by status list credential
+    status_lists = {}
+    without_entry = []
+    for credential_record in credential_records:
+        credential_status = credential_record["vc"].get("credentialStatus") or []
+        if isinstance(credential_status, dict):
+            credential_status = [credential_status]
+        entries = [
+            entry
+            for entry in credential_status
+            if entry.get("statusPurpose") == status_purpose
+            and entry.get("statusListCredential")
+        ]
+        if not entries:
+            without_entry.append(credential_record["id"])
+        for entry in entries:
+            indexes, ids = status_lists.setdefault(
+                entry["statusListCredential"], ([], set())
+            )
+            indexes.append(int(entry["statusListIndex"]))
+            ids.add(credential_record["id"])
+
+    # Each list is written on its own, a failed list leaves the others updated
+    failed, failed_ids = [], set()
+    for endpoint, (indexes, ids) in status_lists.items():
+        try:
+            await status_list_manager.set_status(
+                repositories, endpoint, indexes, status_update["status"]
+            )
+        except BitstringStatusListError as error:
+            failed.append(
+                {
+                    "statusListCredential": endpoint,
+                    "credentialIds": sorted(ids),
+                    "detail": str(error),
+                }
+            )
+            failed_ids |= ids
+
+    updated_ids = sorted(
+        {credential_id for _, ids in status_lists.values() for credential_id in ids}
+        - failed_ids
+    )
+    if updated_ids:
+        await repositories.credentials.set_status(
+            updated_ids, status_purpose, status_update["status"]
         )
-        vc = credential_records['vc']
-        return JSONResponse(status_code=200, content={"credentialId": vc['id']})
+
+    found_ids = {credential_record["id"] for credential_record in credential_records}
+    return JSONResponse(
+        status_code=409 if failed else 200,
+        content={
+            "updated": updated_ids,
+            "notFound": sorted(set(credential_ids) - found_ids),
+            "noStatusEntry": sorted(without_entry),
+            "failed": failed,
+            "statusLists": len(status_lists) - len(failed),
+        },
+    )
 
 
+@router.post(
+    "/status/check", tags=["Admin"], dependencies=[Depends(check_api_key_header)]
+)
+async def check_credentials_status(request_body: CredentialStatusCheck):
+    credentials = request_body.model_dump()["credentials"]
+    results = await status_list_checker.check(credentials)
+    return JSONResponse(
+        status_code=200,
+        content=[
+            {"id": credential.get("id"), "status": status}
+            for credential, status in zip(credentials, results)
+        ],
+    )
+
 
 @router.get("/refresh", tags=["Public"])
-async def refresh_credential(type: str, entity: str, cardinality: str, request: Request):
-    entity_id = entity
-    cardinality_id = cardinality
-    credential_type = type
-    mongo = MongoClient()
-    credential_record = mongo.find_one(
-        "CredentialRecord", 
-        {
-            "type": credential_type,
-            "entity_id": entity_id,
-            "cardinality_id": cardinality_id,
-            "refresh": False
-        }
+async def refresh_credential(
+    type: str,
+    entity: str,
+    cardinality: str,
+    request: Request,
+    repositories: Repositories = Depends(get_repositories),
+):
+    variant = "jwt" if credential_variant(request) == "jwt" else "vc"
+    credential_record = await repositories.credentials.get_current(
+        type, entity, cardinality, CREDENTIAL_PROJECTIONS[variant]
+    )
+    if not credential_record:
+        raise HTTPException(
+            status_code=404,
+            detail="No record found.",
+        )
+    if variant == "jwt":
+        return Response(
+            content=credential_record["vc_jwt"], media_type="application/vc+jwt"
+        )
+    return JSONResponse(
+        headers={"Content-Type": "application/vc"}, content=credential_record["vc"]
     )
-    vc = credential_record['vc']
-    vc_jwt = credential_record['vc_jwt']
-    if "application/vc+jwt" in request.headers["accept"]:
-        return Response(content=vc_jwt, media_type="application/vc+jwt")
-    elif "application/vc" in request.headers["accept"]:
-        return JSONResponse(headers={"Content-Type": "application/vc"}, content=vc)
-    return JSONResponse(headers={"Content-Type": "application/vc"}, content=vc)
 
 
 @router.get("/{credential_id}", tags=["Public"])
-async def get_credential(credential_id: str, request: Request):
-    mongo = MongoClient()
-    credential_record = mongo.find_one("CredentialRecord", {"id": credential_id})
+async def get_credential(
+    credential_id: str,
+    request: Request,
+    repositories: Repositories = Depends(get_repositories),
+):
+    variant = credential_variant(request)
+    cache_control = settings.CACHE_CONTROL_CREDENTIALS
+
+    if request.headers.get("if-none-match"):
+        credential_digest = await repositories.credentials.get_digest(credential_id)
+        if credential_digest:
+            etag = strong_etag(credential_digest, variant)
+            if is_not_modified(request, etag):
+                return not_modified(etag, cache_control, vary="Accept")
+
+    credential_record = await repositories.credentials.get(
+        credential_id, CREDENTIAL_PROJECTIONS[variant]
+    )
     if not credential_record:
         raise HTTPException(
             status_code=404,
             detail="No record found.",
         )
-    vc = credential_record["vc"]
-    vc_jwt = credential_record["vc_jwt"]
-    if "application/vc+jwt" in request.headers["accept"]:
-        return Response(content=vc_jwt, media_type="application/vc+jwt")
-    elif "application/vc" in request.headers["accept"]:
-        return JSONResponse(headers={"Content-Type": "application/vc"}, content=vc)
+    # Records stored before digests were kept are tagged by their projected content
+    etag = strong_etag(
+        credential_record.get("digest") or generate_digest_multibase(credential_record),
+        variant,
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag, cache_control, vary="Accept")
+    headers = cache_headers(etag, cache_control, vary="Accept")
+
+    if variant == "jwt":
+        return Response(
+            content=credential_record["vc_jwt"],
+            media_type="application/vc+jwt",
+            headers=headers,
+        )
+    elif variant == "vc":
+        return JSONResponse(
+            headers={"Content-Type": "application/vc"} | headers,
+            content=credential_record["vc"],
+        )
     else:
+        vc = credential_record["vc"]
         branding = {"logo": "https://avatars.githubusercontent.com/u/916280"}
         meta = {
             "name": vc["name"],
@@ -171,36 +477,86 @@ async def get_credential(credential_id: str, request: Request):
             "meta": meta,
             "values": values,
             "qrcode": segno.make(vc["id"]),
-            "vc": vc,
-            "jwt": vc_jwt,
         }
         return Jinja2Templates(directory="app/templates").TemplateResponse(
-            request=request, name="minimal.jinja", context=context
+            request=request, name="minimal.jinja", context=context, headers=headers
         )
 
 
 @router.get("/status/{status_credential_id}", tags=["Public"])
-async def get_status_list_credential(status_credential_id: str, request: Request):
-    mongo = MongoClient()
-    status_list_record = mongo.find_one(
-        "StatusListRecord", {"id": status_credential_id}
+async def get_status_list_credential(
+    status_credential_id: str,
+    request: Request,
+    repositories: Repositories = Depends(get_repositories),
+):
+    status_list_record = await repositories.status_lists.get(
+        status_credential_id,
+        {"revision": True, "credential.credentialSubject.statusPurpose": True},
     )
     if not status_list_record:
         raise HTTPException(
             status_code=404,
             detail="No record found.",
         )
-    status_list_credential = status_list_record["credential"]
-    status_list_credential["validFrom"] = timestamp()
-    status_list_credential["validUntil"] = timestamp(5)
-    traction = TractionController()
-    traction.authorize()
-    if "application/vc+jwt" in request.headers["accept"]:
-        vc_jwt = traction.sign_vc_jwt(status_list_credential)
-        return Response(content=vc_jwt, media_type="application/vc+jwt")
-    elif "application/vc" in request.headers["accept"]:
-        vc = traction.issue_vc(status_list_credential)
-        return JSONResponse(headers={"Content-Type": "application/vc"}, content=vc)
+    accept = request.headers.get("accept", "")
+    if "application/vc+jwt" in accept:
+        media_type = "application/vc+jwt"
+    else:
+        media_type = "application/vc"
+
+    revision = status_list_record.get("revision", 0)
+
+    async def sign():
+        status_list_credential = await status_list_manager.get_credential(
+            repositories, status_credential_id
+        )
+        status_list_credential["validFrom"] = timestamp()
+        status_list_credential["validUntil"] = timestamp(
+            settings.STATUS_LIST_VALIDITY_MINUTES
+        )
+        valid_until = datetime.fromisoformat(
+            status_list_credential["validUntil"]
+        ).timestamp()
+        traction = TractionController()
+        await traction.authorize()
+        if media_type == "application/vc+jwt":
+            return await traction.sign_vc_jwt(status_list_credential), valid_until
+        return await traction.issue_vc(status_list_credential), valid_until
+
+    purpose = status_list_record["credential"]["credentialSubject"]["statusPurpose"]
+    signed_status_list, valid_until = await signed_status_list_cache.get(
+        (
+            status_credential_id,
+            ",".join(purpose) if isinstance(purpose, list) else purpose,
+            media_type,
+        ),
+        revision,
+        sign,
+    )
+    if not signed_status_list:
+        raise HTTPException(
+            status_code=500,
+            detail="Unexpected error occured while trying to sign the status list.",
+        )
+
+    # Signatures differ per worker, the revision and validity window identify the copy served
+    etag = weak_etag(
+        f"{status_credential_id}-{revision}-{int(valid_until)}",
+        "jwt" if media_type == "application/vc+jwt" else "vc",
+    )
+    cache_control = settings.CACHE_CONTROL_STATUS_LISTS
+    if is_not_modified(request, etag):
+        return not_modified(etag, cache_control, vary="Accept")
+    headers = cache_headers(etag, cache_control, vary="Accept")
+
+    if media_type == "application/vc+jwt":
+        return Response(
+            content=signed_status_list, media_type="application/vc+jwt", headers=headers
+        )
+    elif "application/vc" in accept:
+        return JSONResponse(
+            headers={"Content-Type": "application/vc"} | headers,
+            content=signed_status_list,
+        )
     else:
-        vc = traction.issue_vc(status_list_credential)
-        return JSONResponse(content=vc)
+        return JSONResponse(headers=headers, content=signed_status_list)
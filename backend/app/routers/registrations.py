@@ -6,20 +6,18 @@ from app.models.registrations import IssuerRegistration, CredentialRegistration
 from app.models.mongodb import (
     IssuerRecord,
     CredentialTypeRecord,
-    StatusListRecord,
 )
 from config import settings
 from app.plugins import (
-    MongoClient,
     MongoClientError,
-    BitstringStatusList,
     PublisherRegistrar,
     OCAProcessor,
 )
-import uuid
-import random
+from app.plugins.repositories import Repositories, get_repositories
+from app.plugins.publish_plans import publish_plans
+from app.plugins.status_list import status_list_manager
+from app.plugins.http import http_clients
 import json
-import httpx
 from app.security import check_api_key_header
 
 
@@ -27,28 +25,27 @@ router = APIRouter(prefix="/registrations")
 
 
 @router.get("/issuers", tags=["Admin"], dependencies=[Depends(check_api_key_header)])
-async def list_issuer_registrations():
-    mongo = MongoClient()
-    issuer_records = mongo.find(
-        "IssuerRecord",
-        {}
-    )
+async def list_issuer_registrations(
+    repositories: Repositories = Depends(get_repositories),
+):
+    issuer_records = await repositories.issuers.list()
     issuer_records = [json.loads(json.dumps(issuer_record, default=str)) for issuer_record in issuer_records]
     return JSONResponse(status_code=200, content=issuer_records)
 
 
 @router.post("/issuers", tags=["Admin"], dependencies=[Depends(check_api_key_header)])
-async def register_issuer(request_body: IssuerRegistration):
+async def register_issuer(
+    request_body: IssuerRegistration,
+    repositories: Repositories = Depends(get_repositories),
+):
     registration = vars(request_body)
 
     # Register issuer on DID Web server and create DID Document
-    did_document, authorized_key = await PublisherRegistrar().register_issuer(
+    did_document, authorized_key = await PublisherRegistrar(repositories).register_issuer(
         registration
     )
 
-    mongo = MongoClient()
-    mongo.insert(
-        "IssuerRecord",
+    await repositories.issuers.create(
         IssuerRecord(
             id=did_document.get("id"),
             name=registration.get("name"),
@@ -62,40 +59,32 @@ async def register_issuer(request_body: IssuerRegistration):
 @router.post(
     "/credentials", tags=["Admin"], dependencies=[Depends(check_api_key_header)]
 )
-async def register_credential_type(request_body: CredentialRegistration):
+async def register_credential_type(
+    request_body: CredentialRegistration,
+    repositories: Repositories = Depends(get_repositories),
+):
     credential_registration = request_body.model_dump()
     credential_type = credential_registration.get("type")
     credential_version = credential_registration.get("version")
 
-    mongo = MongoClient()
-
     # Create a new status status list for this type of credential
-    indexes = list(range(500000))
-    random.shuffle(indexes)
-
-    status_list_id = str(uuid.uuid4())
-    status_list_credential = await BitstringStatusList().create(
+    status_list_id = await status_list_manager.create_list(
+        repositories,
         issuer=credential_registration["issuer"],
-        purpose=["revocation", "suspension", "refresh"],
-        length=len(indexes),
-    )
-    mongo.insert(
-        "StatusListRecord",
-        StatusListRecord(
-            id=status_list_id,
-            indexes=indexes,
-            endpoint=f"https://{settings.DOMAIN}/credentials/status/{status_list_id}",
-            credential=status_list_credential,
-        ).model_dump(),
+        credential_type=credential_type,
+        version=credential_version,
     )
 
     # Create a new template for this credential type
-    credential_template = await PublisherRegistrar().template_credential(
+    credential_template = await PublisherRegistrar(repositories).template_credential(
         credential_registration
     )
 
     # Fetch remote context
-    context = httpx.get(credential_registration["relatedResources"]["context"]).json()
+    r = await http_clients.get("resources").get(
+        credential_registration["relatedResources"]["context"]
+    )
+    context = r.json()
     
     # Inject well known context components
     context['@context']['SimpleRefreshQuery'] = 'https://schema.org/WebAPI'
@@ -122,26 +111,28 @@ async def register_credential_type(request_body: CredentialRegistration):
 
     # Create OCA Bundle
     oca_bundle = OCAProcessor().create_bundle(credential_registration, credential_template)
+    oca_bundle_digest = generate_digest_multibase(oca_bundle)
     credential_template['renderMethod'] = [
         {
             'type': 'OCABundle',
             'id': f'https://{settings.DOMAIN}/bundles/{credential_type}/{credential_version}',
             'name': 'Overlay Capture Architecture Bundle',
-            'digestMultibase': generate_digest_multibase(oca_bundle),
+            'digestMultibase': oca_bundle_digest,
         }
     ]
 
     # Store credential type record
     try:
-        mongo.insert(
-            "CredentialTypeRecord",
+        await repositories.credential_types.create(
             CredentialTypeRecord(
                 type=credential_registration.get("type"),
                 version=credential_registration.get("version"),
                 issuer=credential_registration.get("issuer"),
                 context=context,
+                context_digest=generate_digest_multibase(context),
                 template=credential_template,
                 oca_bundle=oca_bundle,
+                oca_bundle_digest=oca_bundle_digest,
                 json_schema=json_schema,
                 core_paths=credential_registration.get("corePaths"),
                 subject_type=credential_registration.get("subjectType"),
@@ -153,5 +144,6 @@ async def register_credential_type(request_body: CredentialRegistration):
         )
     except MongoClientError:
         raise HTTPException(status_code=409, detail='Duplicate entry')
+    publish_plans.invalidate(credential_type)
 
     return JSONResponse(status_code=201, content=credential_template)
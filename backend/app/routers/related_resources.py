@@ -1,33 +1,64 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
-from app.plugins.mongodb import MongoClient
+from app.plugins.repositories import Repositories, get_repositories
+from app.utils import generate_digest_multibase
+from app.caching import strong_etag, is_not_modified, not_modified, cache_headers
+from config import settings
 
 router = APIRouter()
 
 
-@router.get("/contexts/{credential_type}/{version}", tags=["Public"])
-async def get_context(credential_type: str, version: str):
-    mongo = MongoClient()
-    record = mongo.find_one(
-        "CredentialTypeRecord", {"type": credential_type, "version": version}
-    )
+async def get_related_resource(
+    repositories, credential_type, version, resource, request
+):
+    credential_types = repositories.credential_types
+    cache_control = settings.CACHE_CONTROL_RELATED_RESOURCES
+    if request.headers.get("if-none-match"):
+        digest = await credential_types.get_resource_digest(
+            credential_type, version, resource
+        )
+        if digest:
+            etag = strong_etag(digest)
+            if is_not_modified(request, etag):
+                return not_modified(etag, cache_control)
+
+    record = await credential_types.get_resource(credential_type, version, resource)
     if not record:
         raise HTTPException(
             status_code=404,
             detail="Resource not found",
         )
-    return JSONResponse(status_code=200, content=record["context"])
+    etag = strong_etag(
+        record.get(f"{resource}_digest") or generate_digest_multibase(record[resource])
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag, cache_control)
+    return JSONResponse(
+        status_code=200,
+        content=record[resource],
+        headers=cache_headers(etag, cache_control),
+    )
+
+
+@router.get("/contexts/{credential_type}/{version}", tags=["Public"])
+async def get_context(
+    credential_type: str,
+    version: str,
+    request: Request,
+    repositories: Repositories = Depends(get_repositories),
+):
+    return await get_related_resource(
+        repositories, credential_type, version, "context", request
+    )
 
 
 @router.get("/bundles/{credential_type}/{version}", tags=["Public"])
-async def get_oca_bundle(credential_type: str, version: str):
-    mongo = MongoClient()
-    record = mongo.find_one(
-        "CredentialTypeRecord", {"type": credential_type, "version": version}
+async def get_oca_bundle(
+    credential_type: str,
+    version: str,
+    request: Request,
+    repositories: Repositories = Depends(get_repositories),
+):
+    return await get_related_resource(
+        repositories, credential_type, version, "oca_bundle", request
     )
-    if not record:
-        raise HTTPException(
-            status_code=404,
-            detail="Resource not found",
-        )
-    return JSONResponse(status_code=200, content=record["oca_bundle"])
@@ -5,6 +5,7 @@ import hashlib
 import validators
 from canonicaljson import encode_canonical_json
 import re
+import time
 
 
 def valid_datetime_string(datetime_string):
@@ -37,4 +38,23 @@ def multikey_to_jwk(multikey):
         "kty": "OKP", 
         "crv": "Ed25519",
         "x": base64.urlsafe_b64encode(multibase.decode(multikey)[2:]).decode().rstrip("=")
-    }
\ No newline at end of file
+    }
+
+
+class StageTimer:
+    """Record the duration of named stages of a request pipeline."""
+
+    def __init__(self):
+        self.stages = {}
+
+    async def run(self, name, awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.stages[name] = (time.perf_counter() - start) * 1000
+
+    def server_timing(self):
+        return ", ".join(
+            f"{name};dur={duration:.1f}" for name, duration in self.stages.items()
+        )
@@ -42,13 +42,94 @@ class Settings(BaseSettings):
     TRACTION_API_URL: str = Field(default="http://localhost")
     TRACTION_API_KEY: str = Field(default="dev-local")
     TRACTION_TENANT_ID: str = Field(default="dev-local")
+    #: Connection pool and timeouts (seconds) of the shared Traction HTTP client.
+    TRACTION_HTTP_MAX_CONNECTIONS: int = Field(default=100)
+    TRACTION_HTTP_MAX_KEEPALIVE: int = Field(default=20)
+    TRACTION_HTTP_KEEPALIVE_EXPIRY: float = Field(default=30.0)
+    TRACTION_HTTP_TIMEOUT: float = Field(default=10.0)
+    TRACTION_HTTP_SIGNING_TIMEOUT: float = Field(default=30.0)
+    #: Seconds before expiry at which the cached tenant token is refreshed.
+    TRACTION_TOKEN_REFRESH_MARGIN: int = Field(default=300)
+    #: Lifetime assumed for tenant tokens without an ``exp`` claim.
+    TRACTION_TOKEN_DEFAULT_TTL: int = Field(default=3600)
 
     ORGBOOK_URL: str = Field(default="http://localhost")
     ORGBOOK_SYNC: bool = Field(default=True)
+    #: Concurrent calls and timeout (seconds) allowed per outbound dependency.
+    ORGBOOK_HTTP_MAX_CONNECTIONS: int = Field(default=20)
+    ORGBOOK_HTTP_TIMEOUT: float = Field(default=5.0)
 
     DID_WEB_SERVER_URL: str = Field(default="http://localhost")
+    DID_WEB_SERVER_HTTP_MAX_CONNECTIONS: int = Field(default=10)
+    DID_WEB_SERVER_HTTP_TIMEOUT: float = Field(default=10.0)
+    #: Legal acts, governance documents and remote contexts.
+    RESOURCES_HTTP_MAX_CONNECTIONS: int = Field(default=10)
+    RESOURCES_HTTP_TIMEOUT: float = Field(default=10.0)
+
+    #: Retries of idempotent outbound calls, with jittered exponential backoff (seconds).
+    HTTP_RETRY_ATTEMPTS: int = Field(default=2)
+    HTTP_RETRY_BACKOFF: float = Field(default=0.2)
+    HTTP_RETRY_BACKOFF_MAX: float = Field(default=2.0)
+    #: Consecutive failures opening a dependency's circuit, and seconds before a trial call.
+    HTTP_CIRCUIT_FAILURE_THRESHOLD: int = Field(default=5)
+    HTTP_CIRCUIT_RESET_TIMEOUT: float = Field(default=30.0)
+    #: Seconds a call waits for a free slot before failing when a dependency is saturated.
+    HTTP_BULKHEAD_TIMEOUT: float = Field(default=1.0)
     PUBLISHER_MULTIKEY: str = Field(default="dev-local")
+    #: JSON file of private Ed25519 JWKs used to sign ``did:key`` proofs in-process.
+    PUBLISHER_KEYSTORE: str | None = Field(default=None)
+    #: Seconds resolved verification methods are trusted for local proof verification.
+    DI_VERIFICATION_CACHE_TTL: int = Field(default=3600)
+    #: Seconds a verification method missing from its resolved DID document is remembered as such.
+    DI_VERIFICATION_NEGATIVE_CACHE_TTL: int = Field(default=60)
+    #: Worker processes for batch proof verification, defaults to the CPU count.
+    DI_VERIFICATION_WORKERS: int | None = Field(default=None)
     ISSUER_REGISTRY_URL: str = Field(default="http://localhost")
+    #: Issuers checked concurrently while provisioning from the registry.
+    PROVISION_CONCURRENCY: int = Field(default=10)
+    #: Provision alongside the running server instead of before it starts.
+    PROVISION_IN_BACKGROUND: bool = Field(default=False)
+
+    #: Publications accepted by one ``/credentials/publish/batch`` request.
+    PUBLISH_BATCH_MAX_SIZE: int = Field(default=1000)
+    #: Credentials of a batch signed concurrently.
+    PUBLISH_BATCH_CONCURRENCY: int = Field(default=10)
+    #: Seconds a compiled credential type is reused before being read again from MongoDB.
+    PUBLISH_PLAN_TTL: int = Field(default=300)
+    #: Workers draining queued publications on each server process. Every uvicorn
+    #: worker process starts its own, ``main.py`` runs 4 processes. With 0, async
+    #: publishing is off and ``Prefer: respond-async`` is ignored.
+    PUBLISH_JOB_WORKERS: int = Field(default=0)
+    #: Seconds an idle worker waits before looking for queued publications again.
+    PUBLISH_JOB_POLL_INTERVAL: float = Field(default=1.0)
+    #: Seconds a job is leased to a worker, after which another worker may pick it up.
+    PUBLISH_JOB_LEASE_SECONDS: int = Field(default=300)
+    #: Attempts of a publication failing on a dependency, with exponential backoff (seconds).
+    PUBLISH_JOB_MAX_ATTEMPTS: int = Field(default=5)
+    PUBLISH_JOB_RETRY_BACKOFF: float = Field(default=5.0)
+    #: Lines of an NDJSON upload published together, and batches read ahead of signing.
+    PUBLISH_STREAM_BATCH_SIZE: int = Field(default=100)
+    PUBLISH_STREAM_QUEUE_SIZE: int = Field(default=2)
+    PUBLISH_STREAM_MAX_LINE_BYTES: int = Field(default=1048576)
+
+    STATUS_LIST_LENGTH: int = Field(default=500000)
+    #: Indexes each worker claims from a status list per round trip to MongoDB.
+    STATUS_LIST_RESERVATION_BLOCK: int = Field(default=300)
+    #: Utilization at which the next status list of a credential type is created.
+    STATUS_LIST_ROLLOVER_THRESHOLD: float = Field(default=0.8)
+    #: Validity window of signed status list credentials served to verifiers.
+    STATUS_LIST_VALIDITY_MINUTES: int = Field(default=5)
+    #: Seconds before ``validUntil`` at which a cached status list is re-signed.
+    STATUS_LIST_REFRESH_SECONDS: int = Field(default=60)
+    #: Seconds a fetched status list without ``validUntil`` is trusted when checking status.
+    STATUS_LIST_CHECK_TTL: int = Field(default=300)
+    #: Status lists kept decoded in memory for status checks, the oldest are dropped first.
+    STATUS_LIST_CHECK_MAX_LISTS: int = Field(default=1000)
+
+    #: ``Cache-Control`` sent with each kind of public resource.
+    CACHE_CONTROL_CREDENTIALS: str = Field(default="public, max-age=3600")
+    CACHE_CONTROL_STATUS_LISTS: str = Field(default="public, max-age=60")
+    CACHE_CONTROL_RELATED_RESOURCES: str = Field(default="public, max-age=86400")
 
     SECRET_KEY: str = Field(default="dev-local")
     JWT_SECRET: str = Field(default="dev-local")
@@ -59,6 +140,13 @@ class Settings(BaseSettings):
     MONGO_USER: str = Field(default="dev")
     MONGO_PASSWORD: str = Field(default="dev")
     MONGO_DB: str = Field(default="dev")
+    #: Connection pool of the shared Mongo client, one per worker.
+    MONGO_MAX_POOL_SIZE: int = Field(default=100)
+    MONGO_MIN_POOL_SIZE: int = Field(default=0)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = Field(default=5000)
+    MONGO_CONNECT_TIMEOUT_MS: int = Field(default=5000)
+    #: https://www.mongodb.com/docs/manual/core/read-preference/#read-preference-modes
+    MONGO_READ_PREFERENCE: str = Field(default="primary")
 
     @computed_field
     @property
@@ -1,13 +1,34 @@
 import uvicorn
 import asyncio
+import multiprocessing
+from config import settings
 from app.plugins import TractionController
+from app.plugins.http import http_clients
+
+
+async def provision():
+    http_clients.open_traction()
+    try:
+        await TractionController().provision()
+    finally:
+        await http_clients.close()
+
+
+def run_provision():
+    asyncio.run(provision())
+
 
 if __name__ == "__main__":
-    asyncio.run(TractionController().provision())
+    if settings.PROVISION_IN_BACKGROUND:
+        # Provision from a side process while the server is already accepting traffic
+        multiprocessing.Process(target=run_provision, daemon=True).start()
+    else:
+        run_provision()
     uvicorn.run(
         "app:app",
         host="0.0.0.0",
         port=8000,
         # reload=True,
+        # Each process also runs PUBLISH_JOB_WORKERS publish job workers, none by default
         workers=4,
     )
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Converge MongoDB indexes on the spec in ``app/plugins/indexes.py``.
+
+Creates missing indexes, rebuilds indexes whose definition changed and drops
+indexes outside the spec. Running it again on a converged database does
+nothing. Afterwards, every registered query shape is explained and those still
+planned as a COLLSCAN are listed.
+
+Usage (from ``backend/``)::
+
+    uv run python scripts/migrate_indexes.py [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.plugins.indexes import collection_scans, converge_indexes  # noqa: E402
+from app.plugins.mongodb import MongoClient  # noqa: E402
+
+
+def main(args: argparse.Namespace) -> int:
+    db = MongoClient().db
+    actions = converge_indexes(db, dry_run=args.dry_run)
+    for action, collection, name in actions:
+        print(
+            f"{'Would ' + action if args.dry_run else action.capitalize()} {collection}.{name}"
+        )
+    if not actions:
+        print("Indexes already converged.")
+    if args.dry_run:
+        return 0
+
+    scans = collection_scans(db)
+    for shape in scans:
+        print(f"COLLSCAN {shape.collection} {shape.filter}")
+    return 1 if scans else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--dry-run", action="store_true", help="List the changes without applying them."
+    )
+    sys.exit(main(parser.parse_args()))
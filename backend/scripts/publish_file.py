@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Publish a JSON lines file of ``Publication`` records to the publisher.
+
+The file is streamed to ``/credentials/publish/stream`` one line at a time,
+in parts of ``--lines-per-request`` lines so neither side ever holds the
+whole file. Each part's results are written as they are received, one JSON
+object per input line with its line number in the file.
+
+Usage (from ``backend/``)::
+
+    uv run python scripts/publish_file.py FILE --url URL --client-id DID --client-secret SECRET
+        [--lines-per-request N] [--output RESULTS]
+
+Exits non-zero if any publication failed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+TOKEN_LIFETIME = 3000
+
+
+class Uploader:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.client = httpx.Client(
+            base_url=args.url, timeout=httpx.Timeout(60, read=None)
+        )
+        self.token, self.token_issued = None, 0.0
+
+    def headers(self) -> dict:
+        # Tokens expire after an hour, long uploads request a new one between parts
+        if not self.token or time.monotonic() - self.token_issued > TOKEN_LIFETIME:
+            r = self.client.post(
+                "/auth/token",
+                json={
+                    "client_id": self.args.client_id,
+                    "client_secret": self.args.client_secret,
+                },
+            )
+            r.raise_for_status()
+            self.token, self.token_issued = r.json()["access_token"], time.monotonic()
+        return {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/x-ndjson",
+        }
+
+    def upload(self, source, output) -> dict:
+        summary, offset = {}, 0
+        while first := source.readline():
+            sent = [first]
+
+            def part():
+                yield first
+                while len(sent) < self.args.lines_per_request and (
+                    line := source.readline()
+                ):
+                    sent.append(line)
+                    yield line
+
+            with self.client.stream(
+                "POST",
+                "/credentials/publish/stream",
+                content=part(),
+                headers=self.headers(),
+            ) as r:
+                if r.status_code != 200:
+                    r.read()
+                    raise SystemExit(f"Upload failed with {r.status_code}: {r.text}")
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    result = json.loads(line)
+                    result["line"] += offset
+                    summary[result["status"]] = summary.get(result["status"], 0) + 1
+                    output.write(json.dumps(result) + "\n")
+            offset += len(sent)
+        return summary
+
+
+def main(args: argparse.Namespace) -> int:
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        with open(args.file, "rb") as source:
+            summary = Uploader(args).upload(source, output)
+    finally:
+        if args.output:
+            output.close()
+    counts = [f"{count} x {status}" for status, count in sorted(summary.items())]
+    print(", ".join(counts) or "Empty file.", file=sys.stderr)
+    return 1 if any(status >= 400 for status in summary) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "file", type=Path, help="JSON lines file, one publication per line"
+    )
+    parser.add_argument("--url", required=True, help="Publisher base URL")
+    parser.add_argument("--client-id", required=True, help="Issuer DID")
+    parser.add_argument("--client-secret", required=True)
+    parser.add_argument(
+        "--lines-per-request",
+        type=int,
+        default=1000,
+        help="Lines streamed per request, results of a request are read once it is sent",
+    )
+    parser.add_argument("--output", help="Results file, defaults to stdout")
+    sys.exit(main(parser.parse_args()))
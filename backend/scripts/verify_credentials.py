@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Re-verify the DataIntegrity proofs of stored credentials.
+
+Loads ``CredentialRecord.vc`` documents from MongoDB and verifies their
+``eddsa-jcs-2022`` proofs locally, spreading signature checks across CPU
+cores. DIDs are resolved through Traction once per DID, not once per
+credential. Useful for audits and for checking a corpus after a key rotation.
+
+Usage (from ``backend/``)::
+
+    uv run python scripts/verify_credentials.py [--type TYPE] [--issuer DID] [--all]
+
+Credentials whose issuer DID can't be resolved are reported as UNKNOWN rather
+than FAILED. Exits non-zero if any proof fails to verify or is unknown.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.plugins.data_integrity import local_verifier  # noqa: E402
+from app.plugins.http import http_clients  # noqa: E402
+from app.plugins.mongodb import MongoClient  # noqa: E402
+from app.plugins.traction import TractionController  # noqa: E402
+
+
+def _query(args: argparse.Namespace) -> dict:
+    query = {}
+    if args.type:
+        query["type"] = args.type
+    if args.issuer:
+        query["vc.issuer.id"] = args.issuer
+    if not args.all:
+        query["refresh"] = False
+    return query
+
+
+async def main(args: argparse.Namespace) -> int:
+    records = list(
+        MongoClient().find("CredentialRecord", _query(args), {"id": 1, "vc": 1})
+    )
+    print(f"Verifying {len(records)} credentials.")
+
+    http_clients.open_traction()
+    try:
+        traction = TractionController()
+        results = await local_verifier.verify_batch(
+            [record["vc"] for record in records], traction.resolve
+        )
+    finally:
+        await http_clients.close()
+
+    failed = [
+        record["id"] for record, verified in zip(records, results) if verified is False
+    ]
+    unknown = [
+        record["id"] for record, verified in zip(records, results) if verified is None
+    ]
+    for credential_id in failed:
+        print(f"FAILED {credential_id}")
+    for credential_id in unknown:
+        print(f"UNKNOWN {credential_id}")
+    print(
+        f"{len(records) - len(failed) - len(unknown)} verified, "
+        f"{len(failed)} failed, {len(unknown)} unknown."
+    )
+    return 1 if failed or unknown else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--type", help="Only verify credentials of this type.")
+    parser.add_argument(
+        "--issuer", help="Only verify credentials from this issuer DID."
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Include credentials superseded by a refresh.",
+    )
+    sys.exit(asyncio.run(main(parser.parse_args())))
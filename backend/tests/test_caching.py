@@ -0,0 +1,41 @@
+"""Entity tag handling shared by the public read endpoints."""
+
+from __future__ import annotations
+
+from fastapi import Request
+
+from app.caching import is_not_modified, not_modified, strong_etag, weak_etag
+
+
+def _request(if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_strong_etag_is_quoted_per_representation() -> None:
+    assert strong_etag("zDigest") == '"zDigest"'
+    assert strong_etag("zDigest", "jwt") == '"zDigest-jwt"'
+
+
+def test_if_none_match_uses_weak_comparison_over_tag_lists() -> None:
+    etag = strong_etag("zDigest", "vc")
+    assert not is_not_modified(_request(), etag)
+    assert is_not_modified(_request('"zOther", W/"zDigest-vc"'), etag)
+    assert is_not_modified(_request("*"), etag)
+    assert not is_not_modified(_request('"zDigest-jwt"'), etag)
+
+
+def test_weak_etag_matches_weak_and_strong_validators() -> None:
+    etag = weak_etag("list-3", "vc")
+    assert etag == 'W/"list-3-vc"'
+    assert is_not_modified(_request('W/"list-3-vc"'), etag)
+    assert is_not_modified(_request('"list-3-vc"'), etag)
+    assert not is_not_modified(_request('W/"list-2-vc"'), etag)
+
+
+def test_not_modified_response_carries_validators() -> None:
+    response = not_modified('"zDigest"', "public, max-age=60", vary="Accept")
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"zDigest"'
+    assert response.headers["cache-control"] == "public, max-age=60"
+    assert response.headers["vary"] == "Accept"
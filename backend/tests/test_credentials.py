@@ -0,0 +1,584 @@
+"""Representation-specific reads of the public credential endpoints."""
+
+from __future__ import annotations
+
+import asyncio
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from app.plugins.http import DependencyUnavailableError
+from app.plugins.publish_plans import publish_plans
+from app.plugins.repositories import get_repositories
+from app.plugins.status_list import (
+    BitstringStatusListError,
+    signed_status_list_cache,
+    status_list_manager,
+)
+from app.routers import credentials as credentials_router
+from app.routers.credentials import CREDENTIAL_PROJECTIONS
+from config import settings
+import time
+
+RECORD = {
+    "id": "example",
+    "type": "ExampleCredential",
+    "cardinality_id": "0001",
+    "digest": "zDigest",
+    "vc_jwt": "eyJ.example.jwt",
+    "vc": {
+        "id": "https://example.com/credentials/example",
+        "name": "Example Credential",
+        "issuer": {"id": "did:web:example.com", "name": "Example Issuer"},
+        "credentialSubject": {
+            "issuedToParty": {"registeredId": "A0000000", "name": "Example Ltd."}
+        },
+    },
+}
+
+
+def _project(record: dict, projection: dict | None) -> dict:
+    if not projection:
+        return dict(record)
+    projected = {}
+    for path in projection:
+        source, target = record, projected
+        *parents, leaf = path.split(".")
+        for name in parents:
+            if name not in source:
+                break
+            source = source[name]
+            target = target.setdefault(name, {})
+        else:
+            if leaf in source:
+                target[leaf] = source[leaf]
+    return projected
+
+
+class _Credentials:
+    def __init__(self) -> None:
+        self.projections = []
+
+    async def get(self, credential_id, projection=None):
+        self.projections.append(projection)
+        return _project(RECORD, projection) if credential_id == RECORD["id"] else None
+
+    async def get_current(
+        self, credential_type, entity_id, cardinality_id, projection=None
+    ):
+        self.projections.append(projection)
+        return _project(RECORD, projection)
+
+
+class _Repositories:
+    def __init__(self) -> None:
+        self.credentials = _Credentials()
+
+
+def _client(repositories: _Repositories) -> TestClient:
+    app.dependency_overrides[get_repositories] = lambda: repositories
+    return TestClient(app)
+
+
+def test_jwt_read_projects_only_the_jwt() -> None:
+    repositories = _Repositories()
+    try:
+        r = _client(repositories).get(
+            "/credentials/example", headers={"Accept": "application/vc+jwt"}
+        )
+    finally:
+        app.dependency_overrides.clear()
+    assert r.status_code == 200
+    assert r.text == RECORD["vc_jwt"]
+    assert r.headers["etag"] == '"zDigest-jwt"'
+    assert repositories.credentials.projections == [CREDENTIAL_PROJECTIONS["jwt"]]
+
+
+def test_vc_read_projects_only_the_vc() -> None:
+    repositories = _Repositories()
+    try:
+        r = _client(repositories).get(
+            "/credentials/example", headers={"Accept": "application/vc"}
+        )
+    finally:
+        app.dependency_overrides.clear()
+    assert r.status_code == 200
+    assert r.json() == RECORD["vc"]
+    assert "vc_jwt" not in CREDENTIAL_PROJECTIONS["vc"]
+
+
+def test_html_view_renders_from_minimal_projection() -> None:
+    repositories = _Repositories()
+    try:
+        r = _client(repositories).get(
+            "/credentials/example", headers={"Accept": "text/html"}
+        )
+    finally:
+        app.dependency_overrides.clear()
+    assert r.status_code == 200
+    assert "Example Issuer" in r.text and "Example Ltd." in r.text
+    assert RECORD["vc_jwt"] not in r.text
+    assert not {"vc", "vc_jwt"} & set(CREDENTIAL_PROJECTIONS["html"])
+
+
+def test_refresh_projects_the_negotiated_representation() -> None:
+    repositories = _Repositories()
+    try:
+        client = _client(repositories)
+        jwt = client.get(
+            "/credentials/refresh",
+            params={
+                "type": "ExampleCredential",
+                "entity": "A0000000",
+                "cardinality": "0001",
+            },
+            headers={"Accept": "application/vc+jwt"},
+        )
+        vc = client.get(
+            "/credentials/refresh",
+            params={
+                "type": "ExampleCredential",
+                "entity": "A0000000",
+                "cardinality": "0001",
+            },
+        )
+    finally:
+        app.dependency_overrides.clear()
+    assert jwt.text == RECORD["vc_jwt"]
+    assert vc.json() == RECORD["vc"]
+    assert repositories.credentials.projections == [
+        CREDENTIAL_PROJECTIONS["jwt"],
+        CREDENTIAL_PROJECTIONS["vc"],
+    ]
+
+
+def _status_entry(purpose: str, endpoint: str, index: int) -> dict:
+    return {
+        "type": "BitstringStatusListEntry",
+        "statusPurpose": purpose,
+        "statusListIndex": str(index),
+        "statusListCredential": endpoint,
+    }
+
+
+class _StatusCredentials:
+    def __init__(self, records: list) -> None:
+        self.records = records
+        self.updates = []
+
+    async def find_by_ids(self, credential_ids, projection=None):
+        return [record for record in self.records if record["id"] in credential_ids]
+
+    async def set_status(self, credential_ids, status_purpose, value):
+        self.updates.append((credential_ids, status_purpose, value))
+        return len(credential_ids)
+
+
+class _StatusRepositories:
+    def __init__(self, records: list) -> None:
+        self.credentials = _StatusCredentials(records)
+
+
+def test_status_update_reports_each_status_list(monkeypatch) -> None:
+    records = [
+        {"id": "a", "vc": {"credentialStatus": [_status_entry("revocation", "L1", 1)]}},
+        {"id": "b", "vc": {"credentialStatus": [_status_entry("revocation", "L2", 2)]}},
+        {"id": "c", "vc": {"credentialStatus": [_status_entry("suspension", "L1", 3)]}},
+    ]
+    repositories = _StatusRepositories(records)
+    written = []
+
+    async def set_status(repositories, endpoint, indexes, value):
+        if endpoint == "L2":
+            raise BitstringStatusListError("Concurrent updates on status list L2.")
+        written.append((endpoint, indexes, value))
+        return endpoint
+
+    monkeypatch.setattr(status_list_manager, "set_status", set_status)
+    try:
+        app.dependency_overrides[get_repositories] = lambda: repositories
+        r = TestClient(app).post(
+            "/credentials/status",
+            json={"credentialIds": ["a", "b", "c", "d"], "statusPurpose": "revocation"},
+            headers={"X-API-KEY": settings.TRACTION_API_KEY},
+        )
+    finally:
+        app.dependency_overrides.clear()
+    assert r.status_code == 409
+    assert r.json() == {
+        "updated": ["a"],
+        "notFound": ["d"],
+        "noStatusEntry": ["c"],
+        "failed": [
+            {
+                "statusListCredential": "L2",
+                "credentialIds": ["b"],
+                "detail": "Concurrent updates on status list L2.",
+            }
+        ],
+        "statusLists": 1,
+    }
+    # The list that was written has its credential flags updated
+    assert written == [("L1", [1], True)]
+    assert repositories.credentials.updates == [(["a"], "revocation", True)]
+
+
+def test_status_update_succeeds_without_failed_lists(monkeypatch) -> None:
+    records = [
+        {"id": "a", "vc": {"credentialStatus": _status_entry("suspension", "L1", 1)}},
+        {"id": "b", "vc": {"credentialStatus": [_status_entry("suspension", "L1", 4)]}},
+    ]
+    repositories = _StatusRepositories(records)
+    written = []
+
+    async def set_status(repositories, endpoint, indexes, value):
+        written.append((endpoint, indexes, value))
+        return endpoint
+
+    monkeypatch.setattr(status_list_manager, "set_status", set_status)
+    try:
+        app.dependency_overrides[get_repositories] = lambda: repositories
+        r = TestClient(app).post(
+            "/credentials/status",
+            json={
+                "credentialIds": ["a", "b"],
+                "statusPurpose": "suspension",
+                "status": False,
+            },
+            headers={"X-API-KEY": settings.TRACTION_API_KEY},
+        )
+    finally:
+        app.dependency_overrides.clear()
+    assert r.status_code == 200
+    assert r.json()["updated"] == ["a", "b"] and r.json()["failed"] == []
+    assert written == [("L1", [1, 4], False)]
+    assert repositories.credentials.updates == [(["a", "b"], "suspension", False)]
+
+
+class _StatusLists:
+    def __init__(self, revision: int) -> None:
+        self.revision = revision
+
+    async def get(self, status_list_id, projection=None):
+        if status_list_id != "list":
+            return None
+        return {
+            "revision": self.revision,
+            "credential": {"credentialSubject": {"statusPurpose": "revocation"}},
+        }
+
+
+class _StatusListRepositories:
+    def __init__(self, revision: int) -> None:
+        self.status_lists = _StatusLists(revision)
+
+
+def test_status_list_revalidates_on_its_revision_and_validity() -> None:
+    key = ("list", "revocation", "application/vc")
+    jwt_key = ("list", "revocation", "application/vc+jwt")
+    signed = {"id": "https://example.com/credentials/status/list", "proof": {}}
+    resigned = {"id": "https://example.com/credentials/status/list", "proof": {"n": 2}}
+    valid_until = int(time.time()) + 3600
+    signed_status_list_cache.entries[key] = (3, valid_until, signed)
+    signed_status_list_cache.entries[jwt_key] = (3, valid_until, "eyJ.list.jwt")
+    try:
+        app.dependency_overrides[get_repositories] = lambda: _StatusListRepositories(3)
+        client = TestClient(app)
+        r = client.get("/credentials/status/list")
+        etag = r.headers["etag"]
+        revalidated = client.get(
+            "/credentials/status/list", headers={"If-None-Match": etag}
+        )
+        jwt = client.get(
+            "/credentials/status/list",
+            headers={"If-None-Match": etag, "Accept": "application/vc+jwt"},
+        )
+        # Re-signed with no bit change, the new validity window must reach the client
+        signed_status_list_cache.entries[key] = (3, valid_until + 300, resigned)
+        renewed = client.get(
+            "/credentials/status/list", headers={"If-None-Match": etag}
+        )
+        app.dependency_overrides[get_repositories] = lambda: _StatusListRepositories(4)
+        signed_status_list_cache.entries[key] = (4, valid_until + 300, signed)
+        changed = client.get(
+            "/credentials/status/list",
+            headers={"If-None-Match": renewed.headers["etag"]},
+        )
+    finally:
+        app.dependency_overrides.clear()
+        signed_status_list_cache.entries.pop(key, None)
+        signed_status_list_cache.entries.pop(jwt_key, None)
+    assert r.status_code == 200 and r.json() == signed
+    assert etag == f'W/"list-3-{valid_until}-vc"'
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert revalidated.headers["cache-control"] == settings.CACHE_CONTROL_STATUS_LISTS
+    # Each representation has its own entity tag
+    assert jwt.status_code == 200
+    assert jwt.headers["etag"] == f'W/"list-3-{valid_until}-jwt"'
+    assert renewed.status_code == 200 and renewed.json() == resigned
+    assert renewed.headers["etag"] == f'W/"list-3-{valid_until + 300}-vc"'
+    assert changed.status_code == 200
+    assert changed.headers["etag"] == f'W/"list-4-{valid_until + 300}-vc"'
+
+
+REGISTRATION = {
+    "type": "ExampleCredential",
+    "version": "v1.0",
+    "issuer": "did:web:example.com",
+    "status_lists": ["status-list"],
+    "core_paths": {
+        "entityId": "$.credentialSubject.registeredId",
+        "cardinalityId": "$.credentialSubject.number",
+    },
+    "template": {
+        "@context": ["https://www.w3.org/ns/credentials/v2"],
+        "type": ["VerifiableCredential", "ExampleCredential"],
+        "name": "Example Credential",
+        "issuer": {"id": "did:web:example.com", "name": "Example Issuer"},
+        "credentialSubject": {"type": ["Example"]},
+        "renderMethod": [{"type": "OverlayCaptureBundle"}],
+    },
+}
+
+PUBLICATION = {
+    "credential": {
+        "type": "ExampleCredential",
+        "credentialSubject": {"registeredId": "A0000000", "number": "0001"},
+    },
+    "options": {
+        "entityId": "A0000000",
+        "cardinalityId": "0001",
+        "credentialId": "example",
+    },
+}
+
+
+class _CredentialTypes:
+    async def get(self, credential_type, projection=None):
+        return REGISTRATION if credential_type == REGISTRATION["type"] else None
+
+
+class _PublishCredentials:
+    def __init__(self, unchanged: dict | None = None) -> None:
+        self.unchanged = unchanged
+        self.records = []
+        self.events = []
+
+    async def get_unchanged(
+        self, credential_type, entity_id, cardinality_id, cardinality_hash
+    ):
+        return self.unchanged
+
+    async def supersede(self, credential_type, entity_id, cardinality_id):
+        self.events.append("supersede started")
+        await asyncio.sleep(0.01)
+        self.events.append("supersede done")
+        return 1
+
+    async def create(self, record):
+        self.records.append(record)
+
+
+class _Jobs:
+    def __init__(self) -> None:
+        self.records = {}
+
+    async def create(self, record):
+        self.records[record["id"]] = record
+
+    async def get(self, job_id):
+        return self.records.get(job_id)
+
+
+class _PublishRepositories:
+    def __init__(self, unchanged: dict | None = None) -> None:
+        self.credential_types = _CredentialTypes()
+        self.credentials = _PublishCredentials(unchanged)
+        self.jobs = _Jobs()
+
+
+class _Traction:
+    issued = []
+
+    async def authorize(self):
+        pass
+
+    async def issue_vc(self, credential):
+        self.issued.append(credential)
+        return credential | {"proof": {"type": "DataIntegrityProof"}}
+
+    async def sign_vc_jwt(self, document):
+        return "eyJ.example.jwt"
+
+
+class _Orgbook:
+    async def fetch_buisness_info(self, identifier):
+        if identifier == "DOWN":
+            raise DependencyUnavailableError("orgbook circuit is open.")
+        if identifier == "UNKNOWN":
+            raise IndexError(identifier)
+        return {
+            "id": f"https://orgbook.example/entity/{identifier}",
+            "name": "Example Ltd.",
+        }
+
+
+@pytest.fixture
+def publish(monkeypatch: pytest.MonkeyPatch):
+    """Post publications with Traction, OrgBook and status lists stubbed out."""
+
+    async def allocate(repositories, credential_registration, count):
+        repositories.credentials.events.append("format started")
+        await asyncio.sleep(0.01)
+        repositories.credentials.events.append("format done")
+        return "https://example.com/credentials/status/list", list(range(count))
+
+    monkeypatch.setattr(settings, "DOMAIN", "publisher.example.com")
+    monkeypatch.setattr(credentials_router, "TractionController", _Traction)
+    monkeypatch.setattr(credentials_router, "OrgbookClient", _Orgbook)
+    monkeypatch.setattr(status_list_manager, "allocate", allocate)
+    monkeypatch.setattr(publish_plans, "versions", {})
+    monkeypatch.setattr(publish_plans, "plans", {})
+    monkeypatch.setattr(_Traction, "issued", [])
+    token = jwt.encode(
+        {"client_id": "example", "expires": int(time.time()) + 3600},
+        settings.JWT_SECRET,
+        algorithm=settings.JWT_ALGORITHM,
+    )
+
+    def post(repositories, publication=PUBLICATION, headers=None):
+        app.dependency_overrides[get_repositories] = lambda: repositories
+        try:
+            return TestClient(app).post(
+                "/credentials/publish",
+                json=publication,
+                headers={"Authorization": f"Bearer {token}"} | (headers or {}),
+            )
+        finally:
+            app.dependency_overrides.clear()
+
+    post.token = token
+    return post
+
+
+def _publication(**options) -> dict:
+    return PUBLICATION | {"options": PUBLICATION["options"] | options}
+
+
+def test_publish_issues_and_stores_the_credential(publish) -> None:
+    repositories = _PublishRepositories()
+    r = publish(repositories)
+
+    assert r.status_code == 201
+    credential_id = r.json()["credentialId"]
+    assert credential_id == "https://publisher.example.com/credentials/example"
+    (record,) = repositories.credentials.records
+    assert record["id"] == "example" and record["vc_jwt"] == "eyJ.example.jwt"
+    assert record["vc"]["credentialSubject"]["number"] == "0001"
+    assert [entry["statusListIndex"] for entry in record["vc"]["credentialStatus"]] == [
+        "0",
+        "1",
+        "2",
+    ]
+    # Formatting started before the older records were superseded
+    events = repositories.credentials.events
+    assert set(events[:2]) == {"supersede started", "format started"}
+    stages = [stage.split(";")[0] for stage in r.headers["server-timing"].split(", ")]
+    assert set(stages) == {
+        "credential_type",
+        "orgbook",
+        "cardinality",
+        "authorize",
+        "format",
+        "supersede",
+        "issue_vc",
+        "sign_vc_jwt",
+        "store",
+    }
+
+
+def test_publish_keeps_an_unchanged_credential(publish) -> None:
+    repositories = _PublishRepositories(
+        unchanged={"id": "example", "vc": {"id": "urn:unchanged"}}
+    )
+    r = publish(repositories)
+
+    assert r.status_code == 200
+    assert r.json() == {"credentialId": "urn:unchanged"}
+    assert "cardinality;dur=" in r.headers["server-timing"]
+    assert not repositories.credentials.events
+    assert not repositories.credentials.records and not _Traction.issued
+
+
+def test_publish_rejects_unregistered_types_and_unknown_entities(publish) -> None:
+    repositories = _PublishRepositories()
+    unregistered = publish(
+        repositories,
+        PUBLICATION
+        | {"credential": PUBLICATION["credential"] | {"type": "UnknownCredential"}},
+    )
+    unknown = publish(repositories, _publication(entityId="UNKNOWN"))
+
+    assert unregistered.status_code == 404
+    assert unregistered.json()["detail"] == "Unregistered credential type"
+    assert unknown.status_code == 404
+    assert unknown.json()["detail"] == "No orgbook registration found for UNKNOWN"
+    assert not repositories.credentials.records and not _Traction.issued
+
+
+def test_publish_reports_unavailable_dependencies(publish) -> None:
+    repositories = _PublishRepositories()
+    r = publish(repositories, _publication(entityId="DOWN"))
+
+    assert r.status_code == 503
+    assert r.json()["detail"] == "orgbook circuit is open."
+    assert r.headers["retry-after"]
+    assert not repositories.credentials.records
+
+
+def test_publish_queues_the_publication_when_asked_to(publish, monkeypatch) -> None:
+    repositories = _PublishRepositories()
+    # Without job workers nothing would drain the queue, the preference is ignored
+    ignored = publish(repositories, headers={"Prefer": "respond-async"})
+    assert ignored.status_code == 201
+    assert "preference-applied" not in ignored.headers
+    repositories = _PublishRepositories()
+    _Traction.issued.clear()
+
+    monkeypatch.setattr(settings, "PUBLISH_JOB_WORKERS", 2)
+    r = publish(repositories, headers={"Prefer": "respond-async"})
+
+    assert r.status_code == 202
+    assert r.headers["preference-applied"] == "respond-async"
+    job_id = r.json()["jobId"]
+    assert r.headers["location"] == f"/credentials/jobs/{job_id}"
+    assert (
+        r.json()["credentialId"] == "https://publisher.example.com/credentials/example"
+    )
+    assert repositories.jobs.records[job_id]["publication"] == {
+        "credential": PUBLICATION["credential"],
+        "options": PUBLICATION["options"],
+    }
+    assert not repositories.credentials.records and not _Traction.issued
+
+    app.dependency_overrides[get_repositories] = lambda: repositories
+    try:
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {publish.token}"}
+        job = client.get(r.headers["location"], headers=headers)
+        missing = client.get("/credentials/jobs/missing", headers=headers)
+    finally:
+        app.dependency_overrides.clear()
+    assert job.status_code == 200
+    assert job.json() | {"created": None, "updated": None} == {
+        "id": job_id,
+        "status": "queued",
+        "attempts": 0,
+        "created": None,
+        "updated": None,
+        "result": None,
+    }
+    assert missing.status_code == 404
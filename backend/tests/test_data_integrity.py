@@ -0,0 +1,305 @@
+"""In-process ``eddsa-jcs-2022`` proofs for publisher-held ``did:key`` keys."""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import os
+from pathlib import Path
+
+import httpx
+import pytest
+from aries_askar import Key, KeyAlg
+
+from app.plugins import traction
+from app.plugins.data_integrity import (
+    EddsaJcs2022,
+    LocalKeystore,
+    LocalSigner,
+    LocalVerifier,
+    VerificationMethodCache,
+)
+from app.plugins.traction import TractionController, TractionTokenManager
+from app.utils import timestamp
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+DOCUMENT = {
+    "@context": ["https://www.w3.org/ns/credentials/v2"],
+    "type": ["VerifiableCredential", "BitstringStatusListCredential"],
+    "issuer": "did:web:example.com",
+    "credentialSubject": {"type": "BitstringStatusList", "statusPurpose": "revocation"},
+}
+
+
+def _signer() -> tuple[LocalSigner, str]:
+    keystore = LocalKeystore()
+    multikey = keystore.add(Key.generate(KeyAlg.ED25519))
+    return LocalSigner(keystore), f"did:key:{multikey}#{multikey}"
+
+
+def _options(verification_method: str) -> dict:
+    return {
+        "type": "DataIntegrityProof",
+        "cryptosuite": "eddsa-jcs-2022",
+        "proofPurpose": "assertionMethod",
+        "verificationMethod": verification_method,
+        "created": "2025-01-01T00:00:00+00:00",
+    }
+
+
+def test_proof_verifies_and_detects_tampering() -> None:
+    signer, verification_method = _signer()
+    secured = signer.add_proof(DOCUMENT, _options(verification_method))
+    key = signer.keystore.get(verification_method)
+
+    assert secured["proof"]["proofValue"].startswith("z")
+    assert "@context" not in secured["proof"]
+    assert EddsaJcs2022().verify_proof(secured, key)
+
+    tampered = copy.deepcopy(secured)
+    tampered["credentialSubject"]["statusPurpose"] = "suspension"
+    assert not EddsaJcs2022().verify_proof(tampered, key)
+
+
+def test_proofs_are_deterministic_and_independent_of_key_order() -> None:
+    signer, verification_method = _signer()
+    reordered = dict(reversed(list(DOCUMENT.items())))
+    first = signer.add_proof(DOCUMENT, _options(verification_method))
+    second = signer.add_proof(reordered, _options(verification_method))
+    assert first["proof"]["proofValue"] == second["proof"]["proofValue"]
+
+
+def test_keystore_loads_jwks_from_file(tmp_path) -> None:
+    key = Key.generate(KeyAlg.ED25519)
+    path = tmp_path / "keystore.json"
+    path.write_text(json.dumps({"keys": [json.loads(key.get_jwk_secret())]}))
+    multikey = LocalKeystore.multikey(key)
+    keystore = LocalKeystore(str(path))
+    assert keystore.get(f"did:key:{multikey}#{multikey}") is not None
+
+
+def test_add_di_proof_only_calls_traction_for_remote_keys(monkeypatch) -> None:
+    signer, verification_method = _signer()
+    remote = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/token"):
+            return httpx.Response(200, json={"token": "token"})
+        remote.append(json.loads(request.content)["options"]["verificationMethod"])
+        return httpx.Response(200, json={"securedDocument": {"proof": {}}})
+
+    async def scenario():
+        monkeypatch.setattr(traction, "local_signer", signer)
+        monkeypatch.setattr(
+            traction,
+            "traction_tokens",
+            TractionTokenManager(refresh_margin=300, default_ttl=3600),
+        )
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            monkeypatch.setitem(traction.http_clients.clients, "traction", client)
+            controller = TractionController()
+            local = await controller.add_di_proof(
+                DOCUMENT, _options(verification_method)
+            )
+            await controller.add_di_proof(
+                DOCUMENT, _options("did:web:example.com#key-01-multikey")
+            )
+            return local
+
+    local = asyncio.run(scenario())
+    assert local["proof"]["verificationMethod"] == verification_method
+    assert remote == ["did:web:example.com#key-01-multikey"]
+
+
+def _did_web_signer() -> tuple[LocalSigner, dict]:
+    key = Key.generate(KeyAlg.ED25519)
+    multikey = LocalKeystore.multikey(key)
+    keystore = LocalKeystore()
+    keystore.keys["did:web:example.com#key-01-multikey"] = key
+    keystore.keys["did:web:example.com#key-01-jwk"] = key
+    did_document = {
+        "id": "did:web:example.com",
+        "verificationMethod": [
+            {
+                "id": "did:web:example.com#key-01-multikey",
+                "type": "Multikey",
+                "controller": "did:web:example.com",
+                "publicKeyMultibase": multikey,
+            },
+            {
+                "id": "#key-01-jwk",
+                "type": "JsonWebKey",
+                "controller": "did:web:example.com",
+                "publicKeyJwk": json.loads(key.get_jwk_public()),
+            },
+        ],
+        "assertionMethod": ["did:web:example.com#key-01-multikey", "#key-01-jwk"],
+        "authentication": ["#key-01-jwk"],
+    }
+    return LocalSigner(keystore), did_document
+
+
+def test_verifier_resolves_each_did_once_and_caches_missing_methods() -> None:
+    signer, did_document = _did_web_signer()
+    secured = signer.add_proof(
+        DOCUMENT, _options("did:web:example.com#key-01-multikey")
+    )
+    unknown = signer.add_proof(
+        DOCUMENT, _options("did:web:example.com#key-01-multikey")
+    )
+    unknown["proof"]["verificationMethod"] = "did:web:example.com#key-99"
+    resolutions = []
+
+    async def resolve_did(did):
+        resolutions.append(did)
+        await asyncio.sleep(0.01)
+        return did_document
+
+    async def scenario():
+        verifier = LocalVerifier(VerificationMethodCache(ttl=3600, negative_ttl=60))
+        verified = await asyncio.gather(
+            *[verifier.verify(secured, resolve_did) for _ in range(10)]
+        )
+        missing = await verifier.verify(unknown, resolve_did)
+        missing_again = await verifier.verify(unknown, resolve_did)
+        return verified, missing, missing_again, verifier.cache.entries
+
+    verified, missing, missing_again, entries = asyncio.run(scenario())
+    assert all(verified)
+    assert not missing and not missing_again
+    assert resolutions == ["did:web:example.com", "did:web:example.com"]
+    jwk_method = entries["did:web:example.com#key-01-jwk"][1]
+    assert (
+        jwk_method.multikey
+        == did_document["verificationMethod"][0]["publicKeyMultibase"]
+    )
+    assert jwk_method.relationships == {"assertionMethod", "authentication"}
+    assert entries["did:web:example.com#key-99"][1] is None
+
+
+def test_batch_verification_runs_across_processes() -> None:
+    signer, verification_method = _signer()
+    issuer = verification_method.split("#")[0]
+    documents = [
+        signer.add_proof(
+            DOCUMENT | {"id": f"urn:uuid:{index}", "issuer": issuer},
+            _options(verification_method),
+        )
+        for index in range(8)
+    ]
+    documents[3]["id"] = "urn:uuid:tampered"
+
+    async def resolve_did(did):
+        raise AssertionError("did:key methods are decoded locally")
+
+    verifier = LocalVerifier(
+        VerificationMethodCache(ttl=3600, negative_ttl=60), max_workers=2
+    )
+    results = asyncio.run(verifier.verify_batch(documents, resolve_did))
+    assert results == [index != 3 for index in range(8)]
+
+
+def test_verifier_requires_the_issuer_to_authorize_the_method() -> None:
+    signer, did_document = _did_web_signer()
+    key_signer, key_method = _signer()
+
+    async def resolve_did(did):
+        return did_document
+
+    # A credential naming a did:web issuer but signed with an unrelated did:key
+    impostor = key_signer.add_proof(DOCUMENT, _options(key_method))
+    # The multikey is listed for assertions only, the JWK for both relationships
+    authentication = signer.add_proof(
+        DOCUMENT,
+        _options("did:web:example.com#key-01-multikey")
+        | {"proofPurpose": "authentication"},
+    )
+    presentation = {
+        "@context": ["https://www.w3.org/ns/credentials/v2"],
+        "type": ["VerifiablePresentation"],
+    }
+    presented = signer.add_proof(
+        presentation,
+        _options("did:web:example.com#key-01-jwk") | {"proofPurpose": "authentication"},
+    )
+    other_holder = signer.add_proof(
+        presentation | {"holder": "did:web:other.example"},
+        _options("did:web:example.com#key-01-jwk") | {"proofPurpose": "authentication"},
+    )
+
+    async def scenario():
+        verifier = LocalVerifier(VerificationMethodCache(ttl=3600, negative_ttl=60))
+        return [
+            await verifier.verify(document, resolve_did)
+            for document in (impostor, authentication, presented, other_holder)
+        ]
+
+    assert asyncio.run(scenario()) == [False, False, True, False]
+
+
+def test_verifier_reports_unresolved_dids_as_unknown_without_caching() -> None:
+    signer, did_document = _did_web_signer()
+    secured = signer.add_proof(
+        DOCUMENT, _options("did:web:example.com#key-01-multikey")
+    )
+    outage = [True]
+
+    async def resolve_did(did):
+        if outage[0]:
+            raise httpx.ConnectError("Traction is unavailable")
+        return did_document
+
+    async def scenario():
+        verifier = LocalVerifier(VerificationMethodCache(ttl=3600, negative_ttl=60))
+        during = await verifier.verify(secured, resolve_did)
+        batch = await verifier.verify_batch([secured], resolve_did)
+        outage[0] = False
+        after = await verifier.verify(secured, resolve_did)
+        return during, batch, after
+
+    assert asyncio.run(scenario()) == (None, [None], True)
+
+
+@pytest.mark.skipif(
+    not os.getenv("TRACTION_CONFORMANCE"),
+    reason="Requires a Traction tenant holding the keys of PUBLISHER_KEYSTORE.",
+)
+def test_local_proofs_match_traction_proofs() -> None:
+    signer = traction.local_signer
+    multikey = traction.settings.PUBLISHER_MULTIKEY
+    options = _options(f"did:key:{multikey}#{multikey}") | {"created": timestamp()}
+
+    async def scenario():
+        traction.http_clients.open_traction()
+        try:
+            controller = TractionController()
+            return await controller._request(
+                "POST",
+                "/vc/di/add-proof",
+                "securedDocument",
+                json={"document": DOCUMENT, "options": options},
+            )
+        finally:
+            await traction.http_clients.close()
+
+    remote = asyncio.run(scenario())
+    # Ed25519 signatures are deterministic, so both engines produce the same proof
+    assert [signer.add_proof(DOCUMENT, options)["proof"]] == remote["proof"]
+
+
+def test_local_proofs_match_the_recorded_traction_proof() -> None:
+    with open(FIXTURES / "traction_proofs" / "eddsa_jcs_2022.json") as f:
+        fixture = json.load(f)
+    key = Key.from_secret_bytes(KeyAlg.ED25519, fixture["seed"].encode())
+    keystore = LocalKeystore()
+    keystore.add(key)
+    # Traction appends its proof to a list, the local signer sets a single proof
+    (remote_proof,) = fixture["securedDocument"]["proof"]
+
+    local = LocalSigner(keystore).add_proof(fixture["document"], fixture["options"])
+    assert local["proof"] == remote_proof
+    assert EddsaJcs2022().verify_proof(
+        fixture["securedDocument"] | {"proof": remote_proof}, key
+    )
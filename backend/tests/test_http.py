@@ -0,0 +1,190 @@
+"""Retry, circuit breaker and bulkhead policies of outbound dependencies."""
+
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.plugins.http import CircuitBreaker, Dependency, DependencyUnavailableError
+
+
+def _dependency(
+    handler, max_concurrency: int = 10, failure_threshold: int = 5
+) -> Dependency:
+    return Dependency(
+        "test",
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        max_concurrency=max_concurrency,
+        retries=2,
+        backoff=0,
+        backoff_max=0,
+        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=30),
+    )
+
+
+def test_idempotent_requests_are_retried_and_posts_are_not() -> None:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.method)
+        if len(calls) in (1, 4):
+            return httpx.Response(503)
+        return httpx.Response(200)
+
+    async def scenario():
+        dependency = _dependency(handler)
+        fetched = await dependency.get("https://example.com")
+        await dependency.get("https://example.com")
+        posted = await dependency.post("https://example.com")
+        return fetched, posted
+
+    fetched, posted = asyncio.run(scenario())
+    assert fetched.status_code == 200
+    assert posted.status_code == 503
+    assert calls == ["GET", "GET", "GET", "POST"]
+
+
+def test_transport_errors_surface_as_unavailable_after_retries() -> None:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.method)
+        raise httpx.ConnectError("refused", request=request)
+
+    with pytest.raises(DependencyUnavailableError):
+        asyncio.run(_dependency(handler).get("https://example.com"))
+    assert len(calls) == 3
+
+
+def test_circuit_opens_fails_fast_and_recovers_after_a_trial_call() -> None:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    breaker.opened_at -= 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    breaker.opened_at -= 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_open_circuit_short_circuits_requests() -> None:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.method)
+        return httpx.Response(503)
+
+    async def scenario():
+        dependency = _dependency(handler, failure_threshold=3)
+        await dependency.get("https://example.com")
+        with pytest.raises(DependencyUnavailableError):
+            await dependency.get("https://example.com")
+        return dependency.status()
+
+    status = asyncio.run(scenario())
+    assert len(calls) == 3
+    assert status["circuit"] == "open"
+
+
+def test_bulkhead_rejects_calls_beyond_its_capacity(monkeypatch) -> None:
+    from app.plugins import http
+
+    monkeypatch.setattr(http.settings, "HTTP_BULKHEAD_TIMEOUT", 0.01)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await release.wait()
+            return httpx.Response(200)
+
+        dependency = _dependency(handler, max_concurrency=1)
+        slow = asyncio.ensure_future(dependency.get("https://example.com"))
+        await asyncio.sleep(0)
+        with pytest.raises(DependencyUnavailableError):
+            await dependency.get("https://example.com")
+        in_flight = dependency.status()["inFlight"]
+        release.set()
+        return in_flight, (await slow).status_code
+
+    assert asyncio.run(scenario()) == (1, 200)
+
+
+def _half_open(dependency: Dependency) -> None:
+    dependency.breaker.failures = dependency.breaker.failure_threshold
+    dependency.breaker.opened_at = -dependency.breaker.reset_timeout
+    assert dependency.breaker.state == "half-open"
+
+
+def test_half_open_circuit_recovers_after_a_cancelled_trial() -> None:
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await release.wait()
+            return httpx.Response(200)
+
+        dependency = _dependency(handler)
+        _half_open(dependency)
+        trial = asyncio.ensure_future(dependency.get("https://example.com"))
+        await asyncio.sleep(0)
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        release.set()
+        return (
+            await dependency.get("https://example.com")
+        ).status_code, dependency.status()
+
+    status_code, status = asyncio.run(scenario())
+    assert status_code == 200
+    assert status["circuit"] == "closed" and status["inFlight"] == 0
+
+
+def test_half_open_circuit_recovers_after_a_saturated_or_failed_trial(
+    monkeypatch,
+) -> None:
+    from app.plugins import http
+
+    monkeypatch.setattr(http.settings, "HTTP_BULKHEAD_TIMEOUT", 0.01)
+    redirects = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/redirect":
+                redirects.append(request.url)
+                raise httpx.TooManyRedirects("loop", request=request)
+            await release.wait()
+            return httpx.Response(200)
+
+        dependency = _dependency(handler, max_concurrency=1)
+        busy = asyncio.ensure_future(dependency.get("https://example.com"))
+        await asyncio.sleep(0)
+        _half_open(dependency)
+        # Saturated: the trial is never taken
+        with pytest.raises(DependencyUnavailableError, match="saturated"):
+            await dependency.get("https://example.com")
+        release.set()
+        await busy
+        _half_open(dependency)
+        # A client-side error ends the trial without an outcome
+        with pytest.raises(httpx.TooManyRedirects):
+            await dependency.get("https://example.com/redirect")
+        assert dependency.breaker.state == "half-open"
+        return (await dependency.get("https://example.com")).status_code
+
+    assert asyncio.run(scenario()) == 200
+    assert len(redirects) == 1
@@ -0,0 +1,88 @@
+"""Index convergence and COLLSCAN detection against in-memory collections."""
+
+from __future__ import annotations
+
+from app.plugins import indexes
+from app.plugins.indexes import INDEXES, QueryShape, collection_scans, converge_indexes
+
+
+class _Collection:
+    def __init__(self, existing: dict | None = None) -> None:
+        self.indexes = {"_id_": {"key": {"_id": 1}}} | (existing or {})
+        self.plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+
+    def index_information(self) -> dict:
+        return dict(self.indexes)
+
+    def drop_index(self, name: str) -> None:
+        del self.indexes[name]
+
+    def create_index(self, keys, name, unique) -> None:
+        self.indexes[name] = {"key": dict(keys)} | ({"unique": True} if unique else {})
+
+    def find(self, filter, sort=None):
+        return self
+
+    def explain(self) -> dict:
+        return {"queryPlanner": {"winningPlan": self.plan}}
+
+
+class _Database(dict):
+    def __missing__(self, name: str) -> _Collection:
+        self[name] = _Collection()
+        return self[name]
+
+
+def test_converge_creates_rebuilds_and_drops_until_stable() -> None:
+    db = _Database()
+    # Legacy provisioning: auto-named unique index on id, and a unique index on version alone
+    db["CredentialRecord"] = _Collection({"id_1": {"key": {"id": 1}, "unique": True}})
+    db["CredentialTypeRecord"] = _Collection(
+        {"version_1": {"key": {"version": 1}, "unique": True}}
+    )
+    db["StatusListRecord"] = _Collection(
+        {"endpoint_1": {"key": {"endpoint": 1}, "unique": True}}
+    )
+
+    actions = converge_indexes(db)
+    assert ("drop", "CredentialTypeRecord", "version_1") in actions
+    assert ("drop", "StatusListRecord", "endpoint_1") in actions
+    assert ("create", "StatusListRecord", "endpoint_1") in actions
+    assert ("create", "CredentialRecord", "id_1") not in actions
+    assert (
+        "create",
+        "CredentialRecord",
+        "type_1_entity_id_1_cardinality_id_1_refresh_1__id_-1",
+    ) in actions
+
+    for collection, specs in INDEXES.items():
+        assert set(db[collection].indexes) == {"_id_"} | {spec.name for spec in specs}
+    assert converge_indexes(db) == []
+
+
+def test_dry_run_leaves_indexes_untouched() -> None:
+    db = _Database()
+    db["IssuerRecord"] = _Collection({"name_1": {"key": {"name": 1}}})
+    actions = converge_indexes(db, dry_run=True)
+    assert ("drop", "IssuerRecord", "name_1") in actions
+    assert set(db["IssuerRecord"].indexes) == {"_id_", "name_1"}
+
+
+def test_collection_scans_are_reported_per_query_shape(monkeypatch) -> None:
+    db = _Database()
+    db["CredentialRecord"].plan = {
+        "stage": "SORT",
+        "inputStage": {"stage": "COLLSCAN"},
+    }
+    db["StatusListRecord"].plan = {
+        "queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+    }
+    monkeypatch.setattr(
+        indexes,
+        "QUERY_SHAPES",
+        [
+            QueryShape("CredentialRecord", {"type": "ExampleCredential"}),
+            QueryShape("StatusListRecord", {"id": "example"}),
+        ],
+    )
+    assert [shape.collection for shape in collection_scans(db)] == ["CredentialRecord"]
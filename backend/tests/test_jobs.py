@@ -0,0 +1,200 @@
+"""Publish job queue against an in-memory job collection."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from app.plugins.jobs import PublishJobQueue
+
+
+class _Jobs:
+    """Stand-in for ``PublishJobRepository``, leasing the oldest available job."""
+
+    def __init__(self) -> None:
+        self.records = {}
+        self.sweeps = 0
+
+    async def create(self, job_record):
+        self.records[job_record["id"]] = dict(job_record)
+
+    async def get(self, job_id):
+        return self.records.get(job_id)
+
+    async def claim(self, now, lease, lease_id, max_attempts, updated):
+        available = [
+            job
+            for job in self.records.values()
+            if job["status"] in ("queued", "running")
+            and job["available"] <= now
+            and job["attempts"] < max_attempts
+        ]
+        if not available:
+            return None
+        job = min(available, key=lambda job: job["available"])
+        job.update(
+            status="running", available=now + lease, lease_id=lease_id, updated=updated
+        )
+        job["attempts"] += 1
+        return dict(job)
+
+    async def fail_exhausted(self, now, max_attempts, result, updated):
+        self.sweeps += 1
+        exhausted = [
+            job
+            for job in self.records.values()
+            if job["status"] == "running"
+            and job["available"] <= now
+            and job["attempts"] >= max_attempts
+        ]
+        for job in exhausted:
+            job.update(status="failed", result=result, updated=updated)
+        return len(exhausted)
+
+    async def finish(self, job_id, lease_id, status, result, updated, available=None):
+        job = self.records[job_id]
+        if job["status"] != "running" or job["lease_id"] != lease_id:
+            return 0
+        job.update(status=status, result=result, updated=updated)
+        if available is not None:
+            job["available"] = available
+        return 1
+
+
+class _Publisher:
+    def __init__(self, statuses: list) -> None:
+        self.statuses = statuses
+
+    async def publish(self, publications):
+        status = self.statuses.pop(0)
+        if isinstance(status, Exception):
+            raise status
+        return [
+            {
+                "status": status,
+                "credentialId": publications[0]["options"]["credentialId"],
+            }
+        ]
+
+
+class _Queue(PublishJobQueue):
+    def __init__(self, statuses: list) -> None:
+        super().__init__(max_attempts=3, backoff=0, lease=300, poll_interval=0)
+        self.publisher = _Publisher(statuses)
+
+    def _publisher(self, repositories):
+        return self.publisher
+
+
+PUBLICATION = {
+    "credential": {"type": "ExampleCredential"},
+    "options": {"credentialId": "example"},
+}
+
+
+def _drain(queue: PublishJobQueue, repositories) -> str:
+    async def scenario():
+        job_id = await queue.enqueue(repositories, PUBLICATION)
+        while await queue.run_once(repositories):
+            pass
+        return job_id
+
+    return asyncio.run(scenario())
+
+
+def test_job_is_retried_on_dependency_failures_until_published() -> None:
+    repositories = SimpleNamespace(jobs=_Jobs())
+    job_id = _drain(_Queue([503, RuntimeError("mongo"), 201]), repositories)
+
+    job = repositories.jobs.records[job_id]
+    assert job["status"] == "done"
+    assert job["attempts"] == 3
+    assert job["result"] == {"status": 201, "credentialId": "example"}
+
+
+def test_job_fails_after_max_attempts_or_on_client_errors() -> None:
+    repositories = SimpleNamespace(jobs=_Jobs())
+    exhausted = _drain(_Queue([503, 503, 503, 201]), repositories)
+    rejected = _drain(_Queue([404]), repositories)
+
+    assert repositories.jobs.records[exhausted]["status"] == "failed"
+    assert repositories.jobs.records[exhausted]["attempts"] == 3
+    assert repositories.jobs.records[rejected]["status"] == "failed"
+    assert repositories.jobs.records[rejected]["attempts"] == 1
+
+
+def test_workers_drain_the_queue_until_stopped() -> None:
+    repositories = SimpleNamespace(jobs=_Jobs())
+    queue = _Queue([201] * 5)
+
+    async def scenario():
+        job_ids = [await queue.enqueue(repositories, PUBLICATION) for _ in range(5)]
+        queue.start(2, repositories)
+        while any(
+            repositories.jobs.records[job_id]["status"] != "done" for job_id in job_ids
+        ):
+            await asyncio.sleep(0)
+        await queue.stop()
+        return queue.workers
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_job_whose_last_lease_expired_is_failed() -> None:
+    repositories = SimpleNamespace(jobs=_Jobs())
+    queue = _Queue([201])
+
+    async def scenario():
+        job_id = await queue.enqueue(repositories, PUBLICATION)
+        # A worker stopped during the last allowed attempt, its lease has ended
+        repositories.jobs.records[job_id].update(
+            status="running", attempts=3, available=0
+        )
+        claimed = await queue.run_once(repositories)
+        return job_id, claimed
+
+    job_id, claimed = asyncio.run(scenario())
+    job = repositories.jobs.records[job_id]
+    assert not claimed
+    assert job["status"] == "failed" and job["attempts"] == 3
+    assert job["result"]["status"] == 500
+    assert queue.publisher.statuses == [201]
+
+
+def test_idle_workers_sweep_expired_leases_once_per_lease_period() -> None:
+    repositories = SimpleNamespace(jobs=_Jobs())
+    queue = _Queue([])
+
+    async def scenario():
+        polls = [await queue.run_once(repositories) for _ in range(10)]
+        swept = repositories.jobs.sweeps
+        # Once a lease period has passed, the next empty poll sweeps again
+        queue.swept -= queue.lease
+        await queue.run_once(repositories)
+        return polls, swept
+
+    polls, swept = asyncio.run(scenario())
+    assert polls == [False] * 10
+    assert swept == 1
+    assert repositories.jobs.sweeps == 2
+
+
+def test_worker_without_the_lease_does_not_record_its_outcome() -> None:
+    repositories = SimpleNamespace(jobs=_Jobs())
+    queue = _Queue([503])
+
+    async def publish(publications):
+        # The lease ends mid-publication and another worker claims the job
+        await repositories.jobs.claim(float("inf"), 300, "other", 3, "later")
+        return [{"status": 503, "credentialId": "example"}]
+
+    queue.publisher.publish = publish
+
+    async def scenario():
+        job_id = await queue.enqueue(repositories, PUBLICATION)
+        await queue.run_once(repositories)
+        return job_id
+
+    job = repositories.jobs.records[asyncio.run(scenario())]
+    assert job["status"] == "running" and job["lease_id"] == "other"
+    assert job["attempts"] == 2 and job.get("result") is None
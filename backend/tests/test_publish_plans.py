@@ -0,0 +1,114 @@
+"""Compiled credential types and their per-worker cache."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from app.plugins.publish_plans import PublishPlan, PublishPlanCache
+
+REGISTRATION = {
+    "type": "ExampleCredential",
+    "version": "v1.0",
+    "issuer": "did:web:example.com",
+    "status_lists": ["example"],
+    "core_paths": {
+        "entityId": "$.credentialSubject.issuedToParty.registeredId",
+        "cardinalityId": "$.credentialSubject.number",
+    },
+    "additional_type": "DigitalConformityCredential",
+    "additional_paths": {
+        "facilities": "$.credentialSubject.assessment[0].assessedFacility",
+        "tags": "$.tags",
+    },
+    "template": {
+        "@context": ["https://www.w3.org/ns/credentials/v2"],
+        "type": ["VerifiableCredential", "ExampleCredential"],
+        "issuer": {"id": "did:web:example.com", "name": "Example Issuer"},
+        "credentialSubject": {"assessment": [{"assessedFacility": []}]},
+        "tags": [],
+    },
+}
+
+
+def test_new_credentials_never_write_into_the_template() -> None:
+    plan = PublishPlan(REGISTRATION)
+    assert plan.written_fields == {"credentialSubject", "tags"}
+
+    credential = plan.new_credential()
+    for attribute, path in plan.additional_paths.items():
+        path.update(credential, [attribute])
+    credential["credentialSubject"]["number"] = "1"
+
+    assert credential["tags"] == ["tags"]
+    assert credential["credentialSubject"]["assessment"][0]["assessedFacility"] == [
+        "facilities"
+    ]
+    assert REGISTRATION["template"]["tags"] == []
+    assert REGISTRATION["template"]["credentialSubject"] == {
+        "assessment": [{"assessedFacility": []}]
+    }
+    # Fields no publication writes into are shared with the template
+    assert credential["issuer"] is REGISTRATION["template"]["issuer"]
+
+
+def test_unrecognised_paths_copy_the_whole_template() -> None:
+    plan = PublishPlan(REGISTRATION | {"additional_paths": {"tags": "tags"}})
+    assert plan.new_credential()["issuer"] is not REGISTRATION["template"]["issuer"]
+
+
+class _CredentialTypes:
+    def __init__(self) -> None:
+        self.projections = []
+        self.registration = REGISTRATION
+
+    async def get(self, credential_type, projection=None):
+        self.projections.append(projection)
+        if credential_type != self.registration["type"]:
+            return None
+        return dict(
+            self.registration, status_lists=list(self.registration["status_lists"])
+        )
+
+
+def test_plans_are_compiled_once_per_version() -> None:
+    repositories = SimpleNamespace(credential_types=_CredentialTypes())
+    cache = PublishPlanCache(ttl=300)
+
+    async def scenario():
+        first = await cache.get(repositories, "ExampleCredential")
+        again = await cache.get(repositories, "ExampleCredential")
+        # Another worker rolled the status list over
+        repositories.credential_types.registration = REGISTRATION | {
+            "status_lists": ["example", "successor"]
+        }
+        cache.invalidate("ExampleCredential")
+        reloaded = await cache.get(repositories, "ExampleCredential")
+        repositories.credential_types.registration = REGISTRATION | {"version": "v2.0"}
+        cache.invalidate("ExampleCredential")
+        upgraded = await cache.get(repositories, "ExampleCredential")
+        unknown = await cache.get(repositories, "UnknownCredential")
+        return first, again, reloaded, upgraded, unknown
+
+    first, again, reloaded, upgraded, unknown = asyncio.run(scenario())
+    assert first is again is reloaded
+    assert reloaded.registration["status_lists"] == ["example", "successor"]
+    assert upgraded is not first and upgraded.version == "v2.0"
+    assert first.version == "v1.0"
+    assert unknown is None
+    assert repositories.credential_types.projections == [PublishPlan.projection] * 4
+    assert "context" not in PublishPlan.projection
+
+
+def test_expired_plans_are_read_again() -> None:
+    repositories = SimpleNamespace(credential_types=_CredentialTypes())
+    cache = PublishPlanCache(ttl=0)
+
+    async def scenario():
+        first = await cache.get(repositories, "ExampleCredential")
+        repositories.credential_types.registration = REGISTRATION | {"version": "v2.0"}
+        return first, await cache.get(repositories, "ExampleCredential")
+
+    first, second = asyncio.run(scenario())
+    assert first is not second and second.version == "v2.0"
+    assert len(repositories.credential_types.projections) == 2
@@ -0,0 +1,294 @@
+"""Batch publication against in-memory repositories, Traction and OrgBook stand-ins."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.plugins.http import DependencyUnavailableError
+from app.plugins.publish_plans import PublishPlanCache
+from app.plugins.publisher import BatchPublisher, ndjson_lines
+from app.plugins.status_list import StatusListIndexAllocator
+from config import settings
+
+REGISTRATION = {
+    "type": "ExampleCredential",
+    "version": "v1.0",
+    "issuer": "did:web:example.com",
+    "status_lists": ["batch-status-list"],
+    "core_paths": {
+        "entityId": "$.credentialSubject.registeredId",
+        "cardinalityId": "$.credentialSubject.number",
+    },
+    "template": {
+        "@context": ["https://www.w3.org/ns/credentials/v2"],
+        "type": ["VerifiableCredential", "ExampleCredential"],
+        "name": "Example Credential",
+        "issuer": {"id": "did:web:example.com", "name": "Example Issuer"},
+        "credentialSubject": {"type": ["Example"]},
+        "renderMethod": [{"type": "OverlayCaptureBundle"}],
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def _domain(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "DOMAIN", "publisher.example.com")
+
+
+class _CredentialTypes:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def get(self, credential_type, projection=None):
+        self.calls += 1
+        return REGISTRATION if credential_type == REGISTRATION["type"] else None
+
+
+class _Credentials:
+    def __init__(
+        self, unchanged: dict | None = None, rejected: set | None = None
+    ) -> None:
+        self.unchanged = unchanged or {}
+        self.rejected = rejected or set()
+        self.writes = []
+
+    async def get_unchanged_many(self, keys):
+        return {key: self.unchanged[key] for key in keys if key in self.unchanged}
+
+    async def publish_many(self, credential_records):
+        self.writes.append(credential_records)
+        return {
+            record["id"]: "duplicate key"
+            for record in credential_records
+            if record["id"] in self.rejected
+        }
+
+
+class _StatusLists:
+    def __init__(self) -> None:
+        self.record = {
+            "key": StatusListIndexAllocator.generate_key(),
+            "length": 100000,
+            "counter": 0,
+            "endpoint": "https://example.com/credentials/status/batch",
+        }
+        self.calls = 0
+
+    async def reserve(self, status_list_id, count):
+        self.calls += 1
+        self.record["counter"] += count
+        return dict(self.record)
+
+    async def pop_indexes(self, status_list_id, count):
+        return None
+
+
+class _Traction:
+    def __init__(self, failing: set | None = None) -> None:
+        self.failing = failing or set()
+        self.in_flight = 0
+        self.peak = 0
+
+    async def authorize(self):
+        pass
+
+    async def issue_vc(self, credential):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+        if credential["credentialSubject"]["number"] in self.failing:
+            return None
+        return credential | {"proof": {"type": "DataIntegrityProof"}}
+
+    async def sign_vc_jwt(self, document):
+        return "eyJ.example.jwt"
+
+
+class _Orgbook:
+    async def fetch_buisness_info(self, identifier):
+        if identifier == "DOWN":
+            raise DependencyUnavailableError("orgbook circuit is open.")
+        if identifier == "UNKNOWN":
+            raise IndexError(identifier)
+        return {
+            "id": f"https://orgbook.example/entity/{identifier}",
+            "name": "Example Ltd.",
+        }
+
+
+def _publication(
+    number: str, entity_id: str = "A0000000", credential_type: str = "ExampleCredential"
+) -> dict:
+    return {
+        "credential": {
+            "type": credential_type,
+            "credentialSubject": {"registeredId": entity_id, "number": number},
+        },
+        "options": {
+            "entityId": entity_id,
+            "cardinalityId": number,
+            "credentialId": f"id-{number}",
+        },
+    }
+
+
+def _publisher(
+    credentials: _Credentials, traction: _Traction, status_lists: _StatusLists
+):
+    repositories = SimpleNamespace(
+        credential_types=_CredentialTypes(),
+        credentials=credentials,
+        status_lists=status_lists,
+    )
+    publisher = BatchPublisher(
+        repositories,
+        concurrency=4,
+        traction=traction,
+        orgbook=_Orgbook(),
+        plans=PublishPlanCache(ttl=300),
+    )
+    return publisher, repositories
+
+
+def test_batch_publishes_with_one_write_and_one_type_lookup() -> None:
+    credentials, traction, status_lists = _Credentials(), _Traction(), _StatusLists()
+    publisher, repositories = _publisher(credentials, traction, status_lists)
+
+    results = asyncio.run(publisher.publish([_publication(str(n)) for n in range(20)]))
+
+    assert [result["status"] for result in results] == [201] * 20
+    assert repositories.credential_types.calls == 1
+    assert status_lists.calls <= 1
+    assert len(credentials.writes) == 1 and len(credentials.writes[0]) == 20
+    assert traction.peak <= 4
+
+    entries = [
+        (entry["statusListCredential"], entry["statusListIndex"])
+        for record in credentials.writes[0]
+        for entry in record["vc"]["credentialStatus"]
+    ]
+    assert len(set(entries)) == 60
+    # Formatting one credential leaves the shared template untouched
+    assert REGISTRATION["template"]["credentialSubject"] == {"type": ["Example"]}
+
+
+def test_batch_reports_partial_failures_per_item() -> None:
+    credentials = _Credentials(rejected={"id-5"})
+    traction = _Traction(failing={"4"})
+    publisher, _ = _publisher(credentials, traction, _StatusLists())
+    unchanged_key = (
+        "ExampleCredential",
+        "A0000000",
+        "1",
+        publisher.registrar.cardinality_hash(_publication("1")["credential"], {}),
+    )
+    credentials.unchanged = {
+        unchanged_key: {"id": "id-1", "vc": {"id": "urn:unchanged"}}
+    }
+
+    results = asyncio.run(
+        publisher.publish(
+            [
+                _publication("0"),
+                _publication("1"),
+                _publication("2", credential_type="UnknownCredential"),
+                _publication("3", entity_id="UNKNOWN"),
+                _publication("4"),
+                _publication("5"),
+                _publication("6", entity_id="DOWN"),
+                _publication("0"),
+            ]
+        )
+    )
+
+    assert [result["status"] for result in results] == [
+        201,
+        200,
+        404,
+        404,
+        500,
+        409,
+        503,
+        409,
+    ]
+    assert results[1]["credentialId"] == "urn:unchanged"
+    assert [record["id"] for record in credentials.writes[0]] == ["id-0", "id-5"]
+
+
+def test_ndjson_lines_are_split_across_chunks_and_bounded() -> None:
+    async def chunks():
+        for chunk in (b'{"a"', b": 1}\n\n", b"x" * 40, b"y" * 40 + b"\n", b'{"b": 2}'):
+            yield chunk
+
+    async def scenario():
+        return [line async for line in ndjson_lines(chunks(), max_line_bytes=64)]
+
+    assert asyncio.run(scenario()) == [
+        (1, b'{"a": 1}'),
+        (2, b""),
+        (3, None),
+        (4, b'{"b": 2}'),
+    ]
+
+
+def test_ndjson_lines_handle_many_lines_per_chunk_and_oversized_tails() -> None:
+    body = b"".join(b'{"n": %d}\n' % number for number in range(20000))
+
+    async def chunks():
+        yield body + b"z" * 30
+        yield b"z" * 40 + b"\n" + b'{"last": 1}\n'
+
+    async def scenario():
+        return [line async for line in ndjson_lines(chunks(), max_line_bytes=64)]
+
+    lines = asyncio.run(scenario())
+    assert len(lines) == 20002
+    assert lines[12345] == (12346, b'{"n": 12345}')
+    assert lines[-2:] == [(20001, None), (20002, b'{"last": 1}')]
+
+
+class _HeldPublisher(BatchPublisher):
+    """Publishes nothing until released, standing in for a saturated signing stage."""
+
+    def __init__(self) -> None:
+        self.release = asyncio.Event()
+
+    async def publish(self, publications):
+        await self.release.wait()
+        return [
+            {"status": 201, "credentialId": publication["options"]["credentialId"]}
+            for publication in publications
+        ]
+
+
+def test_stream_stops_reading_while_signing_is_saturated() -> None:
+    read = []
+
+    async def lines():
+        for number in range(1, 1001):
+            read.append(number)
+            if number == 5:
+                yield number, b"not json"
+            else:
+                yield number, json.dumps(_publication(str(number))).encode()
+
+    async def scenario():
+        publisher = _HeldPublisher()
+        results = publisher.publish_stream(lines(), batch_size=10, queue_size=2)
+        first = asyncio.ensure_future(results.__anext__())
+        await asyncio.sleep(0.05)
+        held = len(read)
+        publisher.release.set()
+        return held, [await first] + [result async for result in results]
+
+    held, results = asyncio.run(scenario())
+    # One batch being published, two queued and one being filled by the reader
+    assert held <= 40
+    assert [result["line"] for result in results] == list(range(1, 1001))
+    assert results[4]["status"] == 422
+    assert {result["status"] for result in results[5:]} == {201}
@@ -0,0 +1,94 @@
+"""Cardinality checks of ``PublisherRegistrar`` against an in-memory credential store."""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+from types import SimpleNamespace
+
+from app.plugins.registrar import PublisherRegistrar
+
+
+class _Credentials:
+    def __init__(self) -> None:
+        self.records = []
+        self.calls = []
+
+    def _current(self, credential_type, entity_id, cardinality_id):
+        return [
+            record
+            for record in self.records
+            if (
+                record["type"],
+                record["entity_id"],
+                record["cardinality_id"],
+                record["refresh"],
+            )
+            == (credential_type, entity_id, cardinality_id, False)
+        ]
+
+    async def get_unchanged(
+        self, credential_type, entity_id, cardinality_id, cardinality_hash
+    ):
+        self.calls.append("read")
+        for record in self._current(credential_type, entity_id, cardinality_id):
+            if record["cardinality_hash"] == cardinality_hash:
+                return {"id": record["id"], "vc": {"id": record["vc"]["id"]}}
+        return None
+
+    async def supersede(self, credential_type, entity_id, cardinality_id):
+        self.calls.append("write")
+        current = self._current(credential_type, entity_id, cardinality_id)
+        for record in current:
+            record["refresh"] = True
+        return len(current)
+
+
+CREDENTIAL = {"type": "ExampleCredential", "credentialSubject": {"name": "Example"}}
+OPTIONS = {"entityId": "A0000000", "cardinalityId": "1"}
+
+
+def _publish(
+    registrar: PublisherRegistrar, credentials: _Credentials, credential: dict
+) -> bool:
+    """Mimic the publish pipeline, returning whether a new credential was issued."""
+
+    async def scenario():
+        cardinality_hash = registrar.cardinality_hash(
+            copy.deepcopy(credential), OPTIONS
+        )
+        if await registrar.find_unchanged(credential, OPTIONS, cardinality_hash):
+            return False
+        await registrar.supersede(credential, OPTIONS)
+        credentials.records.append(
+            {
+                "id": str(len(credentials.records)),
+                "type": credential["type"],
+                "entity_id": OPTIONS["entityId"],
+                "cardinality_id": OPTIONS["cardinalityId"],
+                "cardinality_hash": cardinality_hash,
+                "refresh": False,
+                "vc": {"id": f"urn:{len(credentials.records)}"},
+            }
+        )
+        return True
+
+    return asyncio.run(scenario())
+
+
+def test_unchanged_republish_costs_one_read_and_a_change_one_write() -> None:
+    credentials = _Credentials()
+    registrar = PublisherRegistrar(SimpleNamespace(credentials=credentials))
+
+    assert _publish(registrar, credentials, CREDENTIAL)
+    credentials.calls.clear()
+
+    assert not _publish(registrar, credentials, CREDENTIAL)
+    assert credentials.calls == ["read"]
+    credentials.calls.clear()
+
+    changed = copy.deepcopy(CREDENTIAL)
+    changed["credentialSubject"]["name"] = "Renamed"
+    assert _publish(registrar, credentials, changed)
+    assert credentials.calls == ["read", "write"]
+    assert [record["refresh"] for record in credentials.records] == [True, False]
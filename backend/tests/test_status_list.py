@@ -0,0 +1,697 @@
+"""Unit tests for the status list bitstring and index allocation."""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import copy
+import gzip
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.plugins.http import http_clients
+from app.plugins.status_list import (
+    Bitstring,
+    BitstringStatusList,
+    BitstringStatusListError,
+    StatusListChecker,
+    StatusListIndexAllocator,
+    StatusListIndexPool,
+    StatusListManager,
+    SignedStatusListCache,
+)
+
+
+def test_new_bitstring_is_all_zeros_and_packed() -> None:
+    bitstring = Bitstring(500000)
+    assert len(bitstring) == 500000
+    assert len(bitstring.to_bytes()) == 62500
+    assert not any(bitstring.get(index) for index in (0, 1, 7, 8, 499999))
+
+
+def test_set_and_clear_bits_use_most_significant_bit_first() -> None:
+    bitstring = Bitstring(16)
+    bitstring.set(0)
+    bitstring.set(9)
+    assert bitstring.to_bytes() == bytes([0b10000000, 0b01000000])
+    assert bitstring.get(0) and bitstring.get(9)
+
+    bitstring.set(0, False)
+    assert not bitstring.get(0)
+    assert bitstring.to_bytes() == bytes([0, 0b01000000])
+
+
+def test_out_of_range_index_is_rejected() -> None:
+    bitstring = Bitstring(10)
+    with pytest.raises(BitstringStatusListError):
+        bitstring.get(10)
+    with pytest.raises(BitstringStatusListError):
+        bitstring.set(-1)
+
+
+def test_encode_decode_round_trip() -> None:
+    bitstring = Bitstring(200000)
+    for index in (3, 4096, 199999):
+        bitstring.set(index)
+
+    encoded = bitstring.encode()
+    assert "=" not in encoded
+    assert (
+        gzip.decompress(base64.urlsafe_b64decode(encoded + "=="))
+        == bitstring.to_bytes()
+    )
+
+    decoded = Bitstring.decode(encoded)
+    assert decoded.to_bytes() == bitstring.to_bytes()
+    assert [decoded.get(index) for index in (2, 3, 4096, 199999)] == [
+        False,
+        True,
+        True,
+        True,
+    ]
+
+
+def test_created_status_list_credential_expands_to_empty_list() -> None:
+    status_list = BitstringStatusList()
+    credential = asyncio.run(
+        status_list.create(issuer="did:web:example.com", length=500000)
+    )
+    expanded = status_list.expand(credential["credentialSubject"]["encodedList"])
+    assert len(expanded.to_bytes()) == 62500
+    assert not any(expanded.to_bytes())
+
+
+def test_allocator_is_a_permutation_of_the_list() -> None:
+    for length in (1, 2, 1000, 4099):
+        allocator = StatusListIndexAllocator(
+            StatusListIndexAllocator.generate_key(), length
+        )
+        assert sorted(allocator.index(counter) for counter in range(length)) == list(
+            range(length)
+        )
+
+
+def test_allocator_order_depends_on_the_key() -> None:
+    key = StatusListIndexAllocator.generate_key()
+    first = [
+        StatusListIndexAllocator(key, 500000).index(counter) for counter in range(64)
+    ]
+    again = [
+        StatusListIndexAllocator(key, 500000).index(counter) for counter in range(64)
+    ]
+    other = [
+        StatusListIndexAllocator(StatusListIndexAllocator.generate_key(), 500000).index(
+            counter
+        )
+        for counter in range(64)
+    ]
+    assert first == again
+    assert first != other
+    assert first != sorted(first)
+
+
+def test_allocator_rejects_exhausted_counter() -> None:
+    allocator = StatusListIndexAllocator(StatusListIndexAllocator.generate_key(), 8)
+    with pytest.raises(BitstringStatusListError):
+        allocator.index(8)
+
+
+class _CounterStore:
+    """Stand-in for the atomic ``$inc`` reservation of ``StatusListRepository``."""
+
+    def __init__(self, length: int) -> None:
+        self.record = {
+            "key": StatusListIndexAllocator.generate_key(),
+            "length": length,
+            "counter": 0,
+            "endpoint": "https://example.com/credentials/status/1",
+        }
+        self.calls = 0
+
+    async def reserve(self, status_list_id, count):
+        self.calls += 1
+        if self.record["counter"] + count > self.record["length"]:
+            return None
+        self.record["counter"] += count
+        return dict(self.record)
+
+    async def pop_indexes(self, status_list_id, count):
+        return None
+
+
+def test_pool_hands_out_distinct_indexes_from_blocks() -> None:
+    store = _CounterStore(1000)
+    pool = StatusListIndexPool(block_size=30)
+    issued = []
+    for _ in range(20):
+        endpoint, indexes = asyncio.run(pool.take(store, "1", 3))
+        assert endpoint == store.record["endpoint"]
+        issued += indexes
+    assert len(set(issued)) == 60
+    assert store.calls == 2
+
+
+def test_pool_serves_concurrent_publishes_without_overlap() -> None:
+    store = _CounterStore(1000)
+    pool = StatusListIndexPool(block_size=30)
+
+    async def scenario():
+        return await asyncio.gather(*[pool.take(store, "1", 3) for _ in range(50)])
+
+    issued = [index for _, indexes in asyncio.run(scenario()) for index in indexes]
+    assert len(set(issued)) == 150
+    assert store.calls == 5
+
+
+def test_pool_falls_back_to_smaller_reservation_near_capacity() -> None:
+    store = _CounterStore(7)
+    pool = StatusListIndexPool(block_size=30)
+    issued = (
+        asyncio.run(pool.take(store, "1", 3))[1]
+        + asyncio.run(pool.take(store, "1", 3))[1]
+    )
+    assert len(set(issued)) == 6
+    with pytest.raises(BitstringStatusListError):
+        asyncio.run(pool.take(store, "1", 3))
+
+
+def test_signed_status_list_cache_reuses_until_revision_changes() -> None:
+    signatures = []
+
+    async def sign():
+        signatures.append(len(signatures))
+        return {"proof": len(signatures)}, time.time() + 300
+
+    async def scenario():
+        cache = SignedStatusListCache(refresh_margin=60)
+        key = ("list", "revocation", "application/vc")
+        first = await cache.get(key, 0, sign)
+        again = await cache.get(key, 0, sign)
+        changed = await cache.get(key, 1, sign)
+        cache.invalidate("list")
+        invalidated = await cache.get(key, 1, sign)
+        return first, again, changed, invalidated
+
+    first, again, changed, invalidated = asyncio.run(scenario())
+    assert first[0] is again[0] and first[1] == again[1]
+    assert first[0] == {"proof": 1}
+    assert changed[0] == {"proof": 2}
+    assert invalidated[0] == {"proof": 3}
+
+
+def test_signed_status_list_cache_resigns_in_background_near_expiry() -> None:
+    async def scenario():
+        cache = SignedStatusListCache(refresh_margin=60)
+        key = ("list", "revocation", "application/vc+jwt")
+        expiries = iter([time.time() + 30, time.time() + 300])
+
+        async def sign():
+            return "jwt", next(expiries)
+
+        await cache.get(key, 0, sign)
+        served, served_until = await cache.get(key, 0, sign)
+        await asyncio.gather(*cache.tasks)
+        return served, served_until, cache.entries[key][1]
+
+    served, served_until, valid_until = asyncio.run(scenario())
+    # The copy about to expire is served with its own validity while re-signing
+    assert served == "jwt"
+    assert served_until < time.time() + 60
+    assert valid_until > time.time() + 200
+
+
+def _credential(uri: str, revocation: int, suspension: int) -> dict:
+    return {
+        "id": f"urn:test:{revocation}",
+        "credentialStatus": [
+            {
+                "type": "BitstringStatusListEntry",
+                "statusPurpose": purpose,
+                "statusListIndex": str(index),
+                "statusListCredential": uri,
+            }
+            for purpose, index in (
+                ("revocation", revocation),
+                ("suspension", suspension),
+            )
+        ],
+    }
+
+
+def test_checker_fetches_each_status_list_once_per_batch() -> None:
+    bitstring = Bitstring(131072)
+    bitstring.set(7)
+    fetches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        fetches.append(str(request.url))
+        if request.url.host == "down.example":
+            return httpx.Response(503)
+        return httpx.Response(
+            200, json={"credentialSubject": {"encodedList": bitstring.encode()}}
+        )
+
+    credentials = [
+        _credential("https://lists.example/1", index, index + 1)
+        for index in range(6, 9)
+    ]
+    credentials.append(_credential("https://down.example/2", 7, 8))
+
+    async def scenario():
+        checker = StatusListChecker(ttl=300, max_lists=10)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            first = await checker.check(credentials, client)
+            second = await checker.check(credentials[:1], client)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first[:3] == [
+        {"revocation": False, "suspension": True},
+        {"revocation": True, "suspension": False},
+        {"revocation": False, "suspension": False},
+    ]
+    assert first[3] == {"revocation": None, "suspension": None}
+    assert second == first[:1]
+    assert fetches.count("https://lists.example/1") == 1
+
+
+def test_checker_skips_entries_without_a_status_list() -> None:
+    credentials = [
+        {
+            "credentialStatus": [
+                {"statusPurpose": "revocation", "statusListIndex": "7"},
+                {
+                    "statusPurpose": "suspension",
+                    "statusListCredential": "https://lists.example/1",
+                },
+            ]
+        }
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200, json={"credentialSubject": {"encodedList": Bitstring(131072).encode()}}
+        )
+
+    async def scenario():
+        checker = StatusListChecker(ttl=300, max_lists=10)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await checker.check(credentials, client)
+
+    assert asyncio.run(scenario()) == [{"revocation": None, "suspension": None}]
+
+
+def test_checker_drops_expired_and_oldest_lists_through_the_pooled_client() -> None:
+    fetches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        fetches.append(request.url.path)
+        subject = {"encodedList": Bitstring(131072).encode()}
+        if request.url.path == "/expired":
+            return httpx.Response(
+                200,
+                json={
+                    "validUntil": "2000-01-01T00:00:00+00:00",
+                    "credentialSubject": subject,
+                },
+            )
+        return httpx.Response(200, json={"credentialSubject": subject})
+
+    async def scenario():
+        checker = StatusListChecker(ttl=300, max_lists=2)
+        http_clients.clients["status_lists"] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        try:
+            for path in ("expired", "1", "2", "3"):
+                await checker.check(
+                    [_credential(f"https://lists.example/{path}", 1, 2)]
+                )
+        finally:
+            await http_clients.clients.pop("status_lists").aclose()
+        return checker
+
+    checker = asyncio.run(scenario())
+    assert fetches == ["/expired", "/1", "/2", "/3"]
+    assert list(checker.lists) == ["https://lists.example/2", "https://lists.example/3"]
+
+
+class _StatusLists:
+    """Stand-in for ``StatusListRepository`` over in-memory records."""
+
+    def __init__(self) -> None:
+        self.records = {}
+        self.calls = []
+
+    def _find(self, **query):
+        for record in self.records.values():
+            if all(record.get(name) == value for name, value in query.items()):
+                return record
+        return None
+
+    async def get(self, status_list_id, projection=None):
+        return copy.deepcopy(self._find(id=status_list_id))
+
+    async def get_by_endpoint(self, endpoint, projection=None):
+        return copy.deepcopy(self._find(endpoint=endpoint))
+
+    async def create(self, status_list_record):
+        self.records[status_list_record["id"]] = copy.deepcopy(status_list_record)
+
+    async def delete(self, status_list_id):
+        self.records.pop(status_list_id, None)
+
+    async def reserve(self, status_list_id, count):
+        self.calls.append(("reserve", status_list_id, count))
+        record = self.records.get(status_list_id)
+        if (
+            not record
+            or not record.get("key")
+            or record["counter"] + count > record["length"]
+        ):
+            return None
+        record["counter"] += count
+        return copy.deepcopy(record)
+
+    async def pop_indexes(self, status_list_id, count):
+        self.calls.append(("pop_indexes", status_list_id, count))
+        record = self.records.get(status_list_id)
+        if not record or record.get("key") or len(record.get("indexes", [])) < count:
+            return None
+        popped = record["indexes"][len(record["indexes"]) - count :]
+        del record["indexes"][len(record["indexes"]) - count :]
+        return {"endpoint": record["endpoint"], "indexes": popped}
+
+    async def set_bitstring(self, status_list_id, revision, bitstring):
+        record = self.records[status_list_id]
+        if record.get("revision") != revision:
+            return 0
+        record.update(bitstring=bitstring, dirty=True, revision=(revision or 0) + 1)
+        return 1
+
+    async def set_encoded_list(self, status_list_id, revision, encoded_list):
+        self.calls.append(("set_encoded_list", status_list_id, revision))
+        record = self.records[status_list_id]
+        if record.get("revision") != revision:
+            return 0
+        record["credential"]["credentialSubject"]["encodedList"] = encoded_list
+        record["dirty"] = False
+        return 1
+
+
+class _CredentialTypes:
+    """Stand-in for ``CredentialTypeRepository``, ``stale`` lists are read once."""
+
+    def __init__(self, status_lists: list) -> None:
+        self.status_lists = status_lists
+        self.stale = None
+
+    async def get_status_lists(self, credential_type, version):
+        if self.stale is not None:
+            stale, self.stale = self.stale, None
+            return list(stale)
+        return list(self.status_lists)
+
+    async def append_status_list(
+        self, credential_type, version, position, status_list_id
+    ):
+        if len(self.status_lists) > position:
+            return 0
+        self.status_lists.append(status_list_id)
+        return 1
+
+
+def _manager(
+    length: int, rollover_threshold: float, block_size: int = 3
+) -> StatusListManager:
+    return StatusListManager(
+        StatusListIndexPool(block_size),
+        SignedStatusListCache(refresh_margin=60),
+        length=length,
+        rollover_threshold=rollover_threshold,
+    )
+
+
+async def _registered(manager: StatusListManager):
+    repositories = SimpleNamespace(status_lists=_StatusLists(), credential_types=None)
+    first = await manager.create_list(
+        repositories, "did:web:example.com", "ExampleCredential", "v1.0"
+    )
+    repositories.credential_types = _CredentialTypes([first])
+    registration = {
+        "type": "ExampleCredential",
+        "version": "v1.0",
+        "issuer": "did:web:example.com",
+        "status_lists": [first],
+    }
+    return repositories, registration
+
+
+def test_current_list_is_used_up_before_the_pre_created_successor() -> None:
+    manager = _manager(length=30, rollover_threshold=0.5)
+
+    async def scenario():
+        repositories, registration = await _registered(manager)
+        first = registration["status_lists"][0]
+        issued = []
+        for _ in range(11):
+            issued.append(await manager.allocate(repositories, registration, 3))
+            await asyncio.gather(*manager.tasks)
+        return repositories, registration, first, issued
+
+    repositories, registration, first, issued = asyncio.run(scenario())
+    successor = registration["status_lists"][1]
+    assert repositories.credential_types.status_lists == [first, successor]
+    first_endpoint = repositories.status_lists.records[first]["endpoint"]
+    # Every index of the first list is issued before the successor is drawn from
+    assert [endpoint for endpoint, _ in issued[:10]] == [first_endpoint] * 10
+    assert sorted(index for _, indexes in issued[:10] for index in indexes) == list(
+        range(30)
+    )
+    assert issued[10][0] == repositories.status_lists.records[successor]["endpoint"]
+
+
+def test_exhausted_list_without_successor_rolls_over_inline() -> None:
+    manager = _manager(length=6, rollover_threshold=2.0)
+
+    async def scenario():
+        repositories, registration = await _registered(manager)
+        issued = [
+            await manager.allocate(repositories, registration, 3) for _ in range(3)
+        ]
+        return repositories, registration, issued
+
+    repositories, registration, issued = asyncio.run(scenario())
+    assert len(registration["status_lists"]) == 2
+    assert repositories.credential_types.status_lists == registration["status_lists"]
+    successor = repositories.status_lists.records[registration["status_lists"][1]]
+    assert issued[2][0] == successor["endpoint"]
+    assert successor["counter"] == 3
+
+
+def test_concurrent_rollover_keeps_the_first_appended_successor() -> None:
+    manager = _manager(length=6, rollover_threshold=2.0)
+
+    async def scenario():
+        repositories, registration = await _registered(manager)
+        first = registration["status_lists"][0]
+        # Another worker appended its successor after this one read the lists
+        other = await manager.create_list(
+            repositories, "did:web:example.com", "ExampleCredential", "v1.0"
+        )
+        repositories.credential_types.stale = [first]
+        repositories.credential_types.status_lists.append(other)
+        successor = await manager.rollover(repositories, registration, first)
+        return repositories, first, other, successor
+
+    repositories, first, other, successor = asyncio.run(scenario())
+    assert successor == other
+    assert set(repositories.status_lists.records) == {first, other}
+    assert repositories.credential_types.status_lists == [first, other]
+
+
+def _status_list_record(status_list_id: str, length: int, **fields) -> dict:
+    record = {
+        "id": status_list_id,
+        "endpoint": f"https://example.com/credentials/status/{status_list_id}",
+        "length": length,
+        "credential": {
+            "credentialSubject": {"encodedList": Bitstring(length).encode()}
+        },
+    }
+    record.update(fields)
+    return record
+
+
+def test_set_status_retries_on_a_concurrent_revision() -> None:
+    manager = _manager(length=64, rollover_threshold=0.8)
+    status_lists = _StatusLists()
+    record = _status_list_record(
+        "L1", 64, revision=3, bitstring=Bitstring(64).to_bytes()
+    )
+    status_lists.records["L1"] = record
+    set_bitstring = status_lists.set_bitstring
+
+    async def concurrent_set_bitstring(status_list_id, revision, bitstring):
+        # Another writer sets bit 9 between this read and the first write
+        if record["revision"] == 3:
+            other = Bitstring(64)
+            other.set(9, True)
+            record.update(bitstring=other.to_bytes(), revision=4)
+        return await set_bitstring(status_list_id, revision, bitstring)
+
+    status_lists.set_bitstring = concurrent_set_bitstring
+    repositories = SimpleNamespace(status_lists=status_lists)
+    key = ("L1", "revocation", "application/vc")
+    manager.signed_cache.entries[key] = (4, 0.0, {"stale": True})
+
+    assert (
+        asyncio.run(manager.set_status(repositories, record["endpoint"], [2], True))
+        == "L1"
+    )
+    bitstring = Bitstring(64, record["bitstring"])
+    assert bitstring.get(2) and bitstring.get(9)
+    assert record["revision"] == 5 and record["dirty"]
+    assert key not in manager.signed_cache.entries
+
+
+def test_set_status_gives_up_after_the_retries() -> None:
+    manager = _manager(length=64, rollover_threshold=0.8)
+    status_lists = _StatusLists()
+    record = _status_list_record(
+        "L1", 64, revision=0, bitstring=Bitstring(64).to_bytes()
+    )
+    status_lists.records["L1"] = record
+
+    async def conflicting_set_bitstring(status_list_id, revision, bitstring):
+        return 0
+
+    status_lists.set_bitstring = conflicting_set_bitstring
+    repositories = SimpleNamespace(status_lists=status_lists)
+    with pytest.raises(BitstringStatusListError):
+        asyncio.run(
+            manager.set_status(repositories, record["endpoint"], [2], True, retries=2)
+        )
+    with pytest.raises(BitstringStatusListError):
+        asyncio.run(
+            manager.set_status(repositories, "https://example.com/unknown", [2], True)
+        )
+
+
+def test_set_status_migrates_a_legacy_encoded_list() -> None:
+    manager = _manager(length=64, rollover_threshold=0.8)
+    legacy = Bitstring(64)
+    legacy.set(5, True)
+    status_lists = _StatusLists()
+    # Lists created before binary storage have no bitstring, length nor revision
+    record = _status_list_record("L1", 64)
+    record.pop("length")
+    record["credential"]["credentialSubject"]["encodedList"] = legacy.encode()
+    status_lists.records["L1"] = record
+    repositories = SimpleNamespace(status_lists=status_lists)
+
+    asyncio.run(manager.set_status(repositories, record["endpoint"], [7], True))
+    bitstring = Bitstring.decode(legacy.encode())
+    bitstring.set(7, True)
+    assert record["bitstring"] == bitstring.to_bytes()
+    assert record["revision"] == 1 and record["dirty"]
+
+
+def test_pool_pops_legacy_indexes_in_one_update_per_block() -> None:
+    status_lists = _StatusLists()
+    status_lists.records["L1"] = _status_list_record("L1", 64, indexes=list(range(10)))
+    pool = StatusListIndexPool(block_size=4)
+
+    async def scenario():
+        issued = [await pool.take(status_lists, "L1", 3) for _ in range(3)]
+        with pytest.raises(BitstringStatusListError):
+            await pool.take(status_lists, "L1", 3)
+        return issued
+
+    issued = asyncio.run(scenario())
+    assert sorted(index for _, indexes in issued for index in indexes) == list(
+        range(1, 10)
+    )
+    assert [call for call in status_lists.calls if call[0] == "pop_indexes"] == [
+        ("pop_indexes", "L1", 4),
+        ("pop_indexes", "L1", 4),
+        ("pop_indexes", "L1", 4),
+        ("pop_indexes", "L1", 1),
+        ("pop_indexes", "L1", 4),
+        ("pop_indexes", "L1", 3),
+    ]
+    # Nothing is popped when the list runs out, its last index stays on the record
+    assert status_lists.records["L1"]["indexes"] == [0]
+    assert pool.blocks["L1"][1] == []
+
+
+def test_legacy_list_round_trips_through_binary_storage() -> None:
+    manager = _manager(length=64, rollover_threshold=0.8)
+    legacy = Bitstring(64)
+    legacy.set(5, True)
+    status_lists = _StatusLists()
+    record = _status_list_record("L1", 64)
+    record.pop("length")
+    record["credential"]["credentialSubject"]["encodedList"] = legacy.encode()
+    status_lists.records["L1"] = record
+    repositories = SimpleNamespace(status_lists=status_lists)
+
+    async def scenario():
+        before = copy.deepcopy(await manager.get_credential(repositories, "L1"))
+        await manager.set_status(repositories, record["endpoint"], [7], True)
+        after = await manager.get_credential(repositories, "L1")
+        again = await manager.get_credential(repositories, "L1")
+        return before, after, again
+
+    before, after, again = asyncio.run(scenario())
+    # An untouched legacy list is served as stored
+    assert before["credentialSubject"]["encodedList"] == legacy.encode()
+    bitstring = Bitstring.decode(after["credentialSubject"]["encodedList"])
+    assert bitstring.get(5) and bitstring.get(7) and not bitstring.get(6)
+    # The regenerated list is persisted once, later reads use it as is
+    assert again == after
+    assert (
+        record["credential"]["credentialSubject"]["encodedList"]
+        == (after["credentialSubject"]["encodedList"])
+    )
+    assert not record["dirty"] and record["revision"] == 1
+    assert [call for call in status_lists.calls if call[0] == "set_encoded_list"] == [
+        ("set_encoded_list", "L1", 1)
+    ]
+
+
+def test_dirty_list_is_re_signed_at_its_new_revision() -> None:
+    manager = _manager(length=64, rollover_threshold=0.8)
+    status_lists = _StatusLists()
+    record = _status_list_record(
+        "L1", 64, revision=0, bitstring=Bitstring(64).to_bytes()
+    )
+    status_lists.records["L1"] = record
+    repositories = SimpleNamespace(status_lists=status_lists)
+    cache = manager.signed_cache
+    key = ("L1", "revocation", "application/vc")
+    signed = []
+
+    async def sign():
+        credential = copy.deepcopy(await manager.get_credential(repositories, "L1"))
+        signed.append(credential["credentialSubject"]["encodedList"])
+        return credential, time.time() + 3600
+
+    async def scenario():
+        first, _ = await cache.get(key, record["revision"], sign)
+        cached, _ = await cache.get(key, record["revision"], sign)
+        await manager.set_status(repositories, record["endpoint"], [3], True)
+        assert key not in cache.entries
+        # Another worker still holds the copy signed at revision 0
+        cache.entries[key] = (0, time.time() + 3600, first)
+        updated, _ = await cache.get(key, record["revision"], sign)
+        return first, cached, updated
+
+    first, cached, updated = asyncio.run(scenario())
+    assert cached is first and len(signed) == 2
+    assert not Bitstring.decode(first["credentialSubject"]["encodedList"]).get(3)
+    assert Bitstring.decode(updated["credentialSubject"]["encodedList"]).get(3)
+    assert record["revision"] == 1 and not record["dirty"]
@@ -0,0 +1,165 @@
+"""Tenant token handling of ``TractionController`` against a mocked Traction API."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+
+import httpx
+import jwt
+
+from app.plugins import traction
+from app.plugins.traction import TractionController, TractionTokenManager
+
+
+def _token(expires_in: int) -> str:
+    claims = {"exp": int(time.time()) + expires_in, "jti": str(uuid.uuid4())}
+    return jwt.encode(claims, "secret", algorithm="HS256")
+
+
+def test_concurrent_requests_share_a_single_token_fetch() -> None:
+    token_requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        token_requests.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"token": _token(3600)})
+
+    async def scenario():
+        tokens = TractionTokenManager(refresh_margin=300, default_ttl=3600)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await asyncio.gather(*[tokens.get(client) for _ in range(20)])
+
+    issued = asyncio.run(scenario())
+    assert len(set(issued)) == 1
+    assert len(token_requests) == 1
+
+
+def test_token_is_refreshed_in_background_ahead_of_expiry() -> None:
+    tokens_served = iter([_token(120), _token(3600)])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"token": next(tokens_served)})
+
+    async def scenario():
+        tokens = TractionTokenManager(refresh_margin=300, default_ttl=3600)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            first = await tokens.get(client)
+            served = await tokens.get(client)
+            await tokens.refreshing
+            return first, served, await tokens.get(client)
+
+    first, served, refreshed = asyncio.run(scenario())
+    assert served == first
+    assert refreshed != first
+
+
+def test_request_is_retried_once_after_unauthorized(monkeypatch) -> None:
+    stale, fresh = _token(3600), _token(3600)
+    tokens_served = iter([stale, fresh])
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/token"):
+            return httpx.Response(200, json={"token": next(tokens_served)})
+        calls.append(request.headers["authorization"])
+        if request.headers["authorization"] == f"Bearer {stale}":
+            return httpx.Response(401, json={})
+        return httpx.Response(200, json={"did_document": {"id": "did:web:example.com"}})
+
+    async def scenario():
+        monkeypatch.setattr(
+            traction,
+            "traction_tokens",
+            TractionTokenManager(refresh_margin=300, default_ttl=3600),
+        )
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            monkeypatch.setitem(traction.http_clients.clients, "traction", client)
+            controller = TractionController()
+            await controller.authorize()
+            return await controller.resolve("did:web:example.com")
+
+    assert asyncio.run(scenario()) == {"id": "did:web:example.com"}
+    assert calls == [f"Bearer {stale}", f"Bearer {fresh}"]
+
+
+class _ProvisioningStore:
+    """In-memory stand-in for the collections touched by provisioning."""
+
+    def __init__(self) -> None:
+        self.collections = {"IssuerRecord": {}, "ProvisioningCheckpoint": {}}
+
+    def provision(self) -> None:
+        pass
+
+    def find(self, collection, query, projection=None):
+        return list(self.collections[collection].values())
+
+    def find_one(self, collection, query, projection=None):
+        return self.collections[collection].get(query["id"])
+
+    def insert(self, collection, item) -> None:
+        self.collections[collection][item["id"]] = item
+
+    def replace(self, collection, query, new_item, upsert=False) -> None:
+        self.collections[collection][query["id"]] = new_item
+
+
+def test_provisioning_checks_issuers_concurrently_and_resumes(monkeypatch) -> None:
+    issuers = [
+        {"id": f"did:web:example.com:{index}", "name": f"Issuer {index}"}
+        for index in range(6)
+    ]
+    resolved = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/token"):
+            return httpx.Response(200, json={"token": _token(3600)})
+        if request.url.path == "/registry.json":
+            return httpx.Response(200, json={"issuers": issuers})
+        if request.url.path.startswith("/resolver/resolve/"):
+            did = request.url.path.removeprefix("/resolver/resolve/")
+            resolved.append(did)
+            await asyncio.sleep(0.01)
+            if did.endswith(":5"):
+                return httpx.Response(200, json={"did_document": None})
+            return httpx.Response(200, json={"did_document": {"id": did}})
+        return httpx.Response(
+            200,
+            json={
+                "results": [
+                    {"verkey": "6MkqRYqQiSgvZQdnBytw86Qbs2ZWUkGv22od935YF4s8M7V"}
+                ]
+            },
+        )
+
+    store = _ProvisioningStore()
+    monkeypatch.setattr(traction, "MongoClient", lambda: store)
+    monkeypatch.setattr(
+        traction.settings, "ISSUER_REGISTRY_URL", "http://traction/registry.json"
+    )
+    monkeypatch.setattr(traction.settings, "TRACTION_API_URL", "http://traction")
+
+    async def scenario():
+        monkeypatch.setattr(
+            traction,
+            "traction_tokens",
+            TractionTokenManager(refresh_margin=300, default_ttl=3600),
+        )
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            monkeypatch.setitem(traction.http_clients.clients, "traction", client)
+            controller = TractionController()
+            controller.endpoint = "http://traction"
+            first = await controller.provision(concurrency=3)
+            issuers.append({"id": "did:web:example.com:6", "name": "Issuer 6"})
+            issuers[0]["name"] = "Renamed"
+            second = await controller.provision(concurrency=3)
+            return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == {"skipped": 0, "created": 5, "action_required": 1}
+    # The unchanged issuers are skipped, failed and changed entries are checked again
+    assert second == {"skipped": 4, "ok": 1, "created": 1, "action_required": 1}
+    assert len(store.collections["IssuerRecord"]) == 6
+    assert resolved.count("did:web:example.com:1") == 1